@@ -1,27 +1,45 @@
-from flask import Flask, request, jsonify, render_template, send_file, url_for
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Request, Response, g, request, jsonify, render_template, send_file, stream_with_context, url_for
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
 import tempfile
 from werkzeug.utils import secure_filename
 import uuid
 import json
-import re
 from datetime import datetime
-import html
-import requests
 import io
-from PIL import Image, ImageDraw, ImageFont
 import textwrap
 import base64
-import time
-import asyncio
-import hashlib
-from typing import Dict, List, Tuple, Optional, Any, Union
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import BinaryIO, Dict, List, Tuple, Optional, Any, Union
 
-# For PDF generation with better Unicode support
-from fpdf import FPDF
+# google.generativeai, fpdf, PIL and the document parsers are imported on first use
+# (or by warm_up()) so importing this module stays fast and makes no network calls
+from caching import ExtractionCache, LRUCache, RenderCache, create_result_cache, normalized_key, sha256_digest
+from pipeline import RateLimiter, Stage, run_stages
+from scoring import score_resume
+from jobs import JobManager, JobQueueFull
+from streaming import JsonFieldStreamer, sse_event
+from pdf_extraction import extract_pdf_text
+from retention import RetentionManager
+from font_manager import FontManager
+from llm_client import CircuitBreaker, GeminiClient, LLMError
+from llm_backends import create_backend
+from chat_sessions import ChatSession, ChatSessionStore
+from job_registry import JobDescriptionRegistry
+from resume_edits import PatchError, apply_edits
+from resume_document import ResumeDocument, parse_resume
+from prompts import (CHAT_INPUT, CHAT_INSTRUCTIONS, ENHANCE_INPUT, ENHANCE_INSTRUCTIONS, SCORE_INPUT,
+                     SCORE_INSTRUCTION, SYSTEM_INSTRUCTIONS)
+from prompt_compaction import Block, Compaction, begin_report, compact_inputs, current_report, end_report
+from profiling import ProfileStore, RequestProfiler, span as profile_span
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Instrumentation, bounded_label, in_current_context
+from text_normalization import clean_resume_text, to_pdf_text
 
 # Load environment variables
 load_dotenv()
@@ -31,62 +49,409 @@ logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
     handlers=[
-        logging.FileHandler("app.log"),  # Log to a file
+        logging.FileHandler("app.log", delay=True),  # Log to a file, opened on the first record
         logging.StreamHandler()  # Log to console
     ]
 )
 
 app = Flask(__name__, static_folder='static')
 
-# Configure Gemini API
+# Configure Gemini API; the key is checked by create_app() and the client is built by get_model()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    logging.error("GEMINI_API_KEY environment variable not set!")
-    raise ValueError("GEMINI_API_KEY not configured")
 
 # Initialize Gemini 1.5
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("gemini-1.5-flash")  # Use Pro model for better quality
+MODEL_NAME = "gemini-1.5-flash"
+# Bump whenever the enhancement prompts change so cached results are not reused
+PROMPT_VERSION = "2"
+
+# Whether genai.configure() has run; models are built per system instruction by the backend
+_genai_configured = False
+_model_lock = threading.Lock()
+
+# Seconds an explicit Gemini context cache of a system instruction lives (0 disables caching).
+# The API only caches content of at least GEMINI_CONTEXT_CACHE_MIN_TOKENS; shorter instructions
+# are sent inline with their model.
+GEMINI_CONTEXT_CACHE_TTL = float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", 0))
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", 32768))
+
+# Size these to the project's Gemini quotas; calls wait for capacity instead of hitting 429s
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", 60))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", 1000000))
+# Seconds a call may take including retries and quota waits; match scoring gets a shorter budget
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", 60))
+GEMINI_SCORE_DEADLINE = float(os.getenv("GEMINI_SCORE_DEADLINE", 20))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 3))
+# Consecutive upstream failures that open the circuit, and seconds before a trial call is let through
+GEMINI_CIRCUIT_THRESHOLD = int(os.getenv("GEMINI_CIRCUIT_THRESHOLD", 5))
+GEMINI_CIRCUIT_RESET = float(os.getenv("GEMINI_CIRCUIT_RESET", 30))
+
+# LLM backend: "gemini" (the real API) or "fake" (offline, deterministic, for load tests and CI)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+# Record responses to, or replay them from, a JSONL cassette; replay needs no API key
+LLM_CASSETTE = os.getenv("LLM_CASSETTE")
+LLM_CASSETTE_MODE = (os.getenv("LLM_CASSETTE_MODE") or "").lower() or None
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "false").lower() in ("1", "true", "yes")
+# Fake backend latency in ms (fixed:MS, uniform:LOW,HIGH, normal:MEAN,SD, lognormal:MEDIAN,SIGMA, exponential:MEAN)
+# and injected failures (share of calls, and weights per kind: HTTP status or "timeout")
+LLM_FAKE_LATENCY = os.getenv("LLM_FAKE_LATENCY", "fixed:0")
+LLM_FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", 0))
+LLM_FAKE_ERRORS = os.getenv("LLM_FAKE_ERRORS", "429:3,503:1,timeout:1")
+LLM_FAKE_SEED = int(os.getenv("LLM_FAKE_SEED", 0))
+
+# Chat sessions keep the resume, job description and recent turns server-side between messages.
+# Idle sessions are dropped; beyond the session count or total held text the least recently used go first.
+CHAT_SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_IDLE_TTL", 1800))
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", 500))
+CHAT_SESSION_MAX_CHARS = int(os.getenv("CHAT_SESSION_MAX_CHARS", 64 * 1024 * 1024))
+CHAT_SESSION_HISTORY = int(os.getenv("CHAT_SESSION_HISTORY", 6))
+
+# Chat edits: "patch" asks Gemini for line edits and falls back to a full rewrite when they
+# do not apply; "rewrite" always asks for the whole updated resume
+CHAT_EDIT_MODE = os.getenv("CHAT_EDIT_MODE", "patch").lower()
+CHAT_PATCH_MAX_OUTPUT_TOKENS = int(os.getenv("CHAT_PATCH_MAX_OUTPUT_TOKENS", 1024))
+
+# Estimated prompt tokens allowed per Gemini call after compaction; 0 disables the budget.
+# Over budget, chat history and low-priority job description sections are trimmed first.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 32000))
+
+# Set WARM_UP to import the SDK and parsers and render a throwaway PDF before reporting ready
+WARM_UP = os.getenv("WARM_UP", "false").lower() in ("1", "true", "yes")
 
 # Ensure necessary directories exist
 UPLOAD_FOLDER = "uploads"
 OUTPUT_FOLDER = "enhanced_resumes"
 TEMPLATE_FOLDER = "templates"
-FONTS_FOLDER = "fonts"
+# Bundled TrueType fonts, resolved next to this file so any working directory works
+FONTS_FOLDER = os.getenv("FONTS_FOLDER", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts"))
+CACHE_FOLDER = "cache"
 
-for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER, TEMPLATE_FOLDER, FONTS_FOLDER, 
-               os.path.join("static", "js"), os.path.join("static", "css")]:
-    os.makedirs(folder, exist_ok=True)
+# Requests sent with X-Profile: 1 (or ?profile=1) and this token in X-Admin-Token (or ?admin_token=)
+# are run under cProfile; profiles are kept in PROFILE_FOLDER. Profiling is off when no token is set.
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_FOLDER = os.getenv("PROFILE_FOLDER", os.path.join(CACHE_FOLDER, "profiles"))
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", 50))
 
 # File configuration
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt', 'rtf'}
+# Known request options; anything else is exported to /metrics as "other"
+TEMPLATE_TYPES = {'engineering', 'faang', 'non-tech'}
+OUTPUT_FORMATS = {'standard', 'modern'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-# Download and save free fonts if they don't exist
-FONT_URLS = {
-    "OpenSans-Regular": "https://github.com/google/fonts/raw/main/apache/opensans/OpenSans%5Bwdth%2Cwght%5D.ttf",
-    "OpenSans-Bold": "https://github.com/google/fonts/raw/main/apache/opensans/OpenSans%5Bwdth%2Cwght%5D.ttf",
-    "Roboto-Regular": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Regular.ttf",
-    "Roboto-Bold": "https://github.com/google/fonts/raw/main/apache/roboto/Roboto-Bold.ttf"
-}
-
-def download_fonts():
-    """Download free fonts for PDF generation if they don't exist."""
-    for font_name, url in FONT_URLS.items():
-        font_path = os.path.join(FONTS_FOLDER, f"{font_name}.ttf")
-        if not os.path.exists(font_path):
-            try:
-                logging.info(f"Downloading font: {font_name}")
-                response = requests.get(url)
-                response.raise_for_status()
-                with open(font_path, 'wb') as f:
-                    f.write(response.content)
-                logging.info(f"Font downloaded: {font_name}")
-            except Exception as e:
-                logging.error(f"Error downloading font {font_name}: {e}")
+# Uploads are processed in memory; larger ones spill to an anonymous temporary file.
+# Set RETAIN_UPLOADS to keep a copy of every raw upload in UPLOAD_FOLDER.
+UPLOAD_SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_THRESHOLD", 1024 * 1024))  # 1MB
+RETAIN_UPLOADS = os.getenv("RETAIN_UPLOADS", "false").lower() in ("1", "true", "yes")
+
+class SpooledRequest(Request):
+    """Request whose file uploads stay in memory up to UPLOAD_SPOOL_THRESHOLD bytes."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_THRESHOLD)
+
+app.request_class = SpooledRequest
+
+# Extracted text is cached by the SHA-256 of the uploaded bytes
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", 256))
+EXTRACTION_CACHE_FOLDER = os.path.join(CACHE_FOLDER, "extraction")
+
+# Enhancement results are cached per (resume, job description, template, model, prompt version)
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")  # memory, sqlite or none
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join(CACHE_FOLDER, "results.sqlite3"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 1000))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 24 * 60 * 60))  # seconds
+
+# Job descriptions registered with POST /api/job-descriptions are kept, with their precomputed
+# analysis, under a content-hash id (SQLite shares them between workers). Postings sent as raw
+# text are analyzed once per process and kept in an LRU of JOB_ANALYSIS_CACHE_ENTRIES.
+JOB_REGISTRY_BACKEND = os.getenv("JOB_REGISTRY_BACKEND", "sqlite")  # memory or sqlite
+JOB_REGISTRY_PATH = os.getenv("JOB_REGISTRY_PATH", os.path.join(CACHE_FOLDER, "job_descriptions.sqlite3"))
+JOB_REGISTRY_MAX_ENTRIES = int(os.getenv("JOB_REGISTRY_MAX_ENTRIES", 10000))
+JOB_REGISTRY_TTL = float(os.getenv("JOB_REGISTRY_TTL", 30 * 24 * 60 * 60))  # seconds
+JOB_ANALYSIS_CACHE_ENTRIES = int(os.getenv("JOB_ANALYSIS_CACHE_ENTRIES", 256))
+JOB_DESCRIPTION_MAX_CHARS = int(os.getenv("JOB_DESCRIPTION_MAX_CHARS", 100000))
+
+# PDFs are rendered on first download and cached by (text, template, format, skills)
+LAZY_PDF_RENDERING = os.getenv("LAZY_PDF_RENDERING", "true").lower() in ("1", "true", "yes")
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # 64MB
+render_cache = RenderCache(RENDER_CACHE_MAX_BYTES)
+
+# Resume text is parsed once into sections, entries, bullets and dates, cached by text hash;
+# both PDF templates and the API's document fields are built from that parse
+DOCUMENT_CACHE_MAX_ENTRIES = int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", 256))
+document_cache = LRUCache(DOCUMENT_CACHE_MAX_ENTRIES)
+
+# Generated files, retained uploads and extraction cache entries are evicted oldest-first
+# after RETENTION_TTL seconds or once the folders together exceed RETENTION_MAX_BYTES
+RETENTION_TTL = float(os.getenv("RETENTION_TTL", 7 * 24 * 60 * 60))
+RETENTION_MAX_BYTES = int(os.getenv("RETENTION_MAX_BYTES", 1024 * 1024 * 1024))  # 1GB
+RETENTION_SWEEP_INTERVAL = float(os.getenv("RETENTION_SWEEP_INTERVAL", 300))
+
+# Stores kept on disk or in SQLite are opened by start_services(), so importing this module
+# touches no files; requests always run after it (create_app() or the ensure_started hook)
+extraction_cache: Optional[ExtractionCache] = None
+result_cache = None  # None also when RESULT_CACHE_BACKEND is "none"
+job_registry: Optional[JobDescriptionRegistry] = None
+retention: Optional[RetentionManager] = None
+
+def open_stores() -> None:
+    """Open the extraction and result caches, the job description registry and the retention index."""
+    global extraction_cache, result_cache, job_registry, retention
+    extraction_cache = ExtractionCache(EXTRACTION_CACHE_FOLDER, EXTRACTION_CACHE_MAX_ENTRIES)
+    result_cache = create_result_cache(
+        RESULT_CACHE_BACKEND, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL, RESULT_CACHE_PATH
+    )
+    job_registry_store = create_result_cache(
+        JOB_REGISTRY_BACKEND, JOB_REGISTRY_MAX_ENTRIES, JOB_REGISTRY_TTL, JOB_REGISTRY_PATH
+    )
+    if job_registry_store is None:
+        job_registry_store = LRUCache(JOB_REGISTRY_MAX_ENTRIES, JOB_REGISTRY_TTL)
+    job_registry = JobDescriptionRegistry(job_registry_store, JOB_ANALYSIS_CACHE_ENTRIES)
+    retention = RetentionManager(
+        [UPLOAD_FOLDER, OUTPUT_FOLDER, EXTRACTION_CACHE_FOLDER], os.path.join(CACHE_FOLDER, "artifacts.sqlite3"),
+        RETENTION_TTL, RETENTION_MAX_BYTES
+    )
+
+# Match scoring engine: "llm" asks Gemini, "local" uses the deterministic keyword scorer,
+# "hybrid" averages both and falls back to the local score when Gemini's answer is unusable
+MATCH_SCORER = os.getenv("MATCH_SCORER", "llm")
+SCORERS = {'llm', 'local', 'hybrid'}
+
+# Background pool for async enhance requests (POST with async=true)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", 16))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", 600))  # seconds
+job_manager = JobManager(JOB_WORKERS, JOB_QUEUE_DEPTH, JOB_RESULT_TTL)
 
-# Call this at startup
-download_fonts()
+# Batch enhancement: items per batch, concurrent Gemini pipelines per batch and items started per minute
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 50))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+BATCH_RATE_PER_MINUTE = float(os.getenv("BATCH_RATE_PER_MINUTE", 30))
+
+# PDFs are set in DejaVu Sans so any Unicode text renders; each TTF is parsed once per process
+# and documents embed only the glyphs they use. Without the fonts, Helvetica (Latin-1) is used.
+font_manager = FontManager(FONTS_FOLDER, "DejaVuSans", {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf"})
+
+def pdf_safe_text(text: str) -> str:
+    """Text as the PDF font can encode it: unchanged for the bundled fonts, Latin-1 for the fallback."""
+    return text if font_manager.unicode else to_pdf_text(text)
+
+def resume_document(text: str) -> ResumeDocument:
+    """The parsed structure of a resume, parsed at most once per distinct text."""
+    key = sha256_digest(text.encode('utf-8'))
+    document = document_cache.get(key)
+    if document is None:
+        document = parse_resume(text)
+        document_cache.set(key, document)
+    return document
+
+def get_model(system_instruction: Optional[str] = None):
+    """Build a Gemini model with the given system instruction, configuring the SDK on first use."""
+    global _genai_configured
+    import google.generativeai as genai
+    if not _genai_configured:
+        with _model_lock:
+            if not _genai_configured:
+                if not GEMINI_API_KEY:
+                    raise ValueError("GEMINI_API_KEY not configured")
+                genai.configure(api_key=GEMINI_API_KEY)
+                _genai_configured = True
+    return genai.GenerativeModel(MODEL_NAME, system_instruction=system_instruction)
+
+llm_backend = create_backend(
+    LLM_BACKEND, get_model, MODEL_NAME, LLM_CASSETTE, LLM_CASSETTE_MODE, LLM_REPLAY_LATENCY,
+    {"latency": LLM_FAKE_LATENCY, "error_rate": LLM_FAKE_ERROR_RATE,
+     "errors": LLM_FAKE_ERRORS, "seed": LLM_FAKE_SEED},
+    {"cache_ttl": GEMINI_CONTEXT_CACHE_TTL, "cache_min_tokens": GEMINI_CONTEXT_CACHE_MIN_TOKENS},
+)
+
+# Every Gemini call goes through this client: deadlines, jittered retries, quota buckets, circuit breaker
+llm = GeminiClient(
+    llm_backend, GEMINI_RPM, GEMINI_TPM, GEMINI_DEADLINE, GEMINI_MAX_RETRIES,
+    breaker=CircuitBreaker(GEMINI_CIRCUIT_THRESHOLD, GEMINI_CIRCUIT_RESET)
+)
+
+chat_sessions = ChatSessionStore(CHAT_SESSION_MAX, CHAT_SESSION_MAX_CHARS, CHAT_SESSION_IDLE_TTL, CHAT_SESSION_HISTORY)
+
+profiler = RequestProfiler(ProfileStore(PROFILE_FOLDER, PROFILE_MAX_STORED), PROFILE_ADMIN_TOKEN)
+
+# Per-stage latency histograms, error counters and in-flight gauges, served on /metrics.
+# Stages are also trace spans of profiled requests.
+instrumentation = Instrumentation(span=profile_span)
+chat_edit_outcomes = instrumentation.registry.counter(
+    "resume_chat_edits_total",
+    "Chat turns that changed the resume, by how: patch applied, patch fell back to a rewrite, or rewrite.",
+    ("outcome",))
+prompt_tokens_saved = instrumentation.registry.counter(
+    "gemini_prompt_tokens_saved_total", "Estimated prompt tokens removed by compaction and trimming.", ("call",))
+prompt_blocks_trimmed = instrumentation.registry.counter(
+    "gemini_prompt_blocks_trimmed_total", "Prompt inputs dropped to fit the token budget.", ("call",))
+
+def collect_llm_metrics():
+    """Gemini client counters, read from llm.stats() at scrape time."""
+    stats = llm.stats()
+    yield ("gemini_tokens_total", "counter", "Gemini tokens from response usage metadata (estimated when missing).",
+           [({"kind": "prompt"}, stats["promptTokens"]), ({"kind": "output"}, stats["outputTokens"]),
+            ({"kind": "cached"}, stats["cachedTokens"]), ({"kind": "total"}, stats["tokensUsed"])])
+    yield ("gemini_calls_total", "counter", "Gemini calls by outcome.",
+           [({"outcome": "attempt"}, stats["attempts"]), ({"outcome": "retry"}, stats["retries"]),
+            ({"outcome": "failure"}, stats["failures"]), ({"outcome": "rejected"}, stats["rejected"])])
+    yield ("gemini_throttled_seconds_total", "counter", "Time Gemini calls waited for quota.",
+           [({}, stats["throttledSeconds"])])
+    yield ("gemini_circuit_open", "gauge", "1 while the Gemini circuit breaker is not closed.",
+           [({}, int(stats["circuit"] != "closed"))])
+
+instrumentation.registry.add_collector(collect_llm_metrics)
+
+class StartupState:
+    """Startup progress reported by the readiness endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = False
+        self.warming_up = False
+        self.warmed_up = False
+        self.warm_up_error: Optional[str] = None
+        self.import_seconds: Optional[float] = None
+        self.startup_seconds: Optional[float] = None
+        self.warm_up_seconds: Optional[float] = None
+
+startup_state = StartupState()
+
+def start_services() -> bool:
+    """Create working folders, open the stores and start background services. Returns False if already started."""
+    with startup_state.lock:
+        if startup_state.started:
+            return False
+        start = time.perf_counter()
+        for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER, TEMPLATE_FOLDER, CACHE_FOLDER,
+                       os.path.join("static", "js"), os.path.join("static", "css")]:
+            os.makedirs(folder, exist_ok=True)
+        open_stores()
+        retention.start(RETENTION_SWEEP_INTERVAL)
+        startup_state.started = True
+        startup_state.startup_seconds = time.perf_counter() - start
+        return True
+
+def warm_up() -> float:
+    """
+    Import the Gemini SDK, document parsers and PDF renderer, build the model client
+    and render a throwaway PDF so the first real request does not pay for it.
+    Makes no network calls. Returns the seconds spent.
+    """
+    start = time.perf_counter()
+    with startup_state.lock:
+        startup_state.warming_up = True
+    try:
+        import PyPDF2  # noqa: F401
+        import pdfminer.high_level  # noqa: F401
+        import docx  # noqa: F401
+        import striprtf.striprtf  # noqa: F401
+        llm_backend.warm_up(SYSTEM_INSTRUCTIONS)
+        generate_pdf("WARM UP\nStartup check", None, "engineering", [], "standard")
+    except Exception as e:
+        logging.error(f"Warm-up failed: {e}")
+        startup_state.warm_up_error = str(e)
+    finally:
+        elapsed = time.perf_counter() - start
+        with startup_state.lock:
+            startup_state.warming_up = False
+            startup_state.warmed_up = startup_state.warm_up_error is None
+            startup_state.warm_up_seconds = elapsed
+    logging.info(f"Warm-up finished in {elapsed * 1000:.0f} ms")
+    return elapsed
+
+def create_app(warm: Optional[bool] = None) -> Flask:
+    """
+    Application factory: validates configuration and starts background services.
+    No network calls are made; pass warm=True (or set WARM_UP) to pre-load heavy libraries.
+    """
+    needs_key = LLM_BACKEND == "gemini" and LLM_CASSETTE_MODE != "replay"
+    if needs_key and not GEMINI_API_KEY:
+        logging.error("GEMINI_API_KEY environment variable not set!")
+        raise ValueError("GEMINI_API_KEY not configured")
+    start_services()
+    if WARM_UP if warm is None else warm:
+        warm_up()
+    logging.info(f"App ready: import {startup_state.import_seconds * 1000:.0f} ms, "
+                 f"startup {startup_state.startup_seconds * 1000:.0f} ms")
+    return app
+
+@app.before_request
+def ensure_started():
+    """Start services for servers that import `app` directly instead of calling create_app()."""
+    if not startup_state.started and start_services() and WARM_UP:
+        # Warm up in the background; /api/ready reports 503 until it finishes
+        startup_state.warming_up = True
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+@app.before_request
+def begin_request_metrics():
+    g.metrics_token = instrumentation.begin_request(request.endpoint or "unmatched")
+
+@app.after_request
+def add_server_timing(response):
+    """Report per-stage timings of API responses and downloads in a Server-Timing header."""
+    instrumentation.set_status(response.status_code)
+    if request.path.startswith(("/api/", "/download/")):
+        timing = instrumentation.server_timing()
+        if timing:
+            response.headers["Server-Timing"] = timing
+    return response
+
+@app.teardown_request
+def end_request_metrics(error=None):
+    token = g.pop("metrics_token", None)
+    if token is not None:
+        instrumentation.end_request(token)
+
+@app.before_request
+def begin_prompt_report():
+    g.prompt_report_token = begin_report()
+
+@app.after_request
+def add_prompt_tokens(response):
+    """Report the estimated prompt tokens this request sent to Gemini and saved by compaction."""
+    report = current_report()
+    if report is not None and report.calls:
+        response.headers["X-Prompt-Tokens"] = f"sent={report.tokens_sent}, saved={report.tokens_saved}"
+    return response
+
+@app.teardown_request
+def end_prompt_report(error=None):
+    token = g.pop("prompt_report_token", None)
+    if token is not None:
+        end_report(token)
+
+def admin_token() -> Optional[str]:
+    return request.headers.get("X-Admin-Token") or request.args.get("admin_token")
+
+@app.before_request
+def begin_profiling():
+    """Profile this request if an admin asked for it."""
+    flag = request.headers.get("X-Profile") or request.args.get("profile") or ""
+    if profiler.enabled and flag.lower() in ("1", "true", "yes") and profiler.is_admin(admin_token()):
+        token = profiler.begin(request.endpoint or "unmatched", request.path)
+        if token is None:
+            return jsonify({"error": "Another request is being profiled; try again shortly"}), 409
+        g.profile_token = token
+
+@app.after_request
+def finish_profiling(response):
+    token = g.pop("profile_token", None)
+    if token is not None:
+        summary = profiler.end(token, response.status_code)
+        if summary:
+            response.headers["X-Profile-Id"] = summary["id"]
+            response.headers["X-Profile-Url"] = url_for('profile_summary', profile_id=summary["id"])
+    return response
+
+@app.teardown_request
+def abandon_profiling(error=None):
+    # Requests that failed before after_request still store what was profiled
+    token = g.pop("profile_token", None)
+    if token is not None:
+        profiler.end(token, 500)
 
 def allowed_file(filename):
     """Check if the file extension is allowed."""
@@ -129,77 +494,547 @@ def enhance_resume():
             return jsonify({"error": "File size exceeds 10MB limit"}), 400
             
         job_description = request.form.get("jobDescription", "")
+        job_description_id = request.form.get("jobDescriptionId")
         template_type = request.form.get("template", "engineering")
         output_format = request.form.get("outputFormat", "standard")  # New parameter for output format
+        bypass_cache = request.form.get("bypassCache", "false").lower() in ("1", "true", "yes")
+        scorer = request.form.get("scorer", MATCH_SCORER)
+
+        if job_description_id:
+            job_description = registered_job_description(job_description_id)
+            if job_description is None:
+                return job_description_not_found(job_description_id)
         
         if not job_description:
             logging.error("Job description is required")
             return jsonify({"error": "Job description is required"}), 400
 
-        # Create a unique filename
+        if scorer not in SCORERS:
+            return jsonify({"error": f"scorer must be one of: {', '.join(sorted(SCORERS))}"}), 400
+
         filename = secure_filename(resume_file.filename)
-        unique_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(filename)[1]
-        secure_filename_with_id = f"{unique_id}{file_extension}"
-        file_path = os.path.join(UPLOAD_FOLDER, secure_filename_with_id)
-        
-        # Save the uploaded file
-        resume_file.save(file_path)
-        logging.info(f"File saved to: {file_path}")
-        
-        # Extract text from the resume
+        file_extension = os.path.splitext(filename)[1].lower()
+        file_bytes = resume_file.read()
+        instrumentation.set_labels(
+            template_type=bounded_label(template_type, TEMPLATE_TYPES),
+            output_format=bounded_label(output_format, OUTPUT_FORMATS),
+            file_type=bounded_label(file_extension, ALLOWED_EXTENSIONS),
+        )
+        run_async = request.form.get("async", request.args.get("async", "false")).lower() in ("1", "true", "yes")
+
+        def run(report_stage=None):
+            return run_enhancement(
+                file_bytes, file_extension, job_description, template_type,
+                output_format, bypass_cache, scorer, report_stage
+            )
+
+        if run_async:
+            # Hand the work to the background pool and return immediately; the job keeps the metric labels
+            context = contextvars.copy_context()
+            try:
+                job = job_manager.submit(lambda job: context.run(run, job.set_stage), render=enhancement_response)
+            except JobQueueFull as e:
+                logging.warning(f"Rejecting enhance request: {e}")
+                response = jsonify({"error": "Server is busy, please retry shortly"})
+                response.headers["Retry-After"] = "5"
+                return response, 503
+
+            status_url = url_for('job_status', job_id=job.id)
+            response = jsonify({"jobId": job.id, "status": job.status, "statusUrl": status_url})
+            response.headers["Location"] = status_url
+            return response, 202
+
         try:
-            resume_text = extract_resume_text(file_path)
-            logging.info("Resume text extracted successfully")
-        except Exception as e:
-            logging.error(f"Error extracting text: {e}")
+            result = run()
+        except PipelineError as e:
+            return error_response(str(e), e.status_code, e.retry_after)
+
+        return jsonify(enhancement_response(result))
+        
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}")
+        return jsonify({"error": str(e)}), 500
+    
+class PipelineError(Exception):
+    """A pipeline failure that maps onto an HTTP error response."""
+
+    def __init__(self, message: str, status_code: int = 500, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def error_response(message: str, status_code: int, retry_after: Optional[float] = None):
+    """JSON error response, with a Retry-After header when the client should back off."""
+    response = jsonify({"error": message})
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(max(1, int(round(retry_after))))
+    return response, status_code
+
+def extract_upload(file_bytes: bytes, file_extension: str) -> str:
+    """
+    Extract text from uploaded bytes through the content-addressed extraction cache.
+    Raises PipelineError if the file cannot be parsed.
+    """
+    # Identical uploads share a content-addressed key, so repeats skip parsing and disk writes
+    cache_key = sha256_digest(file_bytes)
+    resume_text = extraction_cache.get(cache_key)
+
+    if resume_text is not None:
+        logging.info(f"Extraction cache hit: {cache_key}")
+        return resume_text
+
+    # Raw uploads are only kept on disk when retention is switched on
+    file_path = None
+    if RETAIN_UPLOADS:
+        file_path = os.path.join(UPLOAD_FOLDER, f"{cache_key}{file_extension}")
+        if not os.path.exists(file_path):
+            with open(file_path, 'wb') as f:
+                f.write(file_bytes)
+            retention.register(file_path)
+            logging.info(f"File saved to: {file_path}")
+
+    # Extract text from the resume
+    try:
+        resume_text = extract_resume_text(file_bytes, file_extension)
+        cache_path = extraction_cache.put(cache_key, resume_text)
+        if cache_path:
+            retention.register(cache_path)
+        logging.info("Resume text extracted successfully")
+        return resume_text
+    except Exception as e:
+        logging.error(f"Error extracting text: {e}")
+        if file_path:
             os.remove(file_path)  # Clean up the file
-            return jsonify({"error": f"Could not extract text from file: {str(e)}"}), 400
-            
-        # Enhance resume using Gemini API with appropriate template
+        raise PipelineError(f"Could not extract text from file: {str(e)}", 400)
+
+def run_enhancement(file_bytes: bytes, file_extension: str, job_description: str, template_type: str,
+                    output_format: str, bypass_cache: bool = False, scorer: str = MATCH_SCORER,
+                    report_stage=None) -> Dict[str, Any]:
+    """
+    Run the extract -> enhance -> render/score pipeline for one upload.
+    report_stage, if given, is called with the name of each stage as it starts.
+    Raises PipelineError on failure.
+    """
+    report_stage = report_stage or (lambda stage: None)
+    report_stage("extracting")
+    stage_start = time.perf_counter()
+    with instrumentation.stage("extract"):
+        resume_text = extract_upload(file_bytes, file_extension)
+    extract_seconds = time.perf_counter() - stage_start
+
+    result = enhance_extracted_resume(
+        resume_text, job_description, template_type, output_format, bypass_cache, scorer, report_stage
+    )
+    result["timings"] = {"extract": round(extract_seconds * 1000, 1), **result["timings"]}
+    return result
+
+def enhance_extracted_resume(resume_text: str, job_description: str, template_type: str,
+                             output_format: str, bypass_cache: bool = False, scorer: str = MATCH_SCORER,
+                             report_stage=None) -> Dict[str, Any]:
+    """Run the enhance -> render/score part of the pipeline on already extracted text."""
+    report_stage = report_stage or (lambda stage: None)
+    unique_id = str(uuid.uuid4())
+    timings = {}
+
+    # Enhance resume using Gemini API with appropriate template
+    report_stage("enhancing")
+    stage_start = time.perf_counter()
+    with instrumentation.stage("enhance"):
         try:
             enhanced_resume, skills_list, keywords_used = enhance_resume_with_gemini(
-                resume_text, job_description, template_type
+                resume_text, job_description, template_type, use_cache=not bypass_cache
             )
             logging.info("Resume enhanced successfully")
-        except Exception as e:
+        except LLMError as e:
             logging.error(f"Error enhancing resume: {e}")
-            return jsonify({"error": f"Failed to enhance resume: {str(e)}"}), 500
-        
-        # Generate PDF of the enhanced resume with the selected template
-        pdf_filename = f"enhanced_resume_{unique_id}.pdf"
-        pdf_path = os.path.join(OUTPUT_FOLDER, pdf_filename)
-        
-        try:
-            generate_pdf(enhanced_resume, pdf_path, template_type, skills_list, output_format)
-            logging.info(f"PDF generated: {pdf_path}")
+            raise PipelineError(f"Failed to enhance resume: {str(e)}", e.status_code, e.retry_after)
         except Exception as e:
-            logging.error(f"Error generating PDF: {e}")
-            return jsonify({"error": f"PDF generation failed: {str(e)}"}), 500
-
-        # Generate a text version for download
-        txt_filename = f"enhanced_resume_{unique_id}.txt"
-        txt_path = os.path.join(OUTPUT_FOLDER, txt_filename)
-        with open(txt_path, 'w', encoding='utf-8') as f:
-            f.write(enhanced_resume)
-
-        # Generate a match score between resume and job description
-        match_score = calculate_match_score(enhanced_resume, job_description)
-
-        return jsonify({
-            "originalResume": resume_text,
-            "enhancedResume": enhanced_resume,
-            "pdfUrl": url_for('download_resume', filename=pdf_filename, type='pdf'),
-            "txtUrl": url_for('download_resume', filename=txt_filename, type='txt'),
-            "matchScore": match_score,
-            "keywordsUsed": keywords_used,
-            "skills": skills_list
-        })
-        
+            logging.error(f"Error enhancing resume: {e}")
+            raise PipelineError(f"Failed to enhance resume: {str(e)}")
+    timings["enhance"] = time.perf_counter() - stage_start
+    
+    # PDF, text file and match score only depend on the enhanced resume, so run them concurrently
+    pdf_filename = f"enhanced_resume_{unique_id}.pdf"
+    pdf_path = os.path.join(OUTPUT_FOLDER, pdf_filename)
+    txt_filename = f"enhanced_resume_{unique_id}.txt"
+    txt_path = os.path.join(OUTPUT_FOLDER, txt_filename)
+
+    def render_pdf():
+        path = prepare_pdf(enhanced_resume, pdf_path, template_type, skills_list, output_format)
+        # Whatever is still running once the PDF is ready is the score
+        report_stage("scoring")
+        return path
+
+    document = resume_document(enhanced_resume)
+    report_stage("rendering")
+    outcome = run_stages([
+        Stage("pdf", render_pdf),
+        Stage("txt", lambda: write_text_file(enhanced_resume, txt_path)),
+        Stage("score", lambda: score_resume_match(enhanced_resume, job_description, scorer)),
+    ], around=profile_span)
+    instrumentation.observe_outcome(outcome)
+
+    if not outcome.ok("pdf"):
+        raise PipelineError(f"PDF generation failed: {str(outcome.errors['pdf'])}")
+    logging.info(f"PDF prepared: {outcome.results['pdf']}")
+    retention.register(outcome.results["pdf"])
+
+    if not outcome.ok("txt"):
+        raise PipelineError(str(outcome.errors["txt"]))
+    retention.register(txt_path)
+
+    timings.update(outcome.timings)
+    timings.pop("total")
+
+    return {
+        "originalResume": resume_text,
+        "enhancedResume": enhanced_resume,
+        "enhancedDocument": document.to_dict(),
+        "pdfFilename": pdf_filename,
+        "txtFilename": txt_filename,
+        "matchScore": outcome.results["score"]["score"],
+        "matchBreakdown": outcome.results["score"]["breakdown"],
+        "scorer": scorer,
+        "keywordsUsed": keywords_used,
+        "skills": skills_list,
+        "timings": {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+    }
+
+def enhancement_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a run_enhancement result into the API payload with download URLs."""
+    payload = dict(result)
+    payload["pdfUrl"] = url_for('download_resume', filename=payload.pop("pdfFilename"), type='pdf')
+    payload["txtUrl"] = url_for('download_resume', filename=payload.pop("txtFilename"), type='txt')
+    return payload
+
+@app.route("/api/enhance-resume/batch", methods=["POST"])
+def enhance_resume_batch():
+    """
+    Enhance one resume against many job descriptions, or many resumes against one.
+    Returns a manifest with one entry per (resume, job description) pair; failed items
+    are reported individually instead of failing the batch.
+    """
+    try:
+        logging.info("Batch enhance request received")
+
+        resume_files = request.files.getlist("resumes") + request.files.getlist("resume")
+        job_descriptions = [jd for jd in json_list_fields("jobDescriptions", "jobDescription") if jd.strip()]
+        for job_id in [value for value in json_list_fields("jobDescriptionIds", "jobDescriptionId") if value.strip()]:
+            job_description = registered_job_description(job_id)
+            if job_description is None:
+                return job_description_not_found(job_id)
+            job_descriptions.append(job_description)
+
+        template_type = request.form.get("template", "engineering")
+        output_format = request.form.get("outputFormat", "standard")
+        bypass_cache = request.form.get("bypassCache", "false").lower() in ("1", "true", "yes")
+        scorer = request.form.get("scorer", MATCH_SCORER)
+        manifest_format = request.form.get("format", request.args.get("format", "json")).lower()
+        run_async = request.form.get("async", request.args.get("async", "false")).lower() in ("1", "true", "yes")
+
+        if not resume_files:
+            return jsonify({"error": "No resume file uploaded"}), 400
+        if not job_descriptions:
+            return jsonify({"error": "Job description is required"}), 400
+        if len(resume_files) > 1 and len(job_descriptions) > 1:
+            return jsonify({"error": "Send one resume with many job descriptions, or many resumes with one"}), 400
+        if len(resume_files) * len(job_descriptions) > BATCH_MAX_ITEMS:
+            return jsonify({"error": f"A batch can contain at most {BATCH_MAX_ITEMS} items"}), 400
+        if scorer not in SCORERS:
+            return jsonify({"error": f"scorer must be one of: {', '.join(sorted(SCORERS))}"}), 400
+        if manifest_format not in ("json", "jsonl"):
+            return jsonify({"error": "format must be json or jsonl"}), 400
+
+        resumes = []
+        for resume_file in resume_files:
+            if resume_file.filename == '' or not allowed_file(resume_file.filename):
+                return jsonify({"error": f"Only {', '.join(ALLOWED_EXTENSIONS)} files are allowed"}), 400
+            file_bytes = resume_file.read()
+            if len(file_bytes) > MAX_FILE_SIZE:
+                return jsonify({"error": f"{resume_file.filename} exceeds 10MB limit"}), 400
+            filename = secure_filename(resume_file.filename)
+            resumes.append((filename, file_bytes, os.path.splitext(filename)[1].lower()))
+
+        instrumentation.set_labels(
+            template_type=bounded_label(template_type, TEMPLATE_TYPES),
+            output_format=bounded_label(output_format, OUTPUT_FORMATS),
+        )
+        options = {
+            "template_type": template_type,
+            "output_format": output_format,
+            "bypass_cache": bypass_cache,
+            "scorer": scorer,
+        }
+        batch_id = str(uuid.uuid4())
+
+        if run_async:
+            context = contextvars.copy_context()
+            try:
+                job = job_manager.submit(
+                    lambda job: context.run(run_batch, batch_id, resumes, job_descriptions, options, job.set_stage),
+                    render=batch_response
+                )
+            except JobQueueFull as e:
+                logging.warning(f"Rejecting batch request: {e}")
+                response = jsonify({"error": "Server is busy, please retry shortly"})
+                response.headers["Retry-After"] = "5"
+                return response, 503
+
+            status_url = url_for('job_status', job_id=job.id)
+            response = jsonify({"jobId": job.id, "batchId": batch_id, "status": job.status, "statusUrl": status_url})
+            response.headers["Location"] = status_url
+            return response, 202
+
+        if manifest_format == "jsonl":
+            def generate():
+                # One line per item as soon as it finishes, then a summary line
+                succeeded = 0
+                for item in iter_batch_items(resumes, job_descriptions, options):
+                    succeeded += item["status"] == "ok"
+                    yield json.dumps(batch_item_response(item)) + "\n"
+                yield json.dumps({
+                    "batchId": batch_id,
+                    "count": len(resumes) * len(job_descriptions),
+                    "succeeded": succeeded,
+                }) + "\n"
+
+            return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+        return jsonify(batch_response(run_batch(batch_id, resumes, job_descriptions, options)))
+
     except Exception as e:
-        logging.error(f"Unexpected error: {e}")
+        logging.error(f"Unexpected error in batch enhance: {e}")
         return jsonify({"error": str(e)}), 500
-    
+
+def json_list_fields(*names: str) -> List[str]:
+    """Values of repeated form fields, any of which may also be a JSON array of values."""
+    values = []
+    for value in sum((request.form.getlist(name) for name in names), []):
+        if value.strip().startswith("["):
+            try:
+                values.extend(str(item) for item in json.loads(value))
+                continue
+            except json.JSONDecodeError:
+                pass
+        values.append(value)
+    return values
+
+def iter_batch_items(resumes: List[Tuple[str, bytes, str]], job_descriptions: List[str],
+                     options: Dict[str, Any], report_stage=None):
+    """
+    Yield one result dict per (resume, job description) pair as items complete.
+    Each resume is extracted once; enhancements fan out over a bounded pool and
+    are started no faster than BATCH_RATE_PER_MINUTE.
+    """
+    report_stage = report_stage or (lambda stage: None)
+
+    report_stage("extracting")
+    extracted = []
+    for filename, file_bytes, file_extension in resumes:
+        try:
+            with instrumentation.stage("extract", file_type=bounded_label(file_extension, ALLOWED_EXTENSIONS)):
+                extracted.append((extract_upload(file_bytes, file_extension), None))
+        except PipelineError as e:
+            extracted.append((None, str(e)))
+
+    limiter = RateLimiter(BATCH_RATE_PER_MINUTE)
+
+    def process(resume_index: int, jd_index: int) -> Dict[str, Any]:
+        item = {
+            "resumeIndex": resume_index,
+            "resume": resumes[resume_index][0],
+            "jobDescriptionIndex": jd_index,
+        }
+        resume_text, extract_error = extracted[resume_index]
+        if extract_error:
+            item.update(status="error", error=extract_error)
+            return item
+        limiter.acquire()
+        try:
+            result = enhance_extracted_resume(
+                resume_text, job_descriptions[jd_index], options["template_type"],
+                options["output_format"], options["bypass_cache"], options["scorer"]
+            )
+            item.update(status="ok", result=result)
+        except Exception as e:
+            logging.error(f"Batch item {resume_index}/{jd_index} failed: {e}")
+            item.update(status="error", error=str(e))
+        return item
+
+    report_stage("enhancing")
+    pairs = [(r, j) for r in range(len(resumes)) for j in range(len(job_descriptions))]
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_CONCURRENCY, len(pairs))),
+                            thread_name_prefix="batch") as pool:
+        # Each item runs in a copy of this context so its stages keep the request's metric labels
+        futures = [pool.submit(contextvars.copy_context().run, process, r, j) for r, j in pairs]
+        for index, future in enumerate(as_completed(futures)):
+            report_stage(f"enhancing ({index + 1}/{len(pairs)} done)")
+            yield future.result()
+
+def run_batch(batch_id: str, resumes: List[Tuple[str, bytes, str]], job_descriptions: List[str],
+              options: Dict[str, Any], report_stage=None) -> Dict[str, Any]:
+    """Run a whole batch and return its manifest, items ordered by resume then job description."""
+    start = time.perf_counter()
+    items = sorted(
+        iter_batch_items(resumes, job_descriptions, options, report_stage),
+        key=lambda item: (item["resumeIndex"], item["jobDescriptionIndex"])
+    )
+    succeeded = sum(1 for item in items if item["status"] == "ok")
+    return {
+        "batchId": batch_id,
+        "count": len(items),
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "durationMs": round((time.perf_counter() - start) * 1000, 1),
+        "items": items,
+    }
+
+def batch_item_response(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Add download URLs to a successful batch item."""
+    if item["status"] != "ok":
+        return item
+    return {**item, "result": enhancement_response(item["result"])}
+
+def batch_response(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a run_batch manifest into the API payload with download URLs."""
+    return {**manifest, "items": [batch_item_response(item) for item in manifest["items"]]}
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    """Report the stage of a background enhance job, with the result once it is done."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+
+    data = job.to_dict()
+    if job.status == "done":
+        data["result"] = job.render(job.result) if job.render else job.result
+    elif job.status == "failed":
+        return jsonify(data), job.error_status
+    return jsonify(data)
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    """Report hit/miss counters and size limits for the server-side caches."""
+    return jsonify({
+        "extraction": extraction_cache.stats(),
+        "results": result_cache.stats() if result_cache is not None else None,
+        "renders": render_cache.stats(),
+        "fonts": font_manager.stats(),
+        "chatSessions": chat_sessions.stats(),
+        "jobDescriptions": job_registry.stats(),
+        "documents": document_cache.stats()
+    })
+
+@app.route("/api/job-descriptions", methods=["POST"])
+def register_job_description():
+    """
+    Register a job description and precompute its analysis. Enhance, batch and chat
+    requests can then send the returned jobDescriptionId instead of the text.
+    """
+    data = request.get_json(silent=True) or request.form
+    job_description = str(data.get("jobDescription") or "")
+    if not job_description.strip():
+        return jsonify({"error": "Job description is required"}), 400
+    if len(job_description) > JOB_DESCRIPTION_MAX_CHARS:
+        return jsonify({"error": f"Job description exceeds {JOB_DESCRIPTION_MAX_CHARS} characters"}), 400
+
+    entry, created = job_registry.register(job_description)
+    response = jsonify(entry.to_dict())
+    response.headers["Location"] = url_for('get_job_description', job_id=entry.id)
+    return response, 201 if created else 200
+
+@app.route("/api/job-descriptions/<job_id>")
+def get_job_description(job_id):
+    """A registered job description with its analysis."""
+    entry = job_registry.get(job_id)
+    if entry is None:
+        return job_description_not_found(job_id)
+    return jsonify({**entry.to_dict(), "jobDescription": entry.text})
+
+def registered_job_description(job_id: str) -> Optional[str]:
+    """The text of a registered job description, or None if the id is unknown or expired."""
+    entry = job_registry.get(str(job_id))
+    return entry.text if entry is not None else None
+
+def job_description_not_found(job_id: str):
+    return jsonify({
+        "error": f"Job description {job_id} not found or expired; register it again with POST /api/job-descriptions"
+    }), 404
+
+@app.route("/api/llm/stats")
+def llm_stats():
+    """Report Gemini call, retry and throttling counters and the circuit breaker state."""
+    return jsonify(llm.stats())
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus text exposition of stage latencies, error counters, in-flight requests and Gemini usage."""
+    return Response(instrumentation.render(), content_type=METRICS_CONTENT_TYPE)
+
+def require_admin():
+    """Error response unless profiling is configured and the request carries the admin token."""
+    if not profiler.enabled:
+        return jsonify({"error": "Profiling is not enabled"}), 404
+    if not profiler.is_admin(admin_token()):
+        return jsonify({"error": "Admin token required"}), 403
+    return None
+
+@app.route("/api/admin/profiles")
+def list_profiles():
+    """List stored request profiles, newest first."""
+    denied = require_admin()
+    if denied:
+        return denied
+    return jsonify({"profiles": profiler.store.list()})
+
+@app.route("/api/admin/profiles/<profile_id>")
+def profile_summary(profile_id):
+    """Spans and hottest functions of one stored profile."""
+    denied = require_admin()
+    if denied:
+        return denied
+    path = profiler.store.path(profile_id, "json")
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    with open(path, encoding="utf-8") as f:
+        return jsonify(json.load(f))
+
+@app.route("/api/admin/profiles/<profile_id>/download")
+def download_profile(profile_id):
+    """The raw cProfile data (pstats format) of one stored profile."""
+    denied = require_admin()
+    if denied:
+        return denied
+    path = profiler.store.path(profile_id, "prof")
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True,
+                     download_name=f"profile_{profile_id}.prof")
+
+@app.route("/api/ready")
+def readiness():
+    """Readiness probe: 200 once services are started and any requested warm-up has finished."""
+    with startup_state.lock:
+        ready = startup_state.started and not startup_state.warming_up
+        payload = {
+            "ready": ready,
+            "warmedUp": startup_state.warmed_up,
+            "importMs": round(startup_state.import_seconds * 1000, 1),
+        }
+        if startup_state.startup_seconds is not None:
+            payload["startupMs"] = round(startup_state.startup_seconds * 1000, 1)
+        if startup_state.warm_up_seconds is not None:
+            payload["warmUpMs"] = round(startup_state.warm_up_seconds * 1000, 1)
+        if startup_state.warm_up_error:
+            payload["warmUpError"] = startup_state.warm_up_error
+    return jsonify(payload), 200 if ready else 503
+
+@app.route("/api/retention/stats")
+def retention_stats():
+    """Report tracked artifact counts and bytes reclaimed by the retention sweeper."""
+    return jsonify(retention.stats())
+
 @app.route("/download/<filename>/<type>")
 def download_resume(filename, type):
     """Route to download generated resume files."""
@@ -214,17 +1049,31 @@ def download_resume(filename, type):
             
         file_path = os.path.join(OUTPUT_FOLDER, filename)
         
-        # Check if file exists
-        if not os.path.exists(file_path):
-            logging.error(f"File not found: {file_path}")
-            return "File not found", 404
-            
         # Set the appropriate MIME type
         mime_type = "application/pdf" if type == 'pdf' else "text/plain"
         
         # Set a more user-friendly download filename
         download_name = f"Resume.{type}"
         
+        # PDFs deferred by lazy rendering are rendered (or served from the render cache) now
+        spec_path = render_spec_path(file_path)
+        if type == 'pdf' and not os.path.exists(file_path) and os.path.exists(spec_path):
+            pdf_bytes = render_pdf_from_spec(spec_path)
+            return send_file(
+                io.BytesIO(pdf_bytes),
+                mimetype=mime_type,
+                as_attachment=True,
+                download_name=download_name
+            )
+        
+        # Check if file exists
+        if not os.path.exists(file_path):
+            if retention.is_expired(file_path) or retention.is_expired(spec_path):
+                logging.info(f"Expired file requested: {file_path}")
+                return "File has expired", 410
+            logging.error(f"File not found: {file_path}")
+            return "File not found", 404
+            
         return send_file(
             file_path,
             mimetype=mime_type,
@@ -236,311 +1085,175 @@ def download_resume(filename, type):
         logging.error(f"Error downloading file: {e}")
         return "Error downloading file", 500
 
-def extract_resume_text(file_path: str) -> str:
-    """Extract text from a resume file (PDF, DOCX, TXT, or RTF)."""
+def pandoc_to_plain(data: bytes, input_format: str) -> str:
+    """Convert a document to plain text with pandoc, which needs the input on disk."""
+    import subprocess
+    with tempfile.NamedTemporaryFile(suffix=f".{input_format}", delete=False) as f:
+        f.write(data)
+        temp_path = f.name
     try:
-        if file_path.endswith(".pdf"):
-            try:
-                # Try using PyPDF2 first (simpler dependency)
-                from PyPDF2 import PdfReader
-                reader = PdfReader(file_path)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                
-                if text.strip():
-                    return text
-                    
-                # If PyPDF2 fails to extract meaningful text, try pdfminer
-                logging.info("PyPDF2 extraction was empty, trying pdfminer...")
-            except Exception as e:
-                logging.warning(f"PyPDF2 extraction failed: {e}, trying pdfminer...")
-                
-            # Fallback to pdfminer for better text extraction
-            from pdfminer.high_level import extract_text as pdfminer_extract
-            text = pdfminer_extract(file_path)
-            return text if text.strip() else "No text could be extracted from PDF"
+        result = subprocess.run(
+            ["pandoc", "-f", input_format, "-t", "plain", temp_path],
+            capture_output=True, text=True, check=True
+        )
+        return result.stdout
+    finally:
+        os.remove(temp_path)
+
+def extract_resume_text(source: Union[str, bytes, BinaryIO], file_extension: Optional[str] = None) -> str:
+    """
+    Extract text from a resume (PDF, DOCX, TXT, or RTF).
+    source may be a file path, raw bytes or a binary stream; for bytes and streams
+    file_extension selects the format.
+    """
+    try:
+        if isinstance(source, str):
+            file_extension = file_extension or os.path.splitext(source)[1]
+            with open(source, 'rb') as f:
+                data = f.read()
+        elif isinstance(source, (bytes, bytearray)):
+            data = bytes(source)
+        else:
+            data = source.read()
+        file_extension = (file_extension or "").lower().lstrip('.')
+
+        if file_extension == "pdf":
+            # Single pass over the document; pdfminer only re-parses pages PyPDF2 handled badly
+            return extract_pdf_text(data)
             
-        elif file_path.endswith(".docx"):
+        elif file_extension == "docx":
             try:
                 from docx import Document
-                doc = Document(file_path)
+                doc = Document(io.BytesIO(data))
                 return "\n".join([para.text for para in doc.paragraphs])
             except Exception as e:
                 logging.error(f"Error extracting DOCX: {e}")
                 # Try alternative extraction
-                import subprocess
                 try:
                     # Use pandoc if available
-                    result = subprocess.run(
-                        ["pandoc", "-f", "docx", "-t", "plain", file_path],
-                        capture_output=True, text=True, check=True
-                    )
-                    return result.stdout
+                    return pandoc_to_plain(data, "docx")
                 except Exception as e2:
                     logging.error(f"Alternative DOCX extraction failed: {e2}")
                     raise
             
-        elif file_path.endswith(".rtf"):
+        elif file_extension == "rtf":
             try:
                 # First try using striprtf
                 from striprtf.striprtf import rtf_to_text
-                with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                    rtf_text = f.read()
-                return rtf_to_text(rtf_text)
+                return rtf_to_text(decode_text(data))
             except Exception as e:
                 logging.warning(f"striprtf failed: {e}, trying alternative...")
                 # Try using pandoc as fallback
-                import subprocess
                 try:
-                    result = subprocess.run(
-                        ["pandoc", "-f", "rtf", "-t", "plain", file_path],
-                        capture_output=True, text=True, check=True
-                    )
-                    return result.stdout
+                    return pandoc_to_plain(data, "rtf")
                 except Exception as e2:
                     logging.error(f"Alternative RTF extraction failed: {e2}")
                     raise
             
-        elif file_path.endswith(".txt"):
-            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                return f.read()
+        elif file_extension == "txt":
+            return decode_text(data)
         else:
-            raise ValueError(f"Unsupported file format: {file_path}")
+            raise ValueError(f"Unsupported file format: {file_extension or source}")
     except Exception as e:
         logging.error(f"Error in extract_resume_text: {e}")
         raise
 
-def enhance_resume_with_gemini(resume_text: str, job_description: str, template_type: str) -> tuple:
+def decode_text(data: bytes) -> str:
+    """Decode uploaded text as UTF-8 with universal newlines, like reading it in text mode."""
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='replace').read()
+
+def compact_prompt(call: str, template: str, resume_text: str, job_description: str,
+                   extra: List[Block] = ()) -> Compaction:
+    """Compact a Gemini call's inputs to the prompt budget, recording the tokens saved."""
+    with instrumentation.stage("compact"):
+        compaction = compact_inputs(call, template, resume_text, job_description, PROMPT_TOKEN_BUDGET, extra,
+                                    job_registry.analysis(job_description).blocks)
+    prompt_tokens_saved.inc(compaction.tokens_before - compaction.tokens_after, call=call)
+    if compaction.trimmed:
+        prompt_blocks_trimmed.inc(len(compaction.trimmed), call=call)
+    return compaction
+
+def enhance_resume_with_gemini(resume_text: str, job_description: str, template_type: str,
+                               use_cache: bool = True) -> tuple:
     """Enhance the resume text using Gemini API with appropriate template."""
+    cache_key = None
+    if result_cache is not None:
+        cache_key = normalized_key(resume_text, job_description, template_type, MODEL_NAME, PROMPT_VERSION)
+        if use_cache:
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                logging.info(f"Enhancement cache hit: {cache_key}")
+                return cached["enhanced_resume"], cached["skills_list"], cached["keywords_used"]
+
     try:
-        # Select prompt template based on template_type
-        if template_type == "faang":
-            prompt_template = """
-            You are an expert resume editor for FAANG companies (Facebook, Amazon, Apple, Netflix, Google).
-            
-            Please enhance the following resume to target the job description provided. 
-            
-            Focus on:
-            1. Using quantifiable achievements and metrics (add realistic metrics if missing)
-            2. Highlighting technical skills and projects relevant to the job
-            3. Using action verbs and demonstrating impact
-            4. Removing irrelevant information
-            5. Organizing content for maximum readability
-            6. Using STAR methodology (Situation, Task, Action, Result) for experiences
-            7. Making sure the resume is ATS-friendly (Applicant Tracking System)
-            8. Adding relevant keywords from the job description
-            9. Improving the professional summary for maximum impact
-            
-            Resume to enhance:
-            ```
-            {resume_text}
-            ```
-            
-            Job Description:
-            ```
-            {job_description}
-            ```
-            
-            First, identify the key skills and keywords in the job description. Then, enhance the resume to highlight these skills.
-            
-            Your output must be in this JSON format:
-            {{
-                "enhanced_resume": "The complete enhanced resume as plain text with professional formatting",
-                "skills_list": ["Skill 1", "Skill 2", "Skill 3"...],  // List of 5-10 most important skills from the resume
-                "keywords_used": ["Keyword 1", "Keyword 2", "Keyword 3"...]  // List of keywords from job description used in the resume
-            }}
-            
-            Ensure the enhanced resume maintains professional formatting in plain text.
-            """
-        elif template_type == "non-tech":
-            prompt_template = """
-            You are an expert resume editor for non-technical professionals.
-            
-            Please enhance the following resume to target the job description provided.
-            
-            Focus on:
-            1. Highlighting transferable skills and relevant accomplishments
-            2. Using industry-specific terminology from the job description
-            3. Emphasizing soft skills and interpersonal abilities
-            4. Quantifying achievements whenever possible (add realistic metrics if missing)
-            5. Ensuring clear organization and professional formatting
-            6. Tailoring the professional summary to match the job requirements
-            7. Making sure the resume is ATS-friendly (Applicant Tracking System)
-            8. Using action verbs that demonstrate leadership and initiative
-            9. Highlighting relevant certifications or training
-            
-            Resume to enhance:
-            ```
-            {resume_text}
-            ```
-            
-            Job Description:
-            ```
-            {job_description}
-            ```
-            
-            First, identify the key skills and keywords in the job description. Then, enhance the resume to highlight these skills.
-            
-            Your output must be in this JSON format:
-            {{
-                "enhanced_resume": "The complete enhanced resume as plain text with professional formatting",
-                "skills_list": ["Skill 1", "Skill 2", "Skill 3"...],  // List of 5-10 most important skills from the resume
-                "keywords_used": ["Keyword 1", "Keyword 2", "Keyword 3"...]  // List of keywords from job description used in the resume
-            }}
-            
-            Ensure the enhanced resume maintains professional formatting in plain text.
-            """
-        else:  # Default to engineering template
-            prompt_template = """
-            You are an expert resume editor for engineering professionals.
-            
-            Please enhance the following resume to target the job description provided.
-            
-            Focus on:
-            1. Highlighting relevant technical skills and engineering achievements
-            2. Using proper engineering terminology aligned with the job description
-            3. Emphasizing problem-solving abilities and technical solutions
-            4. Quantifying results and impact where possible (add realistic metrics if missing)
-            5. Organizing content for maximum readability
-            6. Including relevant projects, technologies, and methodologies
-            7. Making sure the resume is ATS-friendly (Applicant Tracking System)
-            8. Adding relevant keywords from the job description
-            9. Creating a compelling professional summary
-            
-            Resume to enhance:
-            ```
-            {resume_text}
-            ```
-            
-            Job Description:
-            ```
-            {job_description}
-            ```
-            
-            First, identify the key skills and keywords in the job description. Then, enhance the resume to highlight these skills.
-            
-            Your output must be in this JSON format:
-            {{
-                "enhanced_resume": "The complete enhanced resume as plain text with professional formatting",
-                "skills_list": ["Skill 1", "Skill 2", "Skill 3"...],  // List of 5-10 most important skills from the resume
-                "keywords_used": ["Keyword 1", "Keyword 2", "Keyword 3"...]  // List of keywords from job description used in the resume
-            }}
-            
-            Ensure the enhanced resume maintains professional formatting in plain text.
-            """
-        
-        # Format the prompt with the actual resume and job description
-        formatted_prompt = prompt_template.format(
-            resume_text=resume_text,
-            job_description=job_description
+        # The template's fixed instructions are its model's system instruction; only the inputs are sent
+        instruction = ENHANCE_INSTRUCTIONS.get(template_type, ENHANCE_INSTRUCTIONS["engineering"])
+        compaction = compact_prompt("enhance", ENHANCE_INPUT, resume_text, job_description)
+        formatted_prompt = ENHANCE_INPUT.format(
+            resume_text=compaction.resume_text,
+            job_description=compaction.job_description
         )
         
         # Use Gemini Pro to generate the enhanced resume
-        response = model.generate_content(
-            contents=formatted_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.2,  # Lower temperature for more consistent results
-                max_output_tokens=4000,  # Higher token limit for longer resumes
-                response_mime_type="application/json"  # Request JSON response
-            )
+        response_text = llm.generate(
+            formatted_prompt,
+            system=instruction,
+            temperature=0.2,  # Lower temperature for more consistent results
+            max_output_tokens=4000,  # Higher token limit for longer resumes
+            response_mime_type="application/json"  # Request JSON response
         )
         
         # Check if we have a valid response
-        if not response.text:
+        if not response_text:
             logging.error("Empty or invalid response from Gemini API")
             return "Error: Could not generate enhanced resume. Please try again.", [], []
         
         # Parse the JSON response
         try:
-            result = json.loads(response.text)
+            result = json.loads(response_text)
             enhanced_resume = result.get("enhanced_resume", "")
             skills_list = result.get("skills_list", [])
             keywords_used = result.get("keywords_used", [])
             
-            # Clean the enhanced resume text
-            enhanced_resume = enhanced_resume.strip()
+            # Strip code fences and markdown formatting in one pass
+            enhanced_resume = clean_resume_text(enhanced_resume)
             
-            # Remove any markdown code blocks if present
-            enhanced_resume = re.sub(r'```[a-z]*\n', '', enhanced_resume)
-            enhanced_resume = enhanced_resume.replace('```', '')
-            
-            # Remove all markdown formatting
-            enhanced_resume = re.sub(r'\*\*', '', enhanced_resume)  # Remove bold formatting
-            enhanced_resume = re.sub(r'\*', '', enhanced_resume)    # Remove italic formatting
-            enhanced_resume = re.sub(r'__', '', enhanced_resume)    # Remove underscore bold
-            enhanced_resume = re.sub(r'_', '', enhanced_resume)     # Remove underscore italic
+            # Only well-formed results are cached; fallbacks and errors are retried next time
+            if cache_key is not None and enhanced_resume:
+                result_cache.set(cache_key, {
+                    "enhanced_resume": enhanced_resume,
+                    "skills_list": skills_list,
+                    "keywords_used": keywords_used
+                })
             
             return enhanced_resume, skills_list, keywords_used
             
         except json.JSONDecodeError:
             logging.error("Failed to parse JSON response from Gemini API")
             # Fallback to basic text extraction
-            cleaned_text = response.text.strip()
-            cleaned_text = re.sub(r'```[a-z]*\n', '', cleaned_text)
-            cleaned_text = cleaned_text.replace('```', '')
-            
-            # Remove all markdown formatting
-            cleaned_text = re.sub(r'\*\*', '', cleaned_text)  # Remove bold formatting
-            cleaned_text = re.sub(r'\*', '', cleaned_text)    # Remove italic formatting
-            cleaned_text = re.sub(r'__', '', cleaned_text)    # Remove underscore bold
-            cleaned_text = re.sub(r'_', '', cleaned_text)     # Remove underscore italic
-            
-            return cleaned_text, [], []
+            return clean_resume_text(response_text), [], []
             
+    except LLMError:
+        raise
     except Exception as e:
         logging.error(f"Error in Gemini API call: {e}")
         raise ValueError(f"Failed to enhance resume: {str(e)}")
 
-def generate_pdf(text: str, output_path: str, template_type: str = "engineering", 
-                skills_list: list = None, output_format: str = "standard") -> None:
-    """Generate a professionally formatted PDF with the enhanced resume."""
+def generate_pdf(text: str, output_path: Optional[str], template_type: str = "engineering", 
+                skills_list: list = None, output_format: str = "standard") -> Optional[bytes]:
+    """
+    Generate a professionally formatted PDF with the enhanced resume.
+    Writes to output_path, or returns the PDF bytes when output_path is None.
+    """
     try:
-        # Final cleanup of any markdown formatting before generating PDF
-        def clean_markdown(text):
-            # Remove any remaining markdown formatting
-            text = re.sub(r'\*\*', '', text)  # Remove bold formatting
-            text = re.sub(r'\*', '', text)    # Remove italic formatting
-            text = re.sub(r'__', '', text)    # Remove underscore bold
-            text = re.sub(r'_', '', text)     # Remove underscore italic
-            text = re.sub(r'##+\s', '', text) # Remove heading markers
-            text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)  # Replace [text](url) with just text
-            return text
-            
-        # Clean the text before proceeding
-        text = clean_markdown(text)
-        
-        # Create a function to clean text for PDF
-        def clean_text_for_pdf(text):
-            # First clean any markdown that might be in the line
-            text = clean_markdown(text)
-            
-            # Replace common Unicode characters with ASCII equivalents
-            replacements = {
-                '\u2013': '-',  # en-dash
-                '\u2014': '--',  # em-dash
-                '\u2018': "'",  # left single quote
-                '\u2019': "'",  # right single quote
-                '\u201c': '"',  # left double quote
-                '\u201d': '"',  # right double quote
-                '\u2022': '*',  # bullet
-                '\u2026': '...',  # ellipsis
-                '\u00a0': ' ',  # non-breaking space
-            }
-            
-            for unicode_char, ascii_char in replacements.items():
-                text = text.replace(unicode_char, ascii_char)
-                
-            # Final fallback - replace any remaining non-Latin1 chars
-            return text.encode('latin-1', 'replace').decode('latin-1')
-        
         # Set PDF template based on template_type and output_format
         if output_format == "modern":
             # Use a modern template with better styling
-            generate_modern_pdf(text, output_path, template_type, skills_list)
+            return generate_modern_pdf(text, output_path, template_type, skills_list)
         else:
             # Standard template with basic formatting
-            pdf = FPDF(orientation='P', unit='mm', format='A4')
+            font = font_manager.font_family
+            pdf = font_manager.document_class()(orientation='P', unit='mm', format='A4')
             pdf.add_page()
             
             # Set margins
@@ -561,7 +1274,7 @@ def generate_pdf(text: str, output_path: str, template_type: str = "engineering"
             pdf.rect(0, 0, 210, 15, 'F')
                 
             # Add title
-            pdf.set_font("Arial", "B", 16)
+            pdf.set_font(font, "B", 16)
             pdf.set_text_color(255, 255, 255)  # White text
             pdf.cell(0, 10, "Enhanced Resume", 0, 1, "C")
             
@@ -569,91 +1282,62 @@ def generate_pdf(text: str, output_path: str, template_type: str = "engineering"
             pdf.set_text_color(0, 0, 0)
             pdf.ln(10)
             
-            # Add resume content
-            pdf.set_font("Arial", "", 10)
-            
-            # Split the text by lines and clean each line
-            lines = text.split('\n')
-            
-            # Process sections
-            current_section = ""
-            
-            for line in lines:
-                # Clean the line
-                clean_line = clean_text_for_pdf(line)
-                
-                # Check if line is a section heading (uppercase)
-                if clean_line.strip() and clean_line.strip().isupper():
-                    current_section = clean_line.strip()
-                    
+            # Render from the parsed document; each line sets the font it needs, and
+            # set_font is a no-op when that is the font already in use. Multi-line cells
+            # return to the left margin so a following line has the full width.
+            for section_index, section in enumerate(resume_document(text).sections):
+                if section_index:
+                    pdf.ln(3)
+                if section.title:
                     # Add spacing before section (except first section)
                     if pdf.get_y() > 30:
                         pdf.ln(5)
                         
                     # Add section heading with styling
-                    pdf.set_font("Arial", "B", 12)
+                    pdf.set_font(font, "B", 12)
                     pdf.set_text_color(*header_color)
-                    pdf.cell(0, 8, clean_line, 0, 1)
+                    pdf.cell(0, 8, pdf_safe_text(section.title), 0, 1)
                     pdf.set_text_color(0, 0, 0)  # Reset to black
                     
                     # Add underline
                     y_position = pdf.get_y()
                     pdf.line(15, y_position, 195, y_position)
                     pdf.ln(2)
-                    
-                    # Reset font
-                    pdf.set_font("Arial", "", 10)
-                else:
-                    # Process line based on content
-                    if clean_line.strip():  # Skip empty lines
-                        # Check for bullet points
-                        if clean_line.strip().startswith('•') or clean_line.strip().startswith('-') or clean_line.strip().startswith('*'):
+
+                for entry_index, entry in enumerate(section.entries):
+                    if entry_index:
+                        pdf.ln(3)
+                    for line in entry.lines:
+                        if line.kind == "bullet":
                             # Format bullet points with indentation
-                            pdf.set_x(20)  # Indent
-                            pdf.multi_cell(0, 5, clean_line)
+                            pdf.set_font(font, "", 10)
+                            pdf.set_x(20)
                         else:
-                            # Check for likely job titles or dates (bold them)
-                            if re.search(r'\b(19|20)\d{2}\b', clean_line) or re.search(r'\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\b', clean_line):
-                                pdf.set_font("Arial", "B", 10)
-                                pdf.multi_cell(0, 5, clean_line)
-                                pdf.set_font("Arial", "", 10)
-                            else:
-                                # Normal text
-                                pdf.multi_cell(0, 5, clean_line)
-                    else:
-                        # Empty line - add some spacing
-                        pdf.ln(3)
+                            # Likely job titles or dates are bold
+                            pdf.set_font(font, "B" if line.dated else "", 10)
+                        pdf.multi_cell(0, 5, pdf_safe_text(line.text), new_x="LMARGIN", new_y="NEXT")
             
             # Add footer
             pdf.set_y(-15)
-            pdf.set_font("Arial", "I", 8)
+            pdf.set_font(font, "I", 8)
             pdf.cell(0, 10, f"Generated on {datetime.now().strftime('%Y-%m-%d')}", 0, 0, "C")
             
             # Save the PDF
+            if output_path is None:
+                return bytes(pdf.output())
             pdf.output(output_path)
             
     except Exception as e:
         logging.error(f"Error generating PDF: {e}")
         raise
 
-def generate_modern_pdf(text: str, output_path: str, template_type: str, skills_list: list = None) -> None:
-    """Generate a modern-looking PDF with better styling and layout."""
+def generate_modern_pdf(text: str, output_path: Optional[str], template_type: str,
+                        skills_list: list = None) -> Optional[bytes]:
+    """Generate a modern-looking PDF with better styling and layout (bytes when output_path is None)."""
     try:
-        # Clean any markdown formatting first
-        def clean_markdown(text):
-            # Remove any remaining markdown formatting
-            text = re.sub(r'\*\*', '', text)  # Remove bold formatting
-            text = re.sub(r'\*', '', text)    # Remove italic formatting
-            text = re.sub(r'__', '', text)    # Remove underscore bold
-            text = re.sub(r'_', '', text)     # Remove underscore italic
-            text = re.sub(r'##+\s', '', text) # Remove heading markers
-            text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)  # Replace [text](url) with just text
-            return text
-            
-        # Clean the text before proceeding
-        text = clean_markdown(text)
-        
-        class ModernPDF(FPDF):
+        font = font_manager.font_family
+
+        class ModernPDF(font_manager.document_class()):
             def header(self):
                 # Header with styling based on template type
                 if template_type == "faang":
@@ -670,7 +1354,7 @@ def generate_modern_pdf(text: str, output_path: str, template_type: str, skills_
                 self.rect(0, 0, 210, 20, 'F')
                 
                 # Add title
-                self.set_font('Arial', 'B', 18)
+                self.set_font(font, 'B', 18)
                 self.set_text_color(255, 255, 255)
                 self.cell(0, 15, "Professional Resume", 0, 1, 'C')
                 
@@ -691,7 +1375,7 @@ def generate_modern_pdf(text: str, output_path: str, template_type: str, skills_
             def footer(self):
                 # Go to bottom of page
                 self.set_y(-15)
-                self.set_font('Arial', 'I', 8)
+                self.set_font(font, 'I', 8)
                 self.set_text_color(128, 128, 128)  # Gray
                 
                 # Add page number and date
@@ -702,30 +1386,6 @@ def generate_modern_pdf(text: str, output_path: str, template_type: str, skills_
         pdf.set_auto_page_break(auto=True, margin=15)
         pdf.add_page()
         
-        # Create a function to clean text for PDF
-        def clean_text_for_pdf(text):
-            # Replace common Unicode characters with ASCII equivalents
-            replacements = {
-                '\u2013': '-',  # en-dash
-                '\u2014': '--',  # em-dash
-                '\u2018': "'",  # left single quote
-                '\u2019': "'",  # right single quote
-                '\u201c': '"',  # left double quote
-                '\u201d': '"',  # right double quote
-                '\u2022': '*',  # bullet
-                '\u2026': '...',  # ellipsis
-                '\u00a0': ' ',  # non-breaking space
-            }
-            
-            for unicode_char, ascii_char in replacements.items():
-                text = text.replace(unicode_char, ascii_char)
-                
-            # Final fallback - replace any remaining non-Latin1 chars
-            return text.encode('latin-1', 'replace').decode('latin-1')
-        
-        # Split the text by lines and clean
-        lines = text.split('\n')
-        
         # Set color based on template type
         if template_type == "faang":
             section_color = (66, 133, 244)  # Google blue
@@ -734,30 +1394,19 @@ def generate_modern_pdf(text: str, output_path: str, template_type: str, skills_
         else:  # engineering
             section_color = (76, 175, 80)  # Green
         
-        # Process sections
-        current_section = ""
-        in_bullet_list = False
-        
-        for line in lines:
-            # Clean the line
-            clean_line = clean_text_for_pdf(line)
-            
-            # Skip empty lines
-            if not clean_line.strip():
+        # Render from the parsed document; each line sets the font it needs, and
+        # set_font is a no-op when that is the font already in use. Multi-line cells
+        # return to the left margin so a following line has the full width.
+        for section_index, section in enumerate(resume_document(text).sections):
+            if section_index:
                 pdf.ln(2)
-                in_bullet_list = False
-                continue
-            
-            # Check if line is a section heading (uppercase)
-            if clean_line.strip() and clean_line.strip().isupper():
-                current_section = clean_line.strip()
-                
+            if section.title:
                 # Add spacing before section (except first section)
                 if pdf.get_y() > 40:
                     pdf.ln(5)
                 
                 # Add section heading with styling
-                pdf.set_font("Arial", "B", 12)
+                pdf.set_font(font, "B", 12)
                 pdf.set_text_color(*section_color)
                 
                 # Add small rectangle before section title
@@ -765,7 +1414,7 @@ def generate_modern_pdf(text: str, output_path: str, template_type: str, skills_
                 pdf.rect(10, current_y, 4, 6, 'F')
                 pdf.set_x(16)  # Move text position after rectangle
                 
-                pdf.cell(0, 6, clean_line, 0, 1)
+                pdf.cell(0, 6, pdf_safe_text(section.title), 0, 1)
                 
                 # Add underline
                 y_position = pdf.get_y() + 1
@@ -774,51 +1423,43 @@ def generate_modern_pdf(text: str, output_path: str, template_type: str, skills_
                 
                 # Reset text color to black
                 pdf.set_text_color(0, 0, 0)
-                in_bullet_list = False
-                
-            else:
-                # Process special lines
-                # Job titles or dates (bold them)
-                if re.search(r'\b(19|20)\d{2}\b', clean_line) or re.search(r'\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\b', clean_line):
-                    pdf.set_font("Arial", "B", 11)
-                    pdf.cell(0, 6, clean_line, 0, 1)
-                    pdf.set_font("Arial", "", 10)
-# Reset to normal font
-                    pdf.set_font("Arial", "", 10)
-                    in_bullet_list = False
-                
-                # Check for bullet points
-                elif clean_line.strip().startswith('•') or clean_line.strip().startswith('-') or clean_line.strip().startswith('*'):
-                    if not in_bullet_list:
-                        # Start a new bullet list with some spacing
-                        pdf.ln(1)
-                    
-                    # Format bullet point with proper indentation
-                    pdf.set_x(15)  # Indent
-                    pdf.set_font("Arial", "", 10)
-                    pdf.multi_cell(0, 5, clean_line, 0, 'L')
-                    in_bullet_list = True
-                
-                # Regular text - handle based on content
-                else:
-                    # Check if it might be a company or organization name
-                    if clean_line.strip() and pdf.get_font()[1] != 'B' and current_section.lower().find("experience") >= 0:
-                        pdf.set_font("Arial", "B", 10)
+
+            # Company and organization names in experience sections are bold
+            in_experience = "experience" in section.title.lower()
+            for entry_index, entry in enumerate(section.entries):
+                if entry_index:
+                    pdf.ln(2)
+                previous_kind = None
+                for line in entry.lines:
+                    clean_line = pdf_safe_text(line.text)
+                    if line.dated:
+                        # Job titles or dates (bold them)
+                        pdf.set_font(font, "B", 11)
+                        pdf.cell(0, 6, clean_line, 0, 1)
+                    elif line.kind == "bullet":
+                        if previous_kind != "bullet":
+                            # Start a new bullet list with some spacing
+                            pdf.ln(1)
+                        
+                        # Format bullet point with proper indentation
+                        pdf.set_x(15)  # Indent
+                        pdf.set_font(font, "", 10)
+                        pdf.multi_cell(0, 5, clean_line, 0, 'L', new_x="LMARGIN", new_y="NEXT")
+                    elif in_experience:
+                        pdf.set_font(font, "B", 10)
                         pdf.cell(0, 6, clean_line, 0, 1)
-                        pdf.set_font("Arial", "", 10)
                     else:
                         # Normal paragraph text
-                        pdf.set_font("Arial", "", 10)
-                        pdf.multi_cell(0, 5, clean_line, 0, 'L')
-                    
-                    in_bullet_list = False
+                        pdf.set_font(font, "", 10)
+                        pdf.multi_cell(0, 5, clean_line, 0, 'L', new_x="LMARGIN", new_y="NEXT")
+                    previous_kind = "dated" if line.dated else line.kind
                 
         # Add skills section if available
         if skills_list and len(skills_list) > 0:
             pdf.add_page()
             
             # Add skills section header
-            pdf.set_font("Arial", "B", 12)
+            pdf.set_font(font, "B", 12)
             pdf.set_text_color(*section_color)
             
             # Add small rectangle before section title
@@ -842,64 +1483,50 @@ def generate_modern_pdf(text: str, output_path: str, template_type: str, skills_
             
             # First column
             pdf.set_x(20)
-            pdf.set_font("Arial", "", 10)
+            pdf.set_font(font, "", 10)
             
             for i, skill in enumerate(skills_list):
                 if i < skills_per_column:
                     pdf.set_x(20)
-                    pdf.cell(column_width, 8, f"• {skill}", 0, 1)
+                    pdf.cell(column_width, 8, pdf_safe_text(f"• {skill}"), 0, 1)
                 else:
                     if i == skills_per_column:
                         # Reset Y position for second column
                         pdf.set_y(pdf.get_y() - (8 * skills_per_column))
                     
                     pdf.set_x(120)
-                    pdf.cell(column_width, 8, f"• {skill}", 0, 1)
+                    pdf.cell(column_width, 8, pdf_safe_text(f"• {skill}"), 0, 1)
         
         # Save the PDF
+        if output_path is None:
+            return bytes(pdf.output())
         pdf.output(output_path)
         
     except Exception as e:
         logging.error(f"Error generating modern PDF: {e}")
         raise
 
-def calculate_match_score(resume_text: str, job_description: str) -> int:
-    """Calculate a match score between the resume and job description."""
+def calculate_match_score(resume_text: str, job_description: str, strict: bool = False) -> Optional[int]:
+    """
+    Calculate a match score between the resume and job description using Gemini.
+    With strict=True, returns None instead of a default score when Gemini's answer is unusable.
+    """
     try:
         # Use Gemini to calculate the match score
-        prompt = f"""
-        You are an expert ATS (Applicant Tracking System) analyzer. Please evaluate how well this resume 
-        matches the job description. Calculate a score from 0-100 based on:
-        
-        1. Keyword match (how many important keywords from the job description appear in the resume)
-        2. Skills alignment (how well the candidate's skills match the required and preferred skills)
-        3. Experience relevance (how relevant the candidate's experience is to the role)
-        4. Education/certification match (if applicable)
-        
-        Resume:
-        ```
-        {resume_text}
-        ```
-        
-        Job Description:
-        ```
-        {job_description}
-        ```
-        
-        Return only a single integer score between 0 and 100. Do not include any explanations.
-        """
-        
-        # Use lower temperature for more consistent results
-        response = model.generate_content(
-            contents=prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.1,
-                max_output_tokens=10
-            )
+        compaction = compact_prompt("score", SCORE_INPUT, resume_text, job_description)
+        prompt = SCORE_INPUT.format(
+            resume_text=compaction.resume_text,
+            job_description=compaction.job_description
         )
         
-        # Extract the score from the response
-        score_text = response.text.strip()
+        # Use lower temperature for more consistent results
+        score_text = llm.generate(
+            prompt,
+            deadline_seconds=GEMINI_SCORE_DEADLINE,
+            system=SCORE_INSTRUCTION,
+            temperature=0.1,
+            max_output_tokens=10
+        ).strip()
         
         # Try to convert to integer
         try:
@@ -913,23 +1540,86 @@ def calculate_match_score(resume_text: str, job_description: str) -> int:
         except ValueError:
             # Fallback value if response is not a valid integer
             logging.warning(f"Invalid match score response: {score_text}")
-            return 65  # Default middle-range score
+            return None if strict else 65  # Default middle-range score
             
     except Exception as e:
         logging.error(f"Error calculating match score: {e}")
-        return 50  # Default score on error
+        return None if strict else 50  # Default score on error
+
+def score_resume_match(resume_text: str, job_description: str, scorer: str = MATCH_SCORER) -> Dict[str, Any]:
+    """Score the resume against the job description with the selected engine."""
+    if scorer == "llm":
+        return {"score": calculate_match_score(resume_text, job_description), "breakdown": None}
+
+    local_result = score_resume(resume_text, job_description, job_registry.analysis(job_description).terms)
+    if scorer == "local":
+        return local_result
+
+    llm_score = calculate_match_score(resume_text, job_description, strict=True)
+    if llm_score is None:
+        logging.warning("Hybrid scoring fell back to the local score")
+        return local_result
+    return {"score": round((llm_score + local_result["score"]) / 2), "breakdown": local_result["breakdown"]}
+
+def render_spec_path(pdf_path: str) -> str:
+    """Path of the render spec stored in place of a lazily rendered PDF."""
+    return os.path.splitext(pdf_path)[0] + ".render.json"
+
+def prepare_pdf(text: str, pdf_path: str, template_type: str, skills_list: list, output_format: str) -> str:
+    """
+    Make a resume PDF available at pdf_path. With lazy rendering only a small render
+    spec is written and the PDF is produced on first download.
+    Returns the path of the file written.
+    """
+    if not LAZY_PDF_RENDERING:
+        generate_pdf(text, pdf_path, template_type, skills_list, output_format)
+        return pdf_path
+
+    spec_path = render_spec_path(pdf_path)
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "text": text,
+            "templateType": template_type,
+            "outputFormat": output_format,
+            "skills": skills_list or []
+        }, f)
+    render_cache.record_deferred()
+    return spec_path
+
+def render_pdf_from_spec(spec_path: str) -> bytes:
+    """Render the PDF described by a render spec, reusing identical earlier renders."""
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    key = normalized_key(
+        sha256_digest(spec["text"].encode('utf-8')), spec["templateType"],
+        spec["outputFormat"], json.dumps(spec["skills"])
+    )
+
+    def render() -> bytes:
+        with instrumentation.stage("render", template_type=bounded_label(spec["templateType"], TEMPLATE_TYPES),
+                                   output_format=bounded_label(spec["outputFormat"], OUTPUT_FORMATS)):
+            return generate_pdf(spec["text"], None, spec["templateType"], spec["skills"], spec["outputFormat"])
+
+    return render_cache.get_or_render(key, render)
+
+def write_text_file(text: str, output_path: str) -> None:
+    """Write the plain-text version of a resume for download."""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(text)
 
 # Additional helper functions for handling images and visual elements
 def create_text_image(text, width=800, height=1000, bg_color=(255, 255, 255), 
                      text_color=(0, 0, 0), font_size=14):
     """Create an image containing formatted text."""
+    from PIL import Image, ImageDraw, ImageFont
+
     # Create a blank image
     image = Image.new('RGB', (width, height), color=bg_color)
     draw = ImageDraw.Draw(image)
     
     # Try to load a font, fallback to default if not available
     try:
-        font_path = os.path.join(FONTS_FOLDER, "Roboto-Regular.ttf")
+        font_path = font_manager.regular_path
         font = ImageFont.truetype(font_path, font_size)
     except Exception:
         # Use default font
@@ -966,6 +1656,66 @@ def image_to_base64(image):
     image.save(buffered, format="PNG")
     return base64.b64encode(buffered.getvalue()).decode()
 
+def parse_chat_request(data: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Validate a chat request body; returns (fields, error message).
+    The first turn sends resumeText and jobDescription (or a registered jobDescriptionId);
+    later turns send sessionId instead.
+    """
+    if not data:
+        return None, "No data provided"
+        
+    fields = {
+        "user_message": data.get("message", ""),
+        "session_id": data.get("sessionId"),
+        "resume_text": data.get("resumeText", ""),
+        "job_description": data.get("jobDescription", ""),
+        "job_description_id": data.get("jobDescriptionId"),
+        "template_type": data.get("template"),
+        "output_format": data.get("outputFormat"),
+        "scorer": data.get("scorer"),
+    }
+    
+    if not fields["user_message"]:
+        return None, "Message is required"
+        
+    if not fields["resume_text"] and not fields["session_id"]:
+        return None, "Resume text is required"
+
+    if fields["scorer"] is not None and fields["scorer"] not in SCORERS:
+        return None, f"scorer must be one of: {', '.join(sorted(SCORERS))}"
+
+    if fields["job_description_id"]:
+        fields["job_description"] = registered_job_description(fields["job_description_id"])
+    
+    return fields, None
+
+def open_chat_session(fields: Dict[str, Any]) -> Optional[ChatSession]:
+    """
+    The session a chat turn belongs to: the one named by sessionId (None if it expired),
+    or a new one holding the posted resume and job description.
+    """
+    if not fields["session_id"]:
+        return chat_sessions.create(
+            fields["resume_text"], fields["job_description"], fields["template_type"] or "engineering",
+            fields["output_format"] or "standard", fields["scorer"] or MATCH_SCORER
+        )
+
+    session = chat_sessions.get(fields["session_id"])
+    if session is None:
+        return None
+    # Anything sent along with the session id replaces what the session holds
+    with session.lock:
+        for name in ("resume_text", "job_description", "template_type", "output_format", "scorer"):
+            if fields[name]:
+                setattr(session, name, fields[name])
+    return session
+
+def session_not_found():
+    return jsonify({
+        "error": "Chat session not found or expired; send resumeText and jobDescription to start a new one"
+    }), 404
+
 @app.route("/api/chat-with-resume", methods=["POST"])
 def chat_with_resume():
     """API endpoint to chat with and modify a resume using Gemini."""
@@ -973,103 +1723,37 @@ def chat_with_resume():
         logging.info("Chat with resume request received")
         
         # Get data from the request
-        data = request.json
-        if not data:
-            return jsonify({"error": "No data provided"}), 400
-            
-        user_message = data.get("message", "")
-        resume_text = data.get("resumeText", "")
-        job_description = data.get("jobDescription", "")
-        template_type = data.get("template", "engineering")
-        output_format = data.get("outputFormat", "standard")
-        
-        if not user_message:
-            return jsonify({"error": "Message is required"}), 400
-            
-        if not resume_text:
-            return jsonify({"error": "Resume text is required"}), 400
-        
-        # Create a unique ID for this conversation
-        conversation_id = str(uuid.uuid4())
+        fields, error = parse_chat_request(request.json)
+        if error:
+            return jsonify({"error": error}), 400
+        if fields["job_description"] is None:
+            return job_description_not_found(fields["job_description_id"])
+        session = open_chat_session(fields)
+        if session is None:
+            return session_not_found()
+        set_chat_labels(session)
         
         # Process the chat and get a response with optional resume updates
         try:
             response, updated_resume, skills_list, keywords_used = process_chat_with_resume(
-                user_message, resume_text, job_description, template_type
+                session, fields["user_message"]
             )
             logging.info("Chat processed successfully")
+        except LLMError as e:
+            logging.error(f"Error processing chat: {e}")
+            return error_response(f"Failed to process chat: {str(e)}", e.status_code, e.retry_after)
         except Exception as e:
             logging.error(f"Error processing chat: {e}")
             return jsonify({"error": f"Failed to process chat: {str(e)}"}), 500
         
-        # If resume was updated, generate new PDF
-        pdf_url = None
-        txt_url = None
-        match_score = None
-        
-        if updated_resume and updated_resume != resume_text:
-            logging.info("Resume was updated, generating files")
-            
-            # Generate PDF of the updated resume
-            pdf_filename = f"updated_resume_{conversation_id}.pdf"
-            pdf_path = os.path.join(OUTPUT_FOLDER, pdf_filename)
-            
-            try:
-                # Make sure the OUTPUT_FOLDER exists
-                os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-                
-                # Generate PDF
-                generate_pdf(updated_resume, pdf_path, template_type, skills_list, output_format)
-                logging.info(f"Updated PDF generated: {pdf_path}")
-                
-                # Verify that the file was created
-                if os.path.exists(pdf_path):
-                    pdf_url = url_for('download_resume', filename=pdf_filename, type='pdf')
-                    logging.info(f"PDF URL created: {pdf_url}")
-                else:
-                    logging.error(f"PDF file was not created at {pdf_path}")
-            except Exception as e:
-                logging.error(f"Error generating updated PDF: {str(e)}")
-                # Continue without PDF - we'll still return the text version
-            
-            # Generate a text version for download
-            txt_filename = f"updated_resume_{conversation_id}.txt"
-            txt_path = os.path.join(OUTPUT_FOLDER, txt_filename)
-            
-            try:
-                with open(txt_path, 'w', encoding='utf-8') as f:
-                    f.write(updated_resume)
-                
-                if os.path.exists(txt_path):
-                    txt_url = url_for('download_resume', filename=txt_filename, type='txt')
-                    logging.info(f"TXT URL created: {txt_url}")
-                else:
-                    logging.error(f"TXT file was not created at {txt_path}")
-            except Exception as e:
-                logging.error(f"Error generating text file: {str(e)}")
-            
-            # Generate a match score between the updated resume and job description
-            try:
-                match_score = calculate_match_score(updated_resume, job_description)
-                logging.info(f"Match score calculated: {match_score}")
-            except Exception as e:
-                logging.error(f"Error calculating match score: {str(e)}")
-                match_score = None
-        
         # Prepare the response
         response_data = {
-            "response": response
+            "response": response,
+            "sessionId": session.id
         }
         
-        if updated_resume and updated_resume != resume_text:
-            response_data.update({
-                "updatedResume": updated_resume,
-                "pdfUrl": pdf_url,
-                "txtUrl": txt_url,
-                "matchScore": match_score,
-                "skills": skills_list,
-                "keywordsUsed": keywords_used
-            })
+        if updated_resume:
+            response_data.update(finalize_chat_update(updated_resume, skills_list, keywords_used, session))
             logging.info(f"Returning updated resume data with download URLs")
         
         return jsonify(response_data)
@@ -1078,108 +1762,331 @@ def chat_with_resume():
         logging.error(f"Unexpected error in chat_with_resume: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/chat-with-resume/stream", methods=["POST"])
+def chat_with_resume_stream():
+    """
+    Streaming variant of chat_with_resume using Server-Sent Events.
+    Sends "token" events with the conversational response as Gemini produces it,
+    then one "done" event with the updated resume, skills and download URLs.
+    """
+    request_start = time.perf_counter()
+    logging.info("Streaming chat request received")
+    
+    fields, error = parse_chat_request(request.get_json(silent=True))
+    if error:
+        return jsonify({"error": error}), 400
+    if fields["job_description"] is None:
+        return job_description_not_found(fields["job_description_id"])
+    session = open_chat_session(fields)
+    if session is None:
+        return session_not_found()
+    set_chat_labels(session)
+
+    def generate():
+        first_token_at = None
+        chat_start = None
+        streamer = JsonFieldStreamer("response")
+        try:
+            # One turn at a time per session, held until the turn is recorded
+            with session.lock:
+                chat_start = time.perf_counter()
+                stream = llm.stream(
+                    build_chat_messages(session, fields["user_message"]),
+                    system=chat_instruction(),
+                    temperature=0.2,
+                    max_output_tokens=chat_max_output_tokens(),
+                    response_mime_type="application/json"
+                )
+                
+                for chunk in stream:
+                    text = streamer.feed(chunk)
+                    if text:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        yield sse_event("token", {"text": text})
+                instrumentation.observe_stage("chat", time.perf_counter() - chat_start)
+                chat_start = None
+
+                response, updated_resume, skills_list, keywords_used = resolve_chat_reply(
+                    session, fields["user_message"], streamer.text
+                )
+                updated_resume = record_chat_turn(session, fields["user_message"], response, updated_resume)
+            if not streamer.started and response:
+                # The JSON could not be streamed field-by-field, so send the parsed reply in one piece
+                first_token_at = first_token_at or time.perf_counter()
+                yield sse_event("token", {"text": response})
+            
+            response_data = {"response": response, "sessionId": session.id}
+            if updated_resume:
+                response_data.update(finalize_chat_update(updated_resume, skills_list, keywords_used, session))
+            
+            total = time.perf_counter() - request_start
+            ttfb = (first_token_at or time.perf_counter()) - request_start
+            response_data["streamTimings"] = {"ttfb": round(ttfb * 1000, 1), "total": round(total * 1000, 1)}
+            # Streamed responses send their headers before the prompt is built
+            report = current_report()
+            if report is not None and report.calls:
+                response_data["promptTokens"] = {"sent": report.tokens_sent, "saved": report.tokens_saved}
+            logging.info(f"Chat stream finished: time to first token {ttfb * 1000:.0f} ms, total {total * 1000:.0f} ms")
+            yield sse_event("done", response_data)
+            
+        except Exception as e:
+            if chat_start is not None:
+                instrumentation.observe_stage("chat", time.perf_counter() - chat_start, error=True)
+            logging.error(f"Error in streaming chat: {e}")
+            yield sse_event("error", {"error": f"Failed to process chat: {str(e)}"})
+
+    return Response(
+        stream_with_context(in_current_context(generate())),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def set_chat_labels(session: ChatSession) -> None:
+    """Label the current request's stage metrics with the chat's template and output format."""
+    instrumentation.set_labels(
+        template_type=bounded_label(session.template_type, TEMPLATE_TYPES),
+        output_format=bounded_label(session.output_format, OUTPUT_FORMATS),
+    )
+
+@app.route("/api/chat-sessions/<session_id>", methods=["DELETE"])
+def end_chat_session(session_id):
+    """Drop a chat session and the documents it holds."""
+    if not chat_sessions.delete(session_id):
+        return jsonify({"error": "Chat session not found or expired"}), 404
+    return "", 204
+
+def finalize_chat_update(updated_resume: str, skills_list: list, keywords_used: list,
+                         session: ChatSession) -> Dict[str, Any]:
+    """Write the files for an updated resume and score it; returns the response fields."""
+    logging.info("Resume was updated, generating files")
+    
+    # Create a unique ID for this conversation
+    conversation_id = str(uuid.uuid4())
+    template_type = session.template_type
+    output_format = session.output_format
+    
+    pdf_url = None
+    txt_url = None
+    match_score = None
+    match_breakdown = None
+    
+    pdf_filename = f"updated_resume_{conversation_id}.pdf"
+    pdf_path = os.path.join(OUTPUT_FOLDER, pdf_filename)
+    txt_filename = f"updated_resume_{conversation_id}.txt"
+    txt_path = os.path.join(OUTPUT_FOLDER, txt_filename)
+    
+    # Make sure the OUTPUT_FOLDER exists
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    
+    # The files and the match score are independent, so they run concurrently
+    outcome = run_stages([
+        Stage("pdf", lambda: prepare_pdf(updated_resume, pdf_path, template_type, skills_list, output_format)),
+        Stage("txt", lambda: write_text_file(updated_resume, txt_path)),
+        Stage("score", lambda: score_resume_match(updated_resume, session.job_description, session.scorer)),
+    ], around=profile_span)
+    instrumentation.observe_outcome(outcome)
+    timings = outcome.timings_ms()
+    timings.pop("total")
+    
+    # Continue without a file if it failed - we'll still return the resume text
+    if outcome.ok("pdf") and os.path.exists(outcome.results["pdf"]):
+        retention.register(outcome.results["pdf"])
+        pdf_url = url_for('download_resume', filename=pdf_filename, type='pdf')
+        logging.info(f"PDF URL created: {pdf_url}")
+    else:
+        logging.error(f"Error generating updated PDF: {outcome.errors.get('pdf')}")
+    
+    if outcome.ok("txt") and os.path.exists(txt_path):
+        retention.register(txt_path)
+        txt_url = url_for('download_resume', filename=txt_filename, type='txt')
+        logging.info(f"TXT URL created: {txt_url}")
+    else:
+        logging.error(f"Error generating text file: {outcome.errors.get('txt')}")
+    
+    if outcome.ok("score"):
+        match_score = outcome.results["score"]["score"]
+        match_breakdown = outcome.results["score"]["breakdown"]
+        logging.info(f"Match score calculated: {match_score}")
+    else:
+        logging.error(f"Error calculating match score: {outcome.errors.get('score')}")
+    
+    return {
+        "updatedResume": updated_resume,
+        "updatedDocument": resume_document(updated_resume).to_dict(),
+        "pdfUrl": pdf_url,
+        "txtUrl": txt_url,
+        "matchScore": match_score,
+        "matchBreakdown": match_breakdown,
+        "scorer": session.scorer,
+        "skills": skills_list,
+        "keywordsUsed": keywords_used,
+        "timings": timings
+    }
 
-def process_chat_with_resume(user_message: str, resume_text: str, job_description: str, template_type: str) -> tuple:
+
+def chat_instruction(edit_mode: str = CHAT_EDIT_MODE):
+    """The chat's system instruction: its rules and the reply format of the edit mode."""
+    return CHAT_INSTRUCTIONS["patch" if edit_mode == "patch" else "rewrite"]
+
+# Model turn that acknowledges the chat context, so the conversation alternates user and model turns
+CHAT_CONTEXT_REPLY = json.dumps({"response": "Ready to help with this resume.", "resume_updated": False})
+
+def chat_message_text(user_message: str) -> str:
+    return f"# User's message to you:\n```\n{user_message}\n```"
+
+def build_chat_messages(session: ChatSession, user_message: str) -> List[Dict[str, str]]:
     """
-    Process a chat message about a resume and return a response with optional resume updates.
-    Ensures proper formatting is maintained.
+    The conversation sent to Gemini for one turn: the context with the session's current
+    resume, the recent exchanges (replies without their resume copies) and the new message.
+    Over the prompt budget the oldest exchanges are left out first.
+    """
+    history = session.history
+    history_blocks = [
+        Block(chat_message_text(message) + reply, 2 + len(history) - index, f"history:{index}")
+        for index, (message, reply) in enumerate(history)
+    ]
+    fixed_text = CHAT_INPUT + CHAT_CONTEXT_REPLY + chat_message_text(user_message)
+    compaction = compact_prompt("chat", fixed_text, session.resume_text, session.job_description, history_blocks)
+    kept = {int(block.label.split(":")[1]) for block in compaction.extra}
+
+    messages = [
+        {"role": "user", "text": CHAT_INPUT.format(resume_text=compaction.resume_text,
+                                                   job_description=compaction.job_description)},
+        {"role": "model", "text": CHAT_CONTEXT_REPLY},
+    ]
+    for index, (message, reply) in enumerate(history):
+        if index not in kept:
+            continue
+        messages.append({"role": "user", "text": chat_message_text(message)})
+        messages.append({"role": "model", "text": reply})
+    messages.append({"role": "user", "text": chat_message_text(user_message)})
+    return messages
+
+def record_chat_turn(session: ChatSession, user_message: str, response: str,
+                     updated_resume: Optional[str]) -> Optional[str]:
+    """
+    Add a finished turn to the session and adopt the updated resume.
+    Returns the updated resume, or None if the turn left the resume unchanged.
+    """
+    if updated_resume == session.resume_text:
+        updated_resume = None
+    # The context turn always carries the current resume, so history keeps only the reply text
+    reply = json.dumps({"response": response, "resume_updated": bool(updated_resume)})
+    session.record_turn(user_message, reply, updated_resume, chat_sessions.max_history)
+    chat_sessions.touch(session)
+    return updated_resume
+
+def parse_chat_response(response_text: str, resume_text: str = "", edit_mode: str = "rewrite") -> tuple:
     """
+    Parse Gemini's JSON chat reply into (response, updated_resume, skills_list, keywords_used).
+    Edits in a patch-mode reply are applied to resume_text; raises PatchError if they do not
+    apply or, in patch mode, if the reply is not valid JSON (e.g. cut off at the token limit).
+    """
+    # Check if we have a valid response
+    if not response_text:
+        logging.error("Empty or invalid response from Gemini API")
+        return "Sorry, I couldn't process your request. Please try again.", None, [], []
+    
+    # Parse the JSON response
     try:
-        # Create a prompt for Gemini to handle the chat
-        prompt_template = """
-        You are an AI resume assistant helping a user modify their resume through a chat interface.
-        
-        # User's current resume:
-        ```
-        {resume_text}
-        ```
-        
-        # Job description they're applying for:
-        ```
-        {job_description}
-        ```
-        
-        # User's message to you:
-        ```
-        {user_message}
-        ```
-        
-        ## Instructions:
-        1. If the user is asking for modifications to their resume, make the requested changes while STRICTLY preserving the overall format and structure.
-        2. Maintain all section headers, indentation, and spacing exactly as in the original resume.
-        3. Keep the same line break pattern as the original resume.
-        4. If you're adding new content, follow the exact same formatting style as similar content in the resume.
-        5. Do not reformat or rearrange sections unless specifically requested by the user.
-        6. Your role is to be conversational but focused on helping improve the resume for the specific job.
-        7. If you make changes to the resume, explain what changes you made and why they improve the resume.
+        result = json.loads(response_text)
+        ai_response = result.get("response", "")
+        resume_updated = result.get("resume_updated", False)
+        updated_resume = result.get("updated_resume", None) if resume_updated else None
+        if resume_updated and not updated_resume and ("edits" in result or result.get("rewrite_required")):
+            if result.get("rewrite_required"):
+                raise PatchError("the model asked for a full rewrite")
+            updated_resume = apply_edits(resume_text, result.get("edits"))
+        skills_list = result.get("skills_list", []) if resume_updated else []
+        keywords_used = result.get("keywords_used", []) if resume_updated else []
         
-        Your output must be in this JSON format:
-        {{
-            "response": "Your conversational response to the user explaining what you did or giving advice",
-            "resume_updated": true/false,
-            "updated_resume": "The full updated resume text if changes were made, otherwise null",
-            "skills_list": ["Skill 1", "Skill 2", "Skill 3"...],  // List of 5-10 most important skills (only if resume was updated)
-            "keywords_used": ["Keyword 1", "Keyword 2", "Keyword 3"...]  // List of keywords from job description used in the resume (only if resume was updated)
-        }}
-        """
+        # Clean up the updated resume text if it exists
+        if updated_resume:
+            updated_resume = clean_resume_text(updated_resume)
         
-        # Format the prompt with the actual data
-        formatted_prompt = prompt_template.format(
-            user_message=user_message,
-            resume_text=resume_text,
-            job_description=job_description
-        )
+        return ai_response, updated_resume, skills_list, keywords_used
         
-        # Use Gemini Pro to process the chat
-        response = model.generate_content(
-            contents=formatted_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.2,  # Lower temperature for more precise formatting
-                max_output_tokens=4000,  # Higher token limit for longer responses
-                response_mime_type="application/json"  # Request JSON response
+    except json.JSONDecodeError as e:
+        if edit_mode == "patch":
+            raise PatchError(f"reply is not valid JSON: {e}")
+        logging.error("Failed to parse JSON response from Gemini API")
+        # Try to extract a basic text response
+        return "I processed your request, but couldn't format the response properly. Please try again with a clearer request.", None, [], []
+
+def chat_max_output_tokens(edit_mode: str = CHAT_EDIT_MODE) -> int:
+    # A full rewrite needs room for the whole resume; edits are a few lines
+    return CHAT_PATCH_MAX_OUTPUT_TOKENS if edit_mode == "patch" else 4000
+
+def resolve_chat_reply(session: ChatSession, user_message: str, response_text: str) -> tuple:
+    """
+    Parse a chat reply against the session's resume. A patch that does not apply is
+    retried once as a full rewrite of the resume.
+    """
+    try:
+        result = parse_chat_response(response_text, session.resume_text, CHAT_EDIT_MODE)
+    except PatchError as e:
+        logging.info(f"Chat edits did not apply ({e}), asking for a full rewrite")
+        with instrumentation.stage("chat_rewrite"):
+            response_text = llm.generate(
+                build_chat_messages(session, user_message),
+                system=chat_instruction("rewrite"),
+                temperature=0.2,
+                max_output_tokens=chat_max_output_tokens("rewrite"),
+                response_mime_type="application/json"
             )
-        )
-        
-        # Check if we have a valid response
-        if not response.text:
-            logging.error("Empty or invalid response from Gemini API")
-            return "Sorry, I couldn't process your request. Please try again.", None, [], []
-        
-        # Parse the JSON response
-        try:
-            result = json.loads(response.text)
-            ai_response = result.get("response", "")
-            resume_updated = result.get("resume_updated", False)
-            updated_resume = result.get("updated_resume", None) if resume_updated else None
-            skills_list = result.get("skills_list", []) if resume_updated else []
-            keywords_used = result.get("keywords_used", []) if resume_updated else []
-            
-            # Clean up the updated resume text if it exists
-            if updated_resume:
-                updated_resume = updated_resume.strip()
-                
-                # Remove any markdown code blocks if present
-                updated_resume = re.sub(r'```[a-z]*\n', '', updated_resume)
-                updated_resume = updated_resume.replace('```', '')
-                
-                # Remove any markdown formatting
-                updated_resume = re.sub(r'\*\*', '', updated_resume)  # Remove bold
-                updated_resume = re.sub(r'\_\_', '', updated_resume)  # Remove underline
-                updated_resume = re.sub(r'\*', '', updated_resume)    # Remove italics
-                updated_resume = re.sub(r'\_', '', updated_resume)    # Remove italics
-            
-            return ai_response, updated_resume, skills_list, keywords_used
-            
-        except json.JSONDecodeError:
-            logging.error("Failed to parse JSON response from Gemini API")
-            # Try to extract a basic text response
-            return "I processed your request, but couldn't format the response properly. Please try again with a clearer request.", None, [], []
+        result = parse_chat_response(response_text)
+        if result[1]:
+            chat_edit_outcomes.inc(outcome="fallback")
+        return result
+    if result[1]:
+        chat_edit_outcomes.inc(outcome="patch" if CHAT_EDIT_MODE == "patch" else "rewrite")
+    return result
+
+def process_chat_with_resume(session: ChatSession, user_message: str) -> tuple:
+    """
+    Process a chat message about a session's resume and return a response with optional
+    resume updates (updated_resume is None when the resume did not change).
+    Ensures proper formatting is maintained.
+    """
+    try:
+        # One turn at a time per session, so each turn sees the previous one's resume
+        with session.lock:
+            # Use Gemini Pro to process the chat
+            with instrumentation.stage("chat"):
+                response_text = llm.generate(
+                    build_chat_messages(session, user_message),
+                    system=chat_instruction(),
+                    temperature=0.2,  # Lower temperature for more precise formatting
+                    max_output_tokens=chat_max_output_tokens(),
+                    response_mime_type="application/json"  # Request JSON response
+                )
+            
+            response, updated_resume, skills_list, keywords_used = resolve_chat_reply(
+                session, user_message, response_text
+            )
+            updated_resume = record_chat_turn(session, user_message, response, updated_resume)
+            return response, updated_resume, skills_list, keywords_used
             
+    except LLMError:
+        raise
     except Exception as e:
         logging.error(f"Error in Gemini API call for chat: {e}")
         raise ValueError(f"Failed to process chat: {str(e)}")
     
+startup_state.import_seconds = time.perf_counter() - IMPORT_STARTED
+
+def main():
+    """Console entry point: build the app and run the development server."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the resume enhancer server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 5000)))
+    parser.add_argument("--warm-up", action="store_true", default=None,
+                        help="pre-load the Gemini SDK, parsers and PDF renderer before serving")
+    args = parser.parse_args()
+
+    create_app(warm=args.warm_up).run(host=args.host, port=args.port, debug=False)
+
 if __name__ == "__main__":
-    # Run the Flask app
-    port = int(os.getenv("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark for text normalization: the old per-line regex chains versus
+text_normalization run once per document.
+
+    python benchmarks/bench_normalization.py [--lines 5000] [--repeat 20]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_normalization import strip_markdown, to_pdf_text
+
+SAMPLE_LINES = [
+    "## PROFESSIONAL EXPERIENCE",
+    "**Senior Software Engineer** – Acme Corp (2019–2024)",
+    "• Led migration of __payment_service__ to *Kubernetes*, cutting p99 latency by 40%",
+    "• Built “real-time” pipelines with Kafka and Spark… see [portfolio](https://example.com/me_work)",
+    "",
+    "SKILLS",
+    "Python, Go, SQL, Terraform — AWS, GCP",
+]
+
+
+def legacy_clean_markdown(text):
+    text = re.sub(r'\*\*', '', text)
+    text = re.sub(r'\*', '', text)
+    text = re.sub(r'__', '', text)
+    text = re.sub(r'_', '', text)
+    text = re.sub(r'##+\s', '', text)
+    text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)
+    return text
+
+
+def legacy_clean_text_for_pdf(text):
+    text = legacy_clean_markdown(text)
+    replacements = {
+        '\u2013': '-',
+        '\u2014': '--',
+        '\u2018': "'",
+        '\u2019': "'",
+        '\u201c': '"',
+        '\u201d': '"',
+        '\u2022': '*',
+        '\u2026': '...',
+        '\u00a0': ' ',
+    }
+    for unicode_char, ascii_char in replacements.items():
+        text = text.replace(unicode_char, ascii_char)
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+
+def legacy(text):
+    text = legacy_clean_markdown(text)
+    return [legacy_clean_text_for_pdf(line) for line in text.split('\n')]
+
+
+def current(text):
+    return to_pdf_text(strip_markdown(text)).split('\n')
+
+
+def measure(func, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    text = "\n".join(SAMPLE_LINES[i % len(SAMPLE_LINES)] for i in range(args.lines))
+    # The shared rules keep underscores inside words (emails, snake_case), which the legacy chain dropped
+    if [line.replace("_", "") for line in legacy(text)] != [line.replace("_", "") for line in current(text)]:
+        print("warning: legacy and current output differ")
+
+    megabytes = len(text.encode("utf-8")) / 1e6
+    print(f"{args.lines} lines, {megabytes:.2f} MB, best of {args.repeat}")
+    results = {name: measure(func, text, args.repeat) for name, func in (("legacy", legacy), ("current", current))}
+    for name, seconds in results.items():
+        print(f"{name:>8}: {seconds * 1000:8.1f} ms  {megabytes / seconds:7.1f} MB/s")
+    print(f" speedup: {results['legacy'] / results['current']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
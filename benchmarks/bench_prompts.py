@@ -0,0 +1,112 @@
+"""
+Prompt size and prefill benchmark for the Gemini calls: per-request input tokens with the
+fixed instructions inline (the old layout) versus as a system instruction, for every
+enhance template, the match score and both chat modes, over the synthetic resume corpus.
+With --live, also sends each layout to Gemini (GEMINI_API_KEY required) and reports the
+billed prompt and cached tokens and the median time to first streamed token.
+
+    python benchmarks/bench_prompts.py [--pages 1,3] [--output results.json]
+                                       [--live 3] [--cache-ttl 300]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+JOB_DESCRIPTION = """Senior Backend Engineer
+
+RESPONSIBILITIES:
+- Design and operate Python and Go services on Kubernetes
+- Build Kafka and Spark data pipelines
+- Own PostgreSQL and Redis performance
+
+REQUIREMENTS:
+- 5+ years building distributed systems
+- Experience with AWS or GCP, Terraform and CI/CD
+
+Benefits:
+- Health, dental and vision insurance
+
+We are an equal opportunity employer and value diversity without regard to race, color or religion.
+"""
+
+
+def layouts(resume_text: str):
+    """(name, system instruction, per-request prompt) for every Gemini call the app makes."""
+    from prompts import (CHAT_INPUT, CHAT_INSTRUCTIONS, ENHANCE_INPUT, ENHANCE_INSTRUCTIONS,
+                         SCORE_INPUT, SCORE_INSTRUCTION)
+    inputs = {"resume_text": resume_text, "job_description": JOB_DESCRIPTION}
+    calls = [(f"enhance.{name}", system, ENHANCE_INPUT.format(**inputs))
+             for name, system in ENHANCE_INSTRUCTIONS.items()]
+    calls.append(("score", SCORE_INSTRUCTION, SCORE_INPUT.format(**inputs)))
+    calls += [(f"chat.{mode}", system, CHAT_INPUT.format(**inputs) + "\n# User's message to you:\n```\n"
+               "Change my title to Senior\n```") for mode, system in CHAT_INSTRUCTIONS.items()]
+    return calls
+
+
+def live_run(system, prompt: str, inline: bool, repeat: int, cache_ttl: float) -> dict:
+    """Median time to first token and the usage metadata of `repeat` streamed calls."""
+    from llm_backends import GeminiBackend, _usage
+    import app
+    backend = GeminiBackend(app.get_model, app.MODEL_NAME, cache_ttl=cache_ttl, cache_min_tokens=0)
+    if inline:
+        prompt, system = system.text + "\n\n" + prompt, None
+    first_token, usage = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = backend._request(prompt, {"temperature": 0.1, "max_output_tokens": 16}, 60, True, system)
+        for _chunk in response:
+            first_token.append(time.perf_counter() - start)
+            break
+        for _chunk in response:
+            pass
+        usage = _usage(response)
+    return {"firstTokenSeconds": statistics.median(first_token), "promptTokens": usage[1],
+            "cachedTokens": usage[3]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", default="1,3", help="comma-separated resume sizes in pages")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--live", type=int, default=0, help="calls per layout against the real API")
+    parser.add_argument("--cache-ttl", type=float, default=0,
+                        help="with --live, put system instructions in context caches of this TTL")
+    args = parser.parse_args()
+
+    from bench_stages import synthetic_resume
+    from prompt_compaction import count_tokens
+
+    results = {}
+    for pages in [int(value) for value in args.pages.split(",") if value.strip()]:
+        for name, system, prompt in layouts(synthetic_resume(pages)):
+            system_tokens, request_tokens = count_tokens(system.text), count_tokens(prompt)
+            result = {
+                "systemTokens": system_tokens,
+                "inlineTokens": system_tokens + request_tokens,
+                "requestTokens": request_tokens,
+                "requestShare": round(request_tokens / (system_tokens + request_tokens), 3),
+            }
+            if args.live:
+                result["inline"] = live_run(system, prompt, True, args.live, 0)
+                result["system"] = live_run(system, prompt, False, args.live, args.cache_ttl)
+            results[f"{name}.{pages}p"] = result
+            print(f"{name + '.' + str(pages) + 'p':>28}: {system_tokens:6d} instruction + "
+                  f"{request_tokens:6d} request tokens ({result['requestShare']:.0%} sent per request)",
+                  file=sys.stderr)
+
+    report = {"estimate": "chars / 4", "live": args.live, "cacheTtl": args.cache_ttl, "results": results}
+    print(json.dumps(report, indent=2, sort_keys=True))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Stage benchmarks for the CPU-bound parts of the pipeline: text extraction per
+upload format, markdown/Unicode cleanup, resume parsing, both PDF renderers and the preview image,
+over a synthetic resume corpus of increasing size. Reports median and fastest time
+and peak Python heap per stage as JSON, compares the fastest time and the heap with a
+stored baseline and exits with status 1 when a stage regresses beyond the threshold.
+The baseline is only compared when it was recorded with the same Python version and
+machine type; regenerate it with --save-baseline on each host that runs the check.
+
+    python benchmarks/bench_stages.py [--pages 1,3,10,50] [--formats pdf,docx,rtf,txt]
+                                      [--repeat 15] [--output results.json]
+                                      [--baseline benchmarks/baseline.json] [--threshold 0.25]
+                                      [--save-baseline]
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import statistics
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+FORMATS = ("pdf", "docx", "rtf", "txt")
+LINES_PER_PAGE = 48
+# Differences smaller than this are timer noise, whatever the ratio
+NOISE_FLOOR_SECONDS = 0.002
+NOISE_FLOOR_KIB = 64
+
+SKILLS = ["Python", "Go", "SQL", "Kubernetes", "Terraform", "AWS", "GCP", "Kafka", "Spark", "React",
+          "PostgreSQL", "Redis", "Docker", "gRPC", "TypeScript", "Airflow", "Flask", "Django"]
+VERBS = ["Led", "Built", "Designed", "Migrated", "Optimized", "Automated", "Shipped", "Scaled", "Reduced"]
+OBJECTS = ["payment service", "data pipeline", "search ranking", "CI/CD platform", "billing system",
+           "recommendation engine", "observability stack", "mobile backend", "feature store"]
+
+
+def synthetic_resume(pages: int, seed: int = 0) -> str:
+    """A deterministic resume of about `pages` pages, with the markdown and typography Gemini emits."""
+    rng = random.Random(seed + pages)
+    lines = ["## JANE DOE", "Senior Software Engineer \u2013 jane@example.com \u2013 [portfolio](https://example.com)", "",
+             "## SUMMARY", "Engineer with a decade of experience building \u201creliable\u201d distributed systems\u2026", ""]
+    job = 0
+    while len(lines) < pages * LINES_PER_PAGE:
+        job += 1
+        lines.append("## EXPERIENCE" if job == 1 else "")
+        lines.append(f"**{rng.choice(['Senior', 'Staff', 'Lead'])} Engineer** \u2014 Company {job} "
+                     f"({2024 - job * 2}\u2013{2026 - job * 2})")
+        for _ in range(rng.randint(5, 9)):
+            lines.append(f"\u2022 {rng.choice(VERBS)} the *{rng.choice(OBJECTS)}* with "
+                         f"{', '.join(rng.sample(SKILLS, 3))}, cutting p99 latency by {rng.randint(10, 70)}%")
+    lines += ["", "## SKILLS", ", ".join(SKILLS)]
+    return "\n".join(lines[:pages * LINES_PER_PAGE])
+
+
+def plain_lines(text: str):
+    from text_normalization import strip_markdown
+    return strip_markdown(text).split("\n")
+
+
+def to_pdf(text: str) -> bytes:
+    """A text PDF with LINES_PER_PAGE lines per page, like an exported resume."""
+    from fpdf import FPDF
+    from text_normalization import to_pdf_text
+    pdf = FPDF(orientation="P", unit="mm", format="A4")
+    pdf.set_auto_page_break(False)
+    pdf.set_font("Helvetica", size=10)
+    for index, line in enumerate(plain_lines(text)):
+        if index % LINES_PER_PAGE == 0:
+            pdf.add_page()
+        pdf.text(15, 15 + (index % LINES_PER_PAGE) * 5.5, to_pdf_text(line))
+    return bytes(pdf.output())
+
+
+def to_docx(text: str) -> bytes:
+    from docx import Document
+    document = Document()
+    for line in plain_lines(text):
+        document.add_paragraph(line)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def rtf_escape(line: str) -> str:
+    line = line.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}")
+    return "".join(char if ord(char) < 128 else f"\\u{ord(char)}?" for char in line)
+
+
+def to_rtf(text: str) -> bytes:
+    body = "\\par\n".join(rtf_escape(line) for line in plain_lines(text))
+    return ("{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 Helvetica;}}\\f0\\fs20\n" + body + "\n}").encode("ascii")
+
+
+def to_txt(text: str) -> bytes:
+    return text.encode("utf-8")
+
+
+ENCODERS = {"pdf": to_pdf, "docx": to_docx, "rtf": to_rtf, "txt": to_txt}
+
+
+def build_stages(app, pages_list, formats):
+    """(name, callable) pairs; each callable runs one stage on one corpus document."""
+    from text_normalization import clean_resume_text, strip_markdown
+    from resume_document import parse_resume
+
+    stages = []
+    for pages in pages_list:
+        text = synthetic_resume(pages)
+        for file_format in formats:
+            data = ENCODERS[file_format](text)
+            stages.append((f"extract.{file_format}.{pages}p",
+                           lambda data=data, ext=file_format: app.extract_resume_text(data, ext)))
+        stages.append((f"normalize.{pages}p",
+                       lambda text=text: app.pdf_safe_text(strip_markdown(clean_resume_text(text)))))
+        # The renderers below reuse the cached parse after the warm-up run, so it is timed on its own
+        stages.append((f"parse_resume.{pages}p", lambda text=text: parse_resume(text)))
+        stages.append((f"generate_pdf.{pages}p",
+                       lambda text=text: app.generate_pdf(text, None, "engineering", SKILLS[:8], "standard")))
+        stages.append((f"generate_modern_pdf.{pages}p",
+                       lambda text=text: app.generate_modern_pdf(text, None, "faang", SKILLS[:8])))
+        stages.append((f"create_text_image.{pages}p",
+                       lambda text=text: app.image_to_base64(app.create_text_image(text))))
+    return stages
+
+
+def measure(func, repeat: int) -> dict:
+    func()  # warm-up: lazy imports, font parsing
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    # Peak heap in a separate run, since tracing slows the timed runs down
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": statistics.median(times), "minSeconds": min(times), "peakKiB": round(peak / 1024, 1)}
+
+
+def compare(results: dict, baseline: dict, threshold: float, memory_threshold: float) -> list:
+    """
+    Regression messages for stages slower or larger than the baseline beyond the thresholds.
+    Times are compared by the fastest run, which is far less noisy than the median.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        before = previous.get("minSeconds", previous["seconds"])
+        after = current["minSeconds"]
+        if after > before * (1 + threshold) and after - before > NOISE_FLOOR_SECONDS:
+            regressions.append(f"{name}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms (fastest run)")
+        if (current["peakKiB"] > previous["peakKiB"] * (1 + memory_threshold)
+                and current["peakKiB"] - previous["peakKiB"] > NOISE_FLOOR_KIB):
+            regressions.append(f"{name}: peak {previous['peakKiB']:.0f} KiB -> {current['peakKiB']:.0f} KiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", default="1,3,10,50", help="comma-separated corpus sizes in pages")
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    parser.add_argument("--stages", default="", help="only run stages whose name contains this")
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown per stage")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="allowed relative peak heap growth")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    pages_list = [int(value) for value in args.pages.split(",") if value.strip()]
+    formats = [value.strip() for value in args.formats.split(",") if value.strip() in FORMATS]
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    # Import and run from a scratch directory so folders, caches and logs do not touch the checkout
+    os.chdir(tempfile.mkdtemp(prefix="bench-stages-"))
+    # The upload page cap would reject the larger corpus PDFs
+    os.environ["PDF_MAX_PAGES"] = str(max(pages_list + [int(os.getenv("PDF_MAX_PAGES", 30))]))
+    import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    for name, func in build_stages(app, pages_list, formats):
+        if args.stages in name:
+            results[name] = measure(func, args.repeat)
+            print(f"{name:>32}: {results[name]['seconds'] * 1000:9.2f} ms  "
+                  f"min {results[name]['minSeconds'] * 1000:9.2f} ms  peak {results[name]['peakKiB']:9.0f} KiB", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    baseline, same_host = {}, True
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            stored = json.load(f)
+        baseline = stored.get("results", {})
+        host = (stored.get("python"), stored.get("machine"))
+        same_host = host == (report["python"], report["machine"])
+        if not same_host and not args.save_baseline:
+            # Timings and heap sizes from another interpreter or CPU say nothing about this one
+            report["baselineMismatch"] = f"baseline is Python {host[0]} on {host[1]}"
+            print(f"WARNING not comparing with {baseline_path}: recorded with Python {host[0]} on {host[1]}, "
+                  f"this is Python {report['python']} on {report['machine']}; "
+                  f"regenerate it here with --save-baseline", file=sys.stderr)
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold) if same_host else []
+    report["regressions"] = regressions
+
+    print(json.dumps(report, indent=2, sort_keys=True))
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        # Merge so a filtered run only replaces the stages it measured; another host's stages are dropped
+        merged = dict(baseline, **results) if same_host else results
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({"python": report["python"], "machine": report["machine"], "results": merged},
+                      f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {baseline_path}", file=sys.stderr)
+        return
+    for message in regressions:
+        print(f"REGRESSION {message}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
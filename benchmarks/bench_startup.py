@@ -0,0 +1,73 @@
+"""
+Startup benchmark: cold `import app`, create_app() and warm_up() timings, each
+measured in a fresh interpreter, plus the heavy libraries loaded and the files
+created by the import (there should be none of either).
+
+    python benchmarks/bench_startup.py [--runs 5] [--warm-up]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("google.generativeai", "fpdf", "PIL", "requests", "PyPDF2", "pdfminer", "docx", "striprtf")
+
+PROBE = """
+import os, sys, time, json
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+loaded = [name for name in {heavy!r} if name in sys.modules]
+created_files = sorted(os.listdir("."))
+app.create_app(warm=False)
+created = time.perf_counter()
+warm = app.warm_up() if {warm!r} else None
+app.retention.stop()
+print(json.dumps({{
+    "importMs": (imported - start) * 1000,
+    "createAppMs": (created - imported) * 1000,
+    "warmUpMs": warm * 1000 if warm is not None else None,
+    "heavyModulesAtImport": loaded,
+    "filesCreatedAtImport": created_files,
+}}))
+"""
+
+
+def run_once(warm: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark")
+    # Run from a scratch directory so folders, caches and logs do not touch the checkout
+    with tempfile.TemporaryDirectory() as workdir:
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(root=ROOT, heavy=HEAVY_MODULES, warm=warm)],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true", help="also time warm_up()")
+    args = parser.parse_args()
+
+    runs = [run_once(args.warm_up) for _ in range(args.runs)]
+    print(f"{args.runs} cold starts")
+    for key in ("importMs", "createAppMs", "warmUpMs"):
+        values = [run[key] for run in runs if run[key] is not None]
+        if values:
+            print(f"{key:>12}: median {statistics.median(values):7.1f} ms  min {min(values):7.1f} ms")
+    loaded = runs[0]["heavyModulesAtImport"]
+    print(f"heavy modules loaded by import: {', '.join(loaded) if loaded else 'none'}")
+    created = runs[0]["filesCreatedAtImport"]
+    print(f"files created by import: {', '.join(created) if created else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
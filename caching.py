@@ -0,0 +1,358 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def sha256_digest(data: bytes) -> str:
+    """Return the hex SHA-256 digest of raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalized_key(*parts: str) -> str:
+    """Hash text parts after collapsing whitespace, so cosmetic differences share a key."""
+    normalized = [re.sub(r'\s+', ' ', part or '').strip() for part in parts]
+    return sha256_digest("\x1f".join(normalized).encode('utf-8'))
+
+
+class LRUCache:
+    """Thread-safe bounded LRU mapping with hit/miss counters and an optional TTL."""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                value, expires_at = self._data[key]
+                if expires_at is not None and expires_at <= time.time():
+                    del self._data[key]
+                    self.expirations += 1
+                    self.misses += 1
+                    return default
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[0] if entry is not None else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "entries": len(self._data),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of extracted resume text.
+    A bounded in-memory LRU sits in front of an on-disk store of one .txt file per digest;
+    the disk store is bounded by whoever registers the paths put() returns (retention).
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 256):
+        self.cache_dir = cache_dir
+        self.memory = LRUCache(max_entries)
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return cached text for a key, promoting disk hits into memory."""
+        text = self.memory.get(key)
+        if text is not None:
+            return text
+
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logging.warning(f"Could not read extraction cache entry {path}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+        self.memory.set(key, text)
+        return text
+
+    def put(self, key: str, text: str) -> Optional[str]:
+        """Store extracted text in memory and on disk; returns the file written, if any."""
+        self.memory.set(key, text)
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+            return path
+        except Exception as e:
+            logging.warning(f"Could not write extraction cache entry {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        memory_stats = self.memory.stats()
+        with self._lock:
+            disk_hits = self.disk_hits
+            misses = self.misses
+        lookups = memory_stats["hits"] + disk_hits + misses
+        return {
+            "memoryEntries": memory_stats["entries"],
+            "maxMemoryEntries": memory_stats["maxEntries"],
+            "memoryHits": memory_stats["hits"],
+            "diskHits": disk_hits,
+            "misses": misses,
+            "evictions": memory_stats["evictions"],
+            "hitRate": round((memory_stats["hits"] + disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class SQLiteCache:
+    """
+    JSON value cache in a SQLite file with TTL and LRU eviction.
+    Safe to share between processes (e.g. several gunicorn workers) on one host.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, db_path: str, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.db_path = db_path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(False)
+                return default
+            value, expires_at = row
+            with conn:
+                if expires_at is not None and expires_at <= now:
+                    conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self._count(False)
+                    return default
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count(True)
+            return json.loads(value)
+        except Exception as e:
+            logging.warning(f"SQLite cache read failed: {e}")
+            self._count(False)
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires_at, now)
+                )
+                conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+        except Exception as e:
+            logging.warning(f"SQLite cache write failed: {e}")
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        value = self.get(key, default)
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        except Exception as e:
+            logging.warning(f"SQLite cache delete failed: {e}")
+        return value
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        try:
+            entries = len(self)
+        except Exception:
+            entries = None
+        return {
+            "backend": self.backend,
+            "path": self.db_path,
+            "entries": entries,
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+        }
+
+
+def create_result_cache(backend: str, max_entries: int, ttl_seconds: Optional[float] = None,
+                        db_path: Optional[str] = None):
+    """Build a result cache for the configured backend ('memory', 'sqlite' or 'none')."""
+    backend = (backend or "memory").lower()
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SQLiteCache(db_path or os.path.join("cache", "results.sqlite3"), max_entries, ttl_seconds)
+    if backend != "memory":
+        logging.warning(f"Unknown cache backend '{backend}', falling back to memory")
+    return LRUCache(max_entries, ttl_seconds)
+
+
+class RenderCache:
+    """
+    Byte-budgeted LRU of rendered documents.
+    Counts renders performed versus renders avoided by serving a cached copy.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.deferred = 0
+        self.rendered = 0
+        self.cache_hits = 0
+        self.evictions = 0
+
+    def record_deferred(self) -> None:
+        """Count a document whose rendering was postponed until it is downloaded."""
+        with self._lock:
+            self.deferred += 1
+
+    def get_or_render(self, key: str, render) -> bytes:
+        """Return the cached document for key, calling render() to produce it on a miss."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.cache_hits += 1
+                return self._data[key]
+
+        data = render()
+        with self._lock:
+            self.rendered += 1
+            if key not in self._data and len(data) <= self.max_bytes:
+                self._data[key] = data
+                self._bytes += len(data)
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._data.popitem(last=False)
+                    self._bytes -= len(evicted)
+                    self.evictions += 1
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "deferred": self.deferred,
+                "rendered": self.rendered,
+                "cacheHits": self.cache_hits,
+                "rendersAvoided": max(0, self.deferred - self.rendered),
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,134 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ChatSession:
+    """
+    Server-side state of one resume chat: the documents, the options and the recent
+    exchanges. Hold `lock` for the whole turn so concurrent messages apply in order.
+    """
+
+    def __init__(self, resume_text: str, job_description: str, template_type: str,
+                 output_format: str, scorer: str):
+        self.id = uuid.uuid4().hex
+        self.resume_text = resume_text
+        self.job_description = job_description
+        self.template_type = template_type
+        self.output_format = output_format
+        self.scorer = scorer
+        self.history: List[Tuple[str, str]] = []  # (user message, model reply) pairs
+        self.turns = 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.lock = threading.Lock()
+
+    def size(self) -> int:
+        """Approximate memory held, in characters of text."""
+        return (len(self.resume_text) + len(self.job_description)
+                + sum(len(message) + len(reply) for message, reply in self.history))
+
+    def record_turn(self, message: str, reply: str, updated_resume: Optional[str], max_history: int) -> None:
+        """Append an exchange, keeping the last max_history, and adopt the updated resume."""
+        self.history.append((message, reply))
+        if len(self.history) > max_history:
+            del self.history[:len(self.history) - max_history]
+        if updated_resume:
+            self.resume_text = updated_resume
+        self.turns += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sessionId": self.id,
+            "turns": self.turns,
+            "template": self.template_type,
+            "outputFormat": self.output_format,
+            "scorer": self.scorer,
+            "createdAt": self.created_at,
+            "lastUsed": self.last_used,
+        }
+
+
+class ChatSessionStore:
+    """
+    In-memory chat sessions. Sessions idle for idle_seconds are dropped, and the least
+    recently used ones are evicted beyond max_sessions or max_chars of held text.
+    """
+
+    def __init__(self, max_sessions: int = 500, max_chars: int = 64 * 1024 * 1024,
+                 idle_seconds: float = 1800, max_history: int = 6):
+        self.max_sessions = max(1, int(max_sessions))
+        self.max_chars = max_chars
+        self.idle_seconds = idle_seconds
+        self.max_history = max_history
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _purge(self) -> None:
+        cutoff = time.time() - self.idle_seconds
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used >= cutoff:
+                break
+            del self._sessions[session.id]
+            self.expired += 1
+
+    def _enforce_limits(self) -> None:
+        self._purge()
+        total = sum(session.size() for session in self._sessions.values())
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or total > self.max_chars):
+            _, session = self._sessions.popitem(last=False)
+            total -= session.size()
+            self.evicted += 1
+            logging.info(f"Evicted chat session {session.id} ({session.turns} turns)")
+
+    def create(self, resume_text: str, job_description: str, template_type: str,
+               output_format: str, scorer: str) -> ChatSession:
+        session = ChatSession(resume_text, job_description, template_type, output_format, scorer)
+        with self._lock:
+            self._sessions[session.id] = session
+            self.created += 1
+            self._enforce_limits()
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """The live session, marked as used; None if unknown, expired or evicted."""
+        with self._lock:
+            self._purge()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.time()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def touch(self, session: ChatSession) -> None:
+        """Re-check the limits after a turn changed the session's size."""
+        with self._lock:
+            session.last_used = time.time()
+            if session.id in self._sessions:
+                self._sessions.move_to_end(session.id)
+            self._enforce_limits()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._purge()
+            return {
+                "sessions": len(self._sessions),
+                "chars": sum(session.size() for session in self._sessions.values()),
+                "maxSessions": self.max_sessions,
+                "maxChars": self.max_chars,
+                "idleSeconds": self.idle_seconds,
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
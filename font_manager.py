@@ -0,0 +1,137 @@
+import io
+import os
+import copy
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+# Core PDF font used when the bundled TTFs are missing; Latin-1 only
+FALLBACK_FAMILY = "Helvetica"
+
+
+class FontManager:
+    """
+    Registers bundled TrueType fonts on FPDF documents.
+
+    Each TTF is read and parsed (cmap, glyph widths, descriptor) once per process.
+    Documents get a lightweight copy that shares the parsed metrics but has its own
+    glyph subset and its own lazily-loaded font tables, so fpdf2 embeds only the
+    glyphs a document uses and concurrent renders never share mutable state.
+    Styles are added to a document on first use, so unused styles are never embedded.
+    """
+
+    def __init__(self, font_dir: str, family: str, files: Dict[str, str]):
+        self.font_dir = font_dir
+        self.family = family
+        self.files = files  # style ("", "B", "I", "BI") -> file name
+        self._data: Dict[str, bytes] = {}
+        self._parsed: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._available: Optional[bool] = None
+        self._document_class = None
+        self.parses = 0
+        self.registrations = 0
+
+    def _path(self, style: str) -> str:
+        return os.path.join(self.font_dir, self.files.get(style) or self.files[""])
+
+    @property
+    def available(self) -> bool:
+        if self._available is None:
+            self._available = all(os.path.exists(self._path(style)) for style in self.files)
+            if not self._available:
+                logging.warning(f"Bundled fonts not found in {self.font_dir}; "
+                                f"falling back to {FALLBACK_FAMILY} (Latin-1 only)")
+        return self._available
+
+    @property
+    def regular_path(self) -> str:
+        return self._path("")
+
+    def _parse(self, pdf, style: str):
+        """Parse one style once; later calls return the shared parsed font."""
+        parsed = self._parsed.get(style)
+        if parsed is not None:
+            return parsed
+        with self._lock:
+            parsed = self._parsed.get(style)
+            if parsed is None:
+                from fpdf.fonts import TTFFont
+                path = self._path(style)
+                with open(path, 'rb') as f:
+                    self._data[style] = f.read()
+                parsed = TTFFont(pdf, path, f"{self.family.lower()}{style}", style)
+                self._parsed[style] = parsed
+                self.parses += 1
+        return parsed
+
+    def _clone(self, pdf, style: str):
+        from fontTools import ttLib
+        from fpdf.fonts import SubsetMap, TTFFont
+
+        parsed = self._parse(pdf, style)
+        font = TTFFont.__new__(TTFFont)
+        for slot in TTFFont.__slots__:
+            if hasattr(parsed, slot):
+                setattr(font, slot, getattr(parsed, slot))
+        # Per-document state: fpdf2 subsets font.ttfont in place when the PDF is written
+        font.i = len(pdf.fonts) + 1
+        font.desc = copy.copy(parsed.desc)  # fpdf2 assigns it an object id on output
+        font.ttfont = ttLib.TTFont(io.BytesIO(self._data[style]), recalcTimestamp=False, lazy=True)
+        font._hbfont = None
+        font.missing_glyphs = []
+        font.biggest_size_pt = 0
+        font.color_font = None
+        font.subset = SubsetMap(font)
+        return font
+
+    @property
+    def font_family(self) -> str:
+        """Family name to pass to set_font(): the bundled family, or the core fallback."""
+        return self.family if self.available else FALLBACK_FAMILY
+
+    @property
+    def unicode(self) -> bool:
+        """False when rendering with the Latin-1 core fallback font."""
+        return self.available
+
+    def ensure_style(self, pdf, style: str) -> None:
+        """Add one style of the bundled family to pdf if it is not there yet."""
+        style = "".join(flag for flag in "BI" if flag in style.upper())
+        fontkey = f"{self.family.lower()}{style}"
+        if fontkey in pdf.fonts:
+            return
+        # Styles without a bundled file reuse the closest one (italic -> regular, bold italic -> bold)
+        source = style if style in self.files else ("B" if "B" in style and "B" in self.files else "")
+        font = self._clone(pdf, source)
+        font.fontkey = fontkey
+        pdf.fonts[fontkey] = font
+        self.registrations += 1
+
+    def document_class(self):
+        """
+        FPDF subclass whose set_font() adds bundled styles on first use,
+        so a document only embeds the styles it actually prints with.
+        """
+        if self._document_class is None:
+            from fpdf import FPDF
+            manager = self
+
+            class ManagedFontPDF(FPDF):
+                def set_font(self, family=None, style="", size=0):
+                    requested = family or self.font_family
+                    if (manager.available and isinstance(style, str)
+                            and requested.lower() == manager.family.lower()):
+                        manager.ensure_style(self, style)
+                    super().set_font(family, style, size)
+
+            self._document_class = ManagedFontPDF
+        return self._document_class
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "family": self.family,
+            "available": self.available,
+            "parses": self.parses,
+            "registrations": self.registrations,
+        }
@@ -0,0 +1,156 @@
+import re
+import time
+import logging
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from caching import LRUCache, normalized_key
+from prompt_compaction import PREFERRED_HEADINGS, Block, is_heading, job_description_blocks
+from resume_document import HEADING_MARKUP
+from scoring import extract_terms, weigh_terms
+
+# Sections whose terms are required skills; PREFERRED_HEADINGS are checked first
+REQUIRED_HEADINGS = re.compile(
+    r"requirement|required|qualification|skills|must|what you(?:'ll)? (?:bring|need)|you have|experience",
+    re.IGNORECASE)
+# A sentence or clause marked like this is preferred wherever it appears
+PREFERRED_MARKER = re.compile(r"\b(?:preferred|nice[- ]to[- ]have|a plus|bonus|desirable|ideally)\b", re.IGNORECASE)
+CLAUSE_SPLIT = re.compile(r"(?<=[.;!?])\s+|[()]")
+
+
+class JobDescription(NamedTuple):
+    """A job description with the analysis that depends only on it, keyed by content hash."""
+    id: str
+    text: str
+    normalized_text: str
+    blocks: List[Block]
+    terms: List[Tuple[str, float, int, str]]
+    required_skills: List[str]
+    preferred_skills: List[str]
+    registered_at: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "jobDescriptionId": self.id,
+            "normalizedText": self.normalized_text,
+            "keywords": [display for _term, _weight, _count, display in self.terms],
+            "requiredSkills": self.required_skills,
+            "preferredSkills": self.preferred_skills,
+            "registeredAt": self.registered_at,
+        }
+
+
+def job_description_id(text: str) -> str:
+    """Stable id of a posting: the hash of its text with whitespace collapsed."""
+    return normalized_key(text)
+
+
+def _line_terms(line: str, weighted: Dict[str, str]) -> List[str]:
+    """Weighted terms on one line, leaving out words already covered by a matched phrase."""
+    _sentences, counts, _surface = extract_terms(line)
+    matched = [term for term in counts if term in weighted and re.search("[a-z]", term)]
+    in_phrases = {word for term in matched if " " in term for word in term.split()}
+    return [term for term in matched if " " in term or term not in in_phrases]
+
+
+def split_skills(normalized_text: str, terms: List[Tuple[str, float, int, str]]) -> Tuple[List[str], List[str]]:
+    """
+    Required and preferred skills: the weighted terms found under requirement or
+    preferred headings (or in clauses marked as preferred), by weight.
+    """
+    weighted = {term: display for term, _weight, _count, display in terms}
+    required, preferred = set(), set()
+    heading = ""
+    for line in normalized_text.split("\n"):
+        if is_heading(line):
+            heading = HEADING_MARKUP.sub("", line.strip())
+            continue
+        for clause in CLAUSE_SPLIT.split(line):
+            if PREFERRED_MARKER.search(clause) or PREFERRED_HEADINGS.search(heading):
+                preferred.update(_line_terms(PREFERRED_MARKER.sub(" ", clause), weighted))
+            elif REQUIRED_HEADINGS.search(heading):
+                required.update(_line_terms(clause, weighted))
+    preferred -= required
+    order = [term for term, _weight, _count, _display in terms]
+    return ([weighted[term] for term in order if term in required],
+            [weighted[term] for term in order if term in preferred])
+
+
+def analyze_job_description(text: str) -> JobDescription:
+    """Normalize a posting, weigh its keywords and split out required and preferred skills."""
+    blocks = job_description_blocks(text)
+    normalized_text = "\n\n".join(block.text.strip("\n") for block in blocks)
+    # Headings and preferred markers are structure, not skills, so they are not weighed
+    body = "\n".join(line for line in normalized_text.split("\n") if not is_heading(line))
+    terms = weigh_terms(PREFERRED_MARKER.sub(" ", body))
+    required, preferred = split_skills(normalized_text, terms)
+    return JobDescription(job_description_id(text), text, normalized_text, blocks, terms,
+                          required, preferred, time.time())
+
+
+def _from_record(record: Dict[str, Any]) -> JobDescription:
+    """Rebuild an entry from its JSON form in the store."""
+    record = dict(record)
+    record["blocks"] = [Block(*block) for block in record["blocks"]]
+    record["terms"] = [tuple(term) for term in record["terms"]]
+    return JobDescription(**record)
+
+
+class JobDescriptionRegistry:
+    """
+    Analyzed job descriptions by content hash. Registered postings live in `store` (a
+    result cache, shared between workers when SQLite-backed); any text that is not
+    registered is analyzed once and kept in a small in-process LRU.
+    """
+
+    def __init__(self, store, memo_entries: int = 256):
+        self.store = store
+        self._memo = LRUCache(memo_entries)
+        self._lock = threading.Lock()
+        self.registered = 0
+        self.analyzed = 0
+
+    def _analyze(self, text: str) -> JobDescription:
+        with self._lock:
+            self.analyzed += 1
+        return analyze_job_description(text)
+
+    def register(self, text: str) -> Tuple[JobDescription, bool]:
+        """Store a posting and return (entry, whether it was new)."""
+        existing = self.get(job_description_id(text))
+        if existing is not None:
+            return existing, False
+        entry = self._memo.get(job_description_id(text)) or self._analyze(text)
+        self.store.set(entry.id, entry._asdict())
+        self._memo.set(entry.id, entry)
+        with self._lock:
+            self.registered += 1
+        logging.info(f"Registered job description {entry.id}: {len(entry.required_skills)} required, "
+                     f"{len(entry.preferred_skills)} preferred skills")
+        return entry, True
+
+    def get(self, job_id: str) -> Optional[JobDescription]:
+        """A registered posting by id, or None."""
+        record = self.store.get(job_id)
+        if record is None:
+            return None
+        entry = self._memo.get(job_id)
+        if entry is None:
+            entry = _from_record(record)
+            self._memo.set(job_id, entry)
+        return entry
+
+    def analysis(self, text: str) -> JobDescription:
+        """The analysis of a posting, registered or not, computed at most once per process."""
+        job_id = job_description_id(text)
+        entry = self._memo.get(job_id)
+        if entry is None:
+            entry = self.get(job_id) or self._analyze(text)
+            self._memo.set(job_id, entry)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            registered, analyzed = self.registered, self.analyzed
+        return {"store": self.store.stats(), "memo": self._memo.stats(),
+                "registered": registered, "analyzed": analyzed}
@@ -0,0 +1,110 @@
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class JobQueueFull(Exception):
+    """Raised when the background pool and its queue are both at capacity."""
+
+
+class Job:
+    """State of one background job, updated by the worker as it moves through stages."""
+
+    def __init__(self, job_id: str, render: Optional[Callable[[Any], Any]] = None):
+        self.id = job_id
+        self.render = render
+        self.status = "queued"  # queued, running, done or failed
+        self.stage = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.error_status = 500
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def set_stage(self, stage: str) -> None:
+        self.stage = stage
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "jobId": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at,
+        }
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded thread pool with a bounded queue.
+    Submissions beyond max_workers + max_queue are rejected immediately with JobQueueFull,
+    and finished jobs are forgotten ttl_seconds after they complete.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, ttl_seconds: float = 600):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.ttl_seconds = ttl_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, func: Callable[[Job], Any], render: Optional[Callable[[Any], Any]] = None) -> Job:
+        """
+        Queue func(job); its return value becomes job.result.
+        render, if given, turns the result into the API payload when it is fetched.
+        """
+        with self._lock:
+            self._purge_expired()
+            if self._active >= self.max_workers + self.max_queue:
+                raise JobQueueFull(f"Job queue is full ({self._active} jobs in progress)")
+            job = Job(str(uuid.uuid4()), render)
+            self._jobs[job.id] = job
+            self._active += 1
+
+        self._pool.submit(self._run, job, func)
+        return job
+
+    def _run(self, job: Job, func: Callable[[Job], Any]) -> None:
+        job.status = "running"
+        try:
+            job.result = func(job)
+            job.status = "done"
+            job.stage = "done"
+        except Exception as e:
+            logging.error(f"Job {job.id} failed during {job.stage}: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            job.error_status = getattr(e, "status_code", 500)
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active -= 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "active": self._active,
+                "tracked": len(self._jobs),
+                "maxWorkers": self.max_workers,
+                "maxQueue": self.max_queue,
+            }
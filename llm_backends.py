@@ -0,0 +1,501 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+import datetime
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from llm_client import CHARS_PER_TOKEN, LLMError, Prompt, SystemInstruction, prompt_chars
+from scoring import score_resume
+
+FENCED_BLOCK_PATTERN = re.compile(r"```\n(.*?)\n\s*```", re.S)
+EDIT_WORDS = ("add", "change", "update", "rewrite", "remove", "make", "shorten", "improve", "replace")
+
+
+class LLMResponse(NamedTuple):
+    """Text returned by a backend; the token counts come from the provider's usage metadata when known."""
+    text: str
+    total_tokens: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+
+
+class LLMBackend:
+    """
+    Interface behind GeminiClient. generate() returns one LLMResponse; stream() yields
+    LLMResponse chunks, of which only the last may carry token counts. prompt is a string
+    or a list of {"role", "text"} turns; config holds GenerationConfig fields
+    (temperature, max_output_tokens, response_mime_type); system is the call's fixed
+    SystemInstruction, if any.
+    Errors should carry an HTTP status in a `code` attribute so the client can retry them.
+    """
+    name = "base"
+
+    def generate(self, prompt: Prompt, config: Dict[str, Any], timeout: float,
+                 system: Optional[SystemInstruction] = None) -> LLMResponse:
+        raise NotImplementedError
+
+    def stream(self, prompt: Prompt, config: Dict[str, Any], timeout: float,
+               system: Optional[SystemInstruction] = None) -> Iterator[LLMResponse]:
+        yield self.generate(prompt, config, timeout, system)
+
+    def warm_up(self, systems: Iterable[SystemInstruction] = ()) -> None:
+        """Load whatever the first call would otherwise pay for."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+def _usage(response: Any) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
+    """(total, prompt, output, cached) token counts from a response's usage_metadata."""
+    usage = getattr(response, "usage_metadata", None)
+    counts = []
+    for field in ("total_token_count", "prompt_token_count", "candidates_token_count", "cached_content_token_count"):
+        count = getattr(usage, field, None) if usage is not None else None
+        counts.append(count if isinstance(count, int) and count > 0 else None)
+    return tuple(counts)
+
+
+class GeminiBackend(LLMBackend):
+    """
+    The real Gemini API through google.generativeai. model_factory(system_instruction) builds
+    a GenerativeModel; one is kept per system instruction. With cache_ttl set, instructions of
+    at least cache_min_tokens (the API's minimum for explicit caching) are put in a context
+    cache, renewed shortly before it expires, so their tokens are not resent and re-billed.
+    """
+    name = "gemini"
+
+    # Renew a context cache this many seconds before it expires
+    CACHE_RENEW_MARGIN = 60
+
+    def __init__(self, model_factory: Callable[[Optional[str]], Any], model_name: str = "",
+                 cache_ttl: float = 0, cache_min_tokens: int = 32768):
+        self.model_factory = model_factory
+        self.model_name = model_name
+        self.cache_ttl = cache_ttl
+        self.cache_min_tokens = cache_min_tokens
+        self._models: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self.caches_created = 0
+        self.cache_failures = 0
+
+    def _cacheable(self, system: Optional[SystemInstruction]) -> bool:
+        return bool(system and self.cache_ttl and len(system.text) // CHARS_PER_TOKEN >= self.cache_min_tokens)
+
+    def _build(self, system: Optional[SystemInstruction]) -> Tuple[Any, Optional[float]]:
+        if self._cacheable(system):
+            try:
+                import google.generativeai as genai
+                from google.generativeai import caching
+                self.model_factory(None)  # configures the SDK
+                cache = caching.CachedContent.create(
+                    model=self.model_name, display_name=system.name, system_instruction=system.text,
+                    ttl=datetime.timedelta(seconds=self.cache_ttl),
+                )
+                self.caches_created += 1
+                logging.info(f"Created context cache {cache.name} for {system.name}")
+                return genai.GenerativeModel.from_cached_content(cache), time.time() + self.cache_ttl
+            except Exception as e:
+                self.cache_failures += 1
+                logging.warning(f"Context cache for {system.name} failed ({e}); sending the instruction inline")
+        return self.model_factory(system.text if system else None), None
+
+    def _model(self, system: Optional[SystemInstruction]) -> Any:
+        name = system.name if system else ""
+        with self._lock:
+            model, expires_at = self._models.get(name, (None, None))
+            if model is None or (expires_at is not None and expires_at - time.time() < self.CACHE_RENEW_MARGIN):
+                model, expires_at = self._build(system)
+                self._models[name] = (model, expires_at)
+            return model
+
+    def _request(self, prompt: Prompt, config: Dict[str, Any], timeout: float, stream: bool,
+                 system: Optional[SystemInstruction] = None):
+        from google.generativeai.types import GenerationConfig
+        if not isinstance(prompt, str):
+            prompt = [{"role": turn["role"], "parts": [turn["text"]]} for turn in prompt]
+        return self._model(system).generate_content(
+            contents=prompt,
+            generation_config=GenerationConfig(**config),
+            stream=stream,
+            request_options={"timeout": timeout},
+        )
+
+    def generate(self, prompt: Prompt, config: Dict[str, Any], timeout: float,
+                 system: Optional[SystemInstruction] = None) -> LLMResponse:
+        response = self._request(prompt, config, timeout, False, system)
+        return LLMResponse(response.text, *_usage(response))
+
+    def stream(self, prompt: Prompt, config: Dict[str, Any], timeout: float,
+               system: Optional[SystemInstruction] = None) -> Iterator[LLMResponse]:
+        response = self._request(prompt, config, timeout, True, system)
+        for chunk in response:
+            yield LLMResponse(chunk.text or "")
+        usage = _usage(response)
+        if usage[0]:
+            yield LLMResponse("", *usage)
+
+    def warm_up(self, systems: Iterable[SystemInstruction] = ()) -> None:
+        # Context caches are created on first use: warm-up makes no network calls
+        self.model_factory(None)
+        for system in systems:
+            if not self._cacheable(system):
+                self._model(system)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "models": len(self._models),
+                "contextCaches": sum(1 for _, expires_at in self._models.values() if expires_at is not None),
+                "cachesCreated": self.caches_created,
+                "cacheFailures": self.cache_failures,
+            }
+
+
+class FakeUpstreamError(Exception):
+    """Injected failure from FakeBackend; code is the HTTP status a real upstream would return."""
+
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution in milliseconds and return a sampler in seconds:
+    fixed:MS, uniform:LOW,HIGH, normal:MEAN,SD, lognormal:MEDIAN,SIGMA or exponential:MEAN.
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()]
+    kind = kind.strip().lower()
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    if kind == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000 if values[0] > 0 else 0.0
+    raise ValueError(f"Invalid latency distribution '{spec}'")
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse 'KIND:WEIGHT,...' (e.g. '429:3,503:1,timeout:1') into a weight map."""
+    weights = {}
+    for part in spec.split(","):
+        if part.strip():
+            kind, _, weight = part.partition(":")
+            weights[kind.strip()] = float(weight or 1)
+    return weights
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline stand-in for Gemini. Answers are deterministic functions of the prompt and
+    match the JSON schemas the app asks for (enhance, chat, match score). Latency and
+    injected failures are drawn from seeded distributions so load tests are repeatable.
+    """
+    name = "fake"
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0,
+                 errors: str = "429:3,503:1,timeout:1", seed: int = 0, chunk_chars: int = 24):
+        self.latency_spec = latency
+        self.sample_latency = parse_distribution(latency)
+        self.error_rate = error_rate
+        self.error_weights = parse_weights(errors)
+        self.chunk_chars = chunk_chars
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.injected_errors = 0
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            latency = self.sample_latency(self._rng)
+            error = None
+            if self.error_rate and self._rng.random() < self.error_rate:
+                kinds = list(self.error_weights)
+                error = self._rng.choices(kinds, weights=[self.error_weights[k] for k in kinds])[0]
+                self.injected_errors += 1
+        return latency, error
+
+    def _fail(self, error: str, latency: float, timeout: float) -> None:
+        if error == "timeout":
+            time.sleep(timeout)
+            raise FakeUpstreamError("Injected upstream timeout", 504)
+        time.sleep(min(latency, timeout) * 0.1)
+        raise FakeUpstreamError(f"Injected upstream error {error}", int(error) if error.isdigit() else 503)
+
+    def answer(self, prompt: Prompt, system: Optional[SystemInstruction] = None) -> str:
+        """The deterministic response text for a prompt."""
+        if not isinstance(prompt, str):
+            # Conversations are answered from what the user side has said
+            prompt = "\n".join(turn["text"] for turn in prompt if turn["role"] == "user")
+        blocks = [block.strip() for block in FENCED_BLOCK_PATTERN.findall(prompt)]
+        # The expected reply format is named in the system instruction
+        prompt = (system.text + "\n" if system else "") + prompt
+        resume = blocks[0] if blocks else ""
+        job_description = blocks[1] if len(blocks) > 1 else ""
+        match = score_resume(resume, job_description)
+
+        if "single integer" in prompt:
+            return str(match["score"])
+
+        terms = [item["term"] for item in match["breakdown"]]
+        skills = list(dict.fromkeys(term.title() for term in terms if " " not in term))[:8]
+        keywords = [item["term"] for item in match["breakdown"] if item["matched"]][:10]
+
+        if '"edits"' in prompt:
+            # Patch-mode chat: append the request as a line, or ask for a rewrite when told to
+            message = blocks[-1] if len(blocks) > 2 else ""
+            edited = any(word in message.lower() for word in EDIT_WORDS)
+            last_line = next((line for line in reversed(resume.split("\n")) if line.strip()), "")
+            rewrite = edited and "rewrite" in message.lower()
+            return json.dumps({
+                "response": f"I updated your resume: {message}" if edited else
+                            f"Consider highlighting {', '.join(terms[:3]) or 'your most relevant work'}.",
+                "resume_updated": edited,
+                "edits": [{"op": "insert_after", "line": last_line, "text": f"- {message}"}]
+                         if edited and not rewrite else [],
+                "rewrite_required": rewrite,
+                "skills_list": skills if edited else [],
+                "keywords_used": keywords if edited else [],
+            })
+
+        if '"updated_resume"' in prompt:
+            message = blocks[-1] if len(blocks) > 2 else ""
+            if any(word in message.lower() for word in EDIT_WORDS):
+                return json.dumps({
+                    "response": f"I updated your resume: {message}",
+                    "resume_updated": True,
+                    "updated_resume": f"{resume}\n- {message}",
+                    "skills_list": skills,
+                    "keywords_used": keywords,
+                })
+            return json.dumps({
+                "response": f"Consider highlighting {', '.join(terms[:3]) or 'your most relevant work'}.",
+                "resume_updated": False,
+                "updated_resume": None,
+                "skills_list": [],
+                "keywords_used": [],
+            })
+
+        if '"enhanced_resume"' in prompt:
+            enhanced = resume
+            if skills:
+                enhanced += "\n\nKEY SKILLS\n" + ", ".join(skills)
+            return json.dumps({"enhanced_resume": enhanced, "skills_list": skills, "keywords_used": keywords})
+
+        return json.dumps({"response": "OK"})
+
+    def _usage(self, prompt: Prompt, text: str, system: Optional[SystemInstruction]) -> Tuple[int, int, int]:
+        prompt_tokens = (prompt_chars(prompt) + (len(system.text) if system else 0)) // CHARS_PER_TOKEN
+        output_tokens = len(text) // CHARS_PER_TOKEN
+        return prompt_tokens + output_tokens, prompt_tokens, output_tokens
+
+    def generate(self, prompt: Prompt, config: Dict[str, Any], timeout: float,
+                 system: Optional[SystemInstruction] = None) -> LLMResponse:
+        latency, error = self._draw()
+        if error:
+            self._fail(error, latency, timeout)
+        if latency > timeout:
+            time.sleep(timeout)
+            raise FakeUpstreamError("Fake upstream timed out", 504)
+        time.sleep(latency)
+        text = self.answer(prompt, system)
+        return LLMResponse(text, *self._usage(prompt, text, system))
+
+    def stream(self, prompt: Prompt, config: Dict[str, Any], timeout: float,
+               system: Optional[SystemInstruction] = None) -> Iterator[LLMResponse]:
+        latency, error = self._draw()
+        if error:
+            self._fail(error, latency, timeout)
+        text = self.answer(prompt, system)
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        # About a third of the latency before the first chunk, the rest spread across the stream
+        time.sleep(min(latency * 0.3, timeout))
+        gap = latency * 0.7 / len(chunks)
+        for chunk in chunks:
+            yield LLMResponse(chunk)
+            time.sleep(gap)
+        yield LLMResponse("", *self._usage(prompt, text, system))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "latency": self.latency_spec,
+                "errorRate": self.error_rate,
+                "calls": self.calls,
+                "injectedErrors": self.injected_errors,
+            }
+
+
+class CassetteMissError(LLMError):
+    """Raised in replay mode when a request was never recorded."""
+
+    def __init__(self, key: str):
+        super().__init__(f"No recorded response for request {key[:12]} in cassette", 502)
+
+
+def request_key(model_name: str, prompt: Prompt, config: Dict[str, Any],
+                system: Optional[SystemInstruction] = None) -> str:
+    """Stable identity of one request: model, generation config, system instruction and prompt."""
+    payload = json.dumps({"model": model_name, "config": config, "prompt": prompt,
+                          "system": system.text if system else None}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CassetteBackend(LLMBackend):
+    """
+    Record/replay wrapper. In "record" mode every call goes to the inner backend and the
+    response (text, stream chunks, token usage and latency) is appended to a JSONL cassette.
+    In "replay" mode responses come from the cassette only, so no network or API key is needed.
+    Entries are keyed by request_key(); prompts themselves are not stored.
+    """
+
+    def __init__(self, path: str, mode: str, model_name: str, inner: Optional[LLMBackend] = None,
+                 replay_latency: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid cassette mode '{mode}'")
+        if mode == "record" and inner is None:
+            raise ValueError("Recording needs a backend to record from")
+        self.path = path
+        self.mode = mode
+        self.model_name = model_name
+        self.inner = inner
+        self.replay_latency = replay_latency
+        self.name = f"cassette-{mode}"
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]] = entry
+        logging.info(f"Loaded {len(self._entries)} cassette entries from {self.path}")
+
+    def _record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[entry["key"]] = entry
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.recorded += 1
+
+    @staticmethod
+    def _usage_fields(response: LLMResponse) -> Dict[str, Optional[int]]:
+        return {"totalTokens": response.total_tokens, "promptTokens": response.prompt_tokens,
+                "outputTokens": response.output_tokens, "cachedTokens": response.cached_tokens}
+
+    def _lookup(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                raise CassetteMissError(key)
+            self.hits += 1
+        if self.replay_latency:
+            time.sleep(entry.get("latencyMs", 0) / 1000)
+        return entry
+
+    def generate(self, prompt: Prompt, config: Dict[str, Any], timeout: float,
+                 system: Optional[SystemInstruction] = None) -> LLMResponse:
+        key = request_key(self.model_name, prompt, config, system)
+        if self.mode == "replay":
+            entry = self._lookup(key)
+            text = entry["text"] if entry.get("text") is not None else "".join(entry.get("chunks", []))
+            return LLMResponse(text, entry.get("totalTokens"), entry.get("promptTokens"), entry.get("outputTokens"),
+                               entry.get("cachedTokens"))
+
+        start = time.perf_counter()
+        response = self.inner.generate(prompt, config, timeout, system)
+        self._record({
+            "key": key, "model": self.model_name, "config": config, "text": response.text,
+            **self._usage_fields(response), "latencyMs": round((time.perf_counter() - start) * 1000, 1),
+        })
+        return response
+
+    def stream(self, prompt: Prompt, config: Dict[str, Any], timeout: float,
+               system: Optional[SystemInstruction] = None) -> Iterator[LLMResponse]:
+        key = request_key(self.model_name, prompt, config, system)
+        if self.mode == "replay":
+            entry = self._lookup(key)
+            for chunk in entry.get("chunks") or [entry.get("text") or ""]:
+                yield LLMResponse(chunk)
+            if entry.get("totalTokens"):
+                yield LLMResponse("", entry["totalTokens"], entry.get("promptTokens"), entry.get("outputTokens"),
+                                  entry.get("cachedTokens"))
+            return
+
+        start = time.perf_counter()
+        chunks = []
+        usage = LLMResponse("")
+        for chunk in self.inner.stream(prompt, config, timeout, system):
+            if chunk.text:
+                chunks.append(chunk.text)
+            if chunk.total_tokens:
+                usage = chunk
+            yield chunk
+        self._record({
+            "key": key, "model": self.model_name, "config": config, "chunks": chunks,
+            **self._usage_fields(usage), "latencyMs": round((time.perf_counter() - start) * 1000, 1),
+        })
+
+    def warm_up(self, systems: Iterable[SystemInstruction] = ()) -> None:
+        if self.inner is not None and self.mode == "record":
+            self.inner.warm_up(systems)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "backend": self.name,
+                "cassette": self.path,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "recorded": self.recorded,
+            }
+        if self.inner is not None:
+            stats["inner"] = self.inner.stats()
+        return stats
+
+
+def create_backend(name: str, model_factory: Callable[[Optional[str]], Any], model_name: str,
+                   cassette_path: Optional[str] = None, cassette_mode: Optional[str] = None,
+                   replay_latency: bool = False, fake_options: Optional[Dict[str, Any]] = None,
+                   gemini_options: Optional[Dict[str, Any]] = None) -> LLMBackend:
+    """Build the configured backend, wrapped in a cassette when cassette_mode is set."""
+    if name == "gemini":
+        backend = GeminiBackend(model_factory, model_name, **(gemini_options or {}))
+    elif name == "fake":
+        backend = FakeBackend(**(fake_options or {}))
+    else:
+        raise ValueError(f"Unknown LLM backend '{name}'")
+
+    if cassette_mode:
+        if not cassette_path:
+            raise ValueError("LLM_CASSETTE must be set to record or replay")
+        inner = backend if cassette_mode == "record" else None
+        return CassetteBackend(cassette_path, cassette_mode, model_name, inner, replay_latency)
+    return backend
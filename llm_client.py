@@ -0,0 +1,334 @@
+import time
+import random
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Union
+
+# HTTP statuses worth retrying: quota, upstream errors and timeouts
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Exceptions without a status code that are still transient
+RETRYABLE_NAMES = {"DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted", "TooManyRequests",
+                   "InternalServerError", "RetryError", "ConnectionError", "TimeoutError"}
+
+# Rough prompt size estimate used for the tokens-per-minute bucket before the real usage is known
+CHARS_PER_TOKEN = 4
+
+# A prompt is a single user message, or a conversation of {"role": "user" | "model", "text": ...} turns
+Prompt = Union[str, List[Dict[str, str]]]
+
+
+class SystemInstruction(NamedTuple):
+    """Fixed instructions sent as the model's system instruction; name keys its model and context cache."""
+    name: str
+    text: str
+
+
+def prompt_chars(prompt: Prompt) -> int:
+    if isinstance(prompt, str):
+        return len(prompt)
+    return sum(len(turn["text"]) for turn in prompt)
+
+
+class LLMError(Exception):
+    """An LLM call failure that maps onto an HTTP error response."""
+
+    def __init__(self, message: str, status_code: int = 502, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMError):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Gemini is unavailable, please retry shortly", 503, retry_after)
+
+
+class DeadlineExceededError(LLMError):
+    """Raised when a call, including its retries and rate-limit waits, runs past its deadline."""
+
+    def __init__(self, message: str):
+        super().__init__(message, 504)
+
+
+def status_of(error: Exception) -> Optional[int]:
+    """HTTP status carried by a google.api_core / requests style exception, if any."""
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = None
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    status = status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_NAMES or isinstance(error, (ConnectionError, TimeoutError))
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to capacity tokens, refilled continuously at
+    capacity per minute. Charges may drive the balance negative (debt), which
+    later callers wait out, so a corrected usage count is never lost.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute) if per_minute and per_minute > 0 else 0.0
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Charge amount now and return how many seconds the caller must wait before using it."""
+        if not self.capacity:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def refund(self, amount: float) -> None:
+        """Give back (or, when negative, additionally charge) tokens after the real usage is known."""
+        if not self.capacity:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive upstream failures and rejects calls
+    for reset_seconds; then lets a single trial call through (half-open) and
+    closes again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(max(remaining, 1.0))
+
+    def release(self) -> None:
+        """Give up a half-open trial slot without a verdict (the call was never sent, was
+        rejected as invalid, or was abandoned before it finished)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    logging.warning(f"Gemini circuit opened after {self.failures} consecutive failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class GeminiClient:
+    """
+    The single entry point for Gemini calls: per-call deadlines, jittered exponential
+    retries on retryable errors, request- and token-per-minute buckets, and a circuit breaker.
+    """
+
+    def __init__(self, backend, requests_per_minute: float, tokens_per_minute: float,
+                 deadline_seconds: float = 60.0, max_retries: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 8.0, breaker: Optional[CircuitBreaker] = None):
+        self.backend = backend  # an llm_backends.LLMBackend
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0,
+                         "rejected": 0, "throttledSeconds": 0.0, "tokensUsed": 0,
+                         "promptTokens": 0, "outputTokens": 0, "cachedTokens": 0, "estimatedCalls": 0,
+                         "systemChars": 0, "promptChars": 0}
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def _throttle(self, estimate: int, deadline: float) -> None:
+        wait = max(self.requests.reserve(1), self.tokens.reserve(estimate))
+        if wait <= 0:
+            return
+        if time.monotonic() + wait > deadline:
+            self.requests.refund(1)
+            self.tokens.refund(estimate)
+            self._count("rejected")
+            raise LLMError("Gemini quota exhausted, please retry shortly", 429, retry_after=wait)
+        self._count("throttledSeconds", wait)
+        time.sleep(wait)
+
+    def _backoff(self, attempt: int, deadline: float) -> bool:
+        """Sleep before the next attempt; False if that would run past the deadline."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _settle_usage(self, usage, estimate: int) -> None:
+        """Correct the token bucket with the usage metadata of a response (an LLMResponse), if any."""
+        used = usage.total_tokens if usage is not None else None
+        if used:
+            self.tokens.refund(estimate - used)
+            with self._lock:
+                self.counters["tokensUsed"] += used
+                self.counters["promptTokens"] += usage.prompt_tokens or 0
+                self.counters["outputTokens"] += usage.output_tokens or 0
+                self.counters["cachedTokens"] += usage.cached_tokens or 0
+        else:
+            with self._lock:
+                self.counters["tokensUsed"] += estimate
+                self.counters["estimatedCalls"] += 1
+
+    def _call(self, prompt: Prompt, config: Dict[str, Any], deadline_seconds: Optional[float], stream: bool,
+              system: Optional[SystemInstruction] = None):
+        deadline = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+        system_chars = len(system.text) if system else 0
+        estimate = (prompt_chars(prompt) + system_chars) // CHARS_PER_TOKEN + int(config.get("max_output_tokens", 0))
+        with self._lock:
+            self.counters["calls"] += 1
+            self.counters["systemChars"] += system_chars
+            self.counters["promptChars"] += prompt_chars(prompt)
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                self._throttle(estimate, deadline)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.requests.refund(1)
+                    self.tokens.refund(estimate)
+                    raise DeadlineExceededError("Gemini call ran out of time before it could be sent")
+            except LLMError:
+                self.breaker.release()
+                raise
+            self._count("attempts")
+            try:
+                if stream:
+                    # Pull the first chunk here so a stream that fails to start is retried
+                    chunks = iter(self.backend.stream(prompt, config, remaining, system))
+                    return (next(chunks, None), chunks), estimate
+                response = self.backend.generate(prompt, config, remaining, system)
+                self.breaker.record_success()
+                self._settle_usage(response, estimate)
+                return response.text, estimate
+            except LLMError:
+                self.tokens.refund(estimate)
+                self.breaker.release()
+                raise
+            except Exception as e:
+                # A failed attempt reports no usage: give its estimate back so retries are not
+                # charged again on top of it and do not throttle unrelated calls
+                self.tokens.refund(estimate)
+                retryable = is_retryable(e)
+                # A request Gemini rejected (400-class) says nothing about its health either way
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release()
+                if not retryable or attempt >= self.max_retries or not self._backoff(attempt, deadline):
+                    self._count("failures")
+                    status = status_of(e)
+                    if retryable and (status in (408, 504) or type(e).__name__ == "DeadlineExceeded"):
+                        raise DeadlineExceededError(f"Gemini call timed out: {e}") from e
+                    if status == 429:
+                        raise LLMError(f"Gemini quota exhausted: {e}", 429, retry_after=self.base_delay) from e
+                    raise LLMError(f"Gemini call failed: {e}", 503 if retryable else 502) from e
+                attempt += 1
+                self._count("retries")
+                logging.warning(f"Gemini call failed ({e}); retry {attempt} of {self.max_retries}")
+
+    def generate(self, prompt: Prompt, deadline_seconds: Optional[float] = None,
+                 system: Optional[SystemInstruction] = None, **config) -> str:
+        """Return the response text; config holds GenerationConfig fields."""
+        text, _ = self._call(prompt, config, deadline_seconds, False, system)
+        return text
+
+    def stream(self, prompt: Prompt, deadline_seconds: Optional[float] = None,
+               system: Optional[SystemInstruction] = None, **config) -> Iterator[str]:
+        """
+        Yield response text chunks. Failures before the stream starts are retried like
+        generate(); once text has been yielded a failure is raised to the caller.
+        """
+        (first, chunks), estimate = self._call(prompt, config, deadline_seconds, True, system)
+        usage = None
+        settled = False
+        try:
+            chunk = first
+            while chunk is not None:
+                if chunk.total_tokens:
+                    usage = chunk
+                if chunk.text:
+                    yield chunk.text
+                chunk = next(chunks, None)
+            settled = True
+            self.breaker.record_success()
+            self._settle_usage(usage, estimate)
+        except LLMError:
+            raise
+        except Exception as e:
+            retryable = is_retryable(e)
+            if retryable:
+                settled = True
+                self.breaker.record_failure()
+            self._count("failures")
+            raise LLMError(f"Gemini stream failed: {e}", 503 if retryable else 502) from e
+        finally:
+            # Abandoned streams (the consumer stopped early, raising GeneratorExit), LLMErrors and
+            # rejected requests give no verdict, but must not keep a half-open trial slot forever
+            if not settled:
+                self.breaker.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        counters["throttledSeconds"] = round(counters["throttledSeconds"], 3)
+        counters["circuit"] = self.breaker.state
+        counters["circuitOpened"] = self.breaker.times_opened
+        counters["requestsPerMinute"] = self.requests.capacity
+        counters["tokensPerMinute"] = self.tokens.capacity
+        counters["backend"] = self.backend.stats()
+        return counters
@@ -0,0 +1,277 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds; the top ones cover Gemini calls with retries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Labels every pipeline stage is recorded with; unset labels are exported as ""
+STAGE_LABELS = ("stage", "endpoint", "template_type", "output_format", "file_type")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def bounded_label(value: Any, allowed: Iterable[str], other: str = "other") -> str:
+    """Label value from user input, folded to `other` when unknown so label cardinality stays bounded."""
+    value = str(value or "").lower().lstrip(".")
+    return value if value in allowed else other
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric family with fixed label names; one value per label combination."""
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; each value is [bucket counts..., sum, count]."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for key, state in sorted(values.items()):
+            for bound, count in zip(self.buckets + (float("inf"),), state[:len(self.buckets)] + [state[-1]]):
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(state[-2])}"
+            yield f"{self.name}_count{labels} {state[-1]}"
+
+
+class MetricsRegistry:
+    """
+    Metric families plus collectors that are read at scrape time, rendered in the
+    Prometheus text exposition format. A collector returns (name, kind, help, samples)
+    tuples, samples being (labels dict, value) pairs.
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Iterable]]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Iterable]]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """Labels and stage timings of the request being handled; the source of its Server-Timing header."""
+
+    def __init__(self, endpoint: str):
+        self.started = time.perf_counter()
+        self.labels: Dict[str, str] = {"endpoint": endpoint}
+        self.timings: List[Tuple[str, float]] = []
+        self.status: Optional[int] = None
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_metrics", default=None)
+
+
+def in_current_context(iterator: Iterable) -> Iterator:
+    """
+    Wrap a response generator so it runs in a copy of the caller's context: streamed
+    responses are produced after the view returns, but their stages keep the request's labels.
+    """
+    context = contextvars.copy_context()
+    iterator = iter(iterator)
+
+    def run():
+        while True:
+            try:
+                yield context.run(next, iterator)
+            except StopIteration:
+                return
+
+    return run()
+
+
+class Instrumentation:
+    """
+    Per-stage latency histograms and error counters, in-flight and request duration
+    metrics for the HTTP endpoints. Stage observations pick up the labels of the
+    current request, so code deep in the pipeline only names the stage; work handed
+    to other threads keeps them when submitted through contextvars.copy_context().run.
+    span, if given, is a context manager factory entered around each stage() block.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None,
+                 span: Optional[Callable[[str], Any]] = None):
+        self.registry = registry or MetricsRegistry()
+        self.span = span
+        self.stage_seconds = self.registry.histogram(
+            "resume_stage_duration_seconds", "Time spent in one pipeline stage.", STAGE_LABELS)
+        self.stage_errors = self.registry.counter(
+            "resume_stage_errors_total", "Pipeline stages that raised or failed.", STAGE_LABELS)
+        self.in_flight = self.registry.gauge(
+            "http_requests_in_flight", "Requests currently being handled.", ("endpoint",))
+        self.request_seconds = self.registry.histogram(
+            "http_request_duration_seconds", "Time to produce the response.", ("endpoint", "status"))
+
+    def begin_request(self, endpoint: str) -> contextvars.Token:
+        self.in_flight.inc(endpoint=endpoint)
+        return _current.set(RequestMetrics(endpoint))
+
+    def end_request(self, token: contextvars.Token) -> None:
+        current = _current.get()
+        if current is not None:
+            endpoint = current.labels["endpoint"]
+            self.in_flight.dec(endpoint=endpoint)
+            self.request_seconds.observe(time.perf_counter() - current.started,
+                                         endpoint=endpoint, status=current.status or 500)
+        _current.reset(token)
+
+    def set_status(self, status: int) -> None:
+        current = _current.get()
+        if current is not None:
+            current.status = status
+
+    def set_labels(self, **labels) -> None:
+        """Attach labels (template_type, output_format, file_type) to the current request's stages."""
+        current = _current.get()
+        if current is not None:
+            current.labels.update({name: str(value) for name, value in labels.items()})
+
+    def observe_stage(self, stage: str, seconds: float, error: bool = False, **labels) -> None:
+        current = _current.get()
+        values = dict(current.labels) if current is not None else {}
+        values.update(labels)
+        values["stage"] = stage
+        self.stage_seconds.observe(seconds, **values)
+        if error:
+            self.stage_errors.inc(**values)
+        if current is not None:
+            current.timings.append((stage, seconds))
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        """Time the enclosed block as one stage, counting an error if it raises."""
+        start = time.perf_counter()
+        try:
+            with self.span(name) if self.span else nullcontext():
+                yield
+        except BaseException:
+            self.observe_stage(name, time.perf_counter() - start, True, **labels)
+            raise
+        self.observe_stage(name, time.perf_counter() - start, False, **labels)
+
+    def observe_outcome(self, outcome) -> None:
+        """Record every stage of a pipeline.StageResults."""
+        for name, seconds in outcome.timings.items():
+            if name != "total":
+                self.observe_stage(name, seconds, name in outcome.errors)
+
+    def server_timing(self) -> Optional[str]:
+        """Server-Timing header value for the current request: its stages and the total so far."""
+        current = _current.get()
+        if current is None:
+            return None
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in current.timings]
+        entries.append(f"total;dur={(time.perf_counter() - current.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def render(self) -> str:
+        return self.registry.render()
@@ -0,0 +1,136 @@
+import io
+import os
+import re
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence
+
+# Documents longer than this are rejected before any page is parsed
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 30))
+# Documents with at least this many pages are split across the process pool
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 4))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", min(4, os.cpu_count() or 1)))
+
+MIN_USABLE_CHARS = 20
+CID_PATTERN = re.compile(r"\(cid:\d+\)")
+USABLE_CHAR_PATTERN = re.compile(r"[\w\s.,;:!?'\"()\[\]/&%+#@|•·\-–—]")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class PdfTooLongError(ValueError):
+    """Raised when a PDF has more pages than PDF_MAX_PAGES."""
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+        return _pool
+
+
+def page_text_is_usable(text: str) -> bool:
+    """
+    Quick quality check on PyPDF2 output for one page. Rejects empty pages,
+    unmapped glyphs ("(cid:12)"), mostly-symbol output and letter-spaced text,
+    which are the cases where pdfminer's layout analysis does better.
+    """
+    stripped = (text or "").strip()
+    if len(stripped) < MIN_USABLE_CHARS:
+        return False
+    if CID_PATTERN.search(stripped):
+        return False
+
+    usable = len(USABLE_CHAR_PATTERN.findall(stripped))
+    if usable / len(stripped) < 0.85:
+        return False
+
+    words = stripped.split()
+    single_letters = sum(1 for word in words if len(word) == 1 and word.isalpha())
+    if len(words) > 10 and single_letters / len(words) > 0.5:
+        return False
+    if sum(len(word) for word in words) / len(words) > 25:
+        return False
+    return True
+
+
+def _pdfminer_page(pdf_bytes: bytes, page_index: int) -> str:
+    from pdfminer.high_level import extract_text as pdfminer_extract
+    return pdfminer_extract(io.BytesIO(pdf_bytes), page_numbers=[page_index])
+
+
+def _extract_pages(pdf_bytes: bytes, page_indices: Sequence[int], reader=None) -> List[str]:
+    """Extract the given pages, falling back to pdfminer only for pages that fail the quality check."""
+    if reader is None:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+
+    texts = []
+    for index in page_indices:
+        try:
+            text = reader.pages[index].extract_text() or ""
+        except Exception as e:
+            logging.warning(f"PyPDF2 failed on page {index + 1}: {e}")
+            text = ""
+
+        if not page_text_is_usable(text):
+            try:
+                fallback = _pdfminer_page(pdf_bytes, index)
+                if len(fallback.strip()) > len(text.strip()):
+                    text = fallback
+            except Exception as e:
+                logging.warning(f"pdfminer failed on page {index + 1}: {e}")
+        texts.append(text)
+    return texts
+
+
+def _chunk(indices: List[int], parts: int) -> List[List[int]]:
+    size = -(-len(indices) // parts)
+    return [indices[i:i + size] for i in range(0, len(indices), size)]
+
+
+def extract_pdf_text(source, max_pages: int = None) -> str:
+    """
+    Extract text from a PDF path or bytes, opening the document once.
+    Pages are extracted in parallel across a process pool for longer documents,
+    and pdfminer is only run on pages whose PyPDF2 text looks unusable.
+    """
+    max_pages = max_pages or PDF_MAX_PAGES
+    if isinstance(source, (bytes, bytearray)):
+        pdf_bytes = bytes(source)
+    else:
+        with open(source, 'rb') as f:
+            pdf_bytes = f.read()
+
+    try:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        page_count = len(reader.pages)
+    except Exception as e:
+        # PyPDF2 is missing or cannot open the file at all; let pdfminer try the whole document
+        logging.warning(f"PyPDF2 could not open PDF: {e}, trying pdfminer...")
+        from pdfminer.high_level import extract_text as pdfminer_extract
+        text = pdfminer_extract(io.BytesIO(pdf_bytes), maxpages=max_pages)
+        return text if text.strip() else "No text could be extracted from PDF"
+
+    if page_count > max_pages:
+        raise PdfTooLongError(f"PDF has {page_count} pages; the limit is {max_pages}")
+
+    indices = list(range(page_count))
+    if page_count >= PDF_PARALLEL_MIN_PAGES and PDF_WORKERS > 1:
+        chunks = _chunk(indices, PDF_WORKERS)
+        try:
+            pool = _get_pool()
+            futures = [pool.submit(_extract_pages, pdf_bytes, chunk) for chunk in chunks]
+            texts = [text for future in futures for text in future.result()]
+        except Exception as e:
+            logging.warning(f"Parallel PDF extraction failed: {e}, extracting in-process...")
+            texts = _extract_pages(pdf_bytes, indices, reader)
+    else:
+        texts = _extract_pages(pdf_bytes, indices, reader)
+
+    text = "\n".join(texts)
+    return text if text.strip() else "No text could be extracted from PDF"
@@ -0,0 +1,111 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, ContextManager, Dict, List, NamedTuple, Optional, Sequence
+
+# Shared by every request, so concurrent requests cannot oversubscribe the host
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", 8))
+executor = ThreadPoolExecutor(max_workers=PIPELINE_MAX_WORKERS, thread_name_prefix="pipeline")
+
+
+class Stage(NamedTuple):
+    """A unit of pipeline work; func receives the results of depends_on, in order."""
+    name: str
+    func: Callable[..., Any]
+    depends_on: Sequence[str] = ()
+
+
+class StageResults:
+    """Outcome of run_stages: per-stage results, errors and wall-clock timings."""
+
+    def __init__(self):
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, Exception] = {}
+        self.timings: Dict[str, float] = {}
+
+    def ok(self, name: str) -> bool:
+        return name in self.results
+
+    def timings_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()}
+
+
+def _timed(func: Callable[..., Any], args: List[Any], name: str,
+           around: Optional[Callable[[str], ContextManager]] = None):
+    start = time.perf_counter()
+    try:
+        if around is None:
+            return func(*args), time.perf_counter() - start
+        with around(name):
+            return func(*args), time.perf_counter() - start
+    except Exception as e:
+        e.stage_seconds = time.perf_counter() - start
+        raise
+
+
+def run_stages(stages: List[Stage], pool: ThreadPoolExecutor = None,
+               around: Optional[Callable[[str], ContextManager]] = None) -> StageResults:
+    """
+    Run stages as a dependency graph on the shared executor.
+    Each stage starts as soon as its dependencies succeed; stages whose dependencies
+    failed are skipped and reported as errors. Blocks until every stage is settled.
+    Stages run in a copy of the caller's context; around(name), if given, is entered
+    around each stage in its worker thread (e.g. a tracing span).
+    """
+    pool = pool or executor
+    outcome = StageResults()
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+    start = time.perf_counter()
+
+    while pending or running:
+        for name, stage in list(pending.items()):
+            failed = [dep for dep in stage.depends_on if dep in outcome.errors]
+            if failed:
+                outcome.errors[name] = RuntimeError(f"Skipped because {', '.join(failed)} failed")
+                del pending[name]
+            elif all(outcome.ok(dep) for dep in stage.depends_on):
+                args = [outcome.results[dep] for dep in stage.depends_on]
+                context = contextvars.copy_context()
+                running[pool.submit(context.run, _timed, stage.func, args, name, around)] = name
+                del pending[name]
+
+        if not running:
+            if pending:
+                raise ValueError(f"Unsatisfiable stage dependencies: {', '.join(pending)}")
+            break
+
+        done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            try:
+                outcome.results[name], outcome.timings[name] = future.result()
+            except Exception as e:
+                logging.error(f"Pipeline stage '{name}' failed: {e}")
+                outcome.errors[name] = e
+                outcome.timings[name] = getattr(e, "stage_seconds", 0.0)
+
+    outcome.timings["total"] = time.perf_counter() - start
+    return outcome
+
+
+class RateLimiter:
+    """Blocking limiter that spaces calls evenly so at most rate_per_minute start per minute."""
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute and rate_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,216 @@
+import io
+import os
+import json
+import time
+import hmac
+import uuid
+import pstats
+import cProfile
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+_session: contextvars.ContextVar = contextvars.ContextVar("profile_session", default=None)
+
+# Functions listed in a stored profile's summary, by cumulative time
+SUMMARY_FUNCTIONS = 30
+
+# Only one cProfile can be active per process on Python 3.12+, so one request is profiled at a time
+_active = threading.Lock()
+
+
+class ProfileSession:
+    """
+    One profiled request: a cProfile of the request thread and the trace spans of every
+    stage. Stages run on worker threads are timed but not profiled.
+    """
+
+    def __init__(self, endpoint: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.path = path
+        self.created_at = time.time()
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        """Profile the calling (request) thread."""
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            span = {
+                "name": name,
+                "thread": threading.current_thread().name,
+                "startMs": round((start - self.started) * 1000, 2),
+                "durationMs": round((time.perf_counter() - start) * 1000, 2),
+            }
+            if error:
+                span["error"] = error
+            with self._lock:
+                self.spans.append(span)
+
+    def stats(self) -> Optional[pstats.Stats]:
+        """The request profile; None if nothing was recorded."""
+        try:
+            return pstats.Stats(self._profile, stream=io.StringIO())
+        except TypeError:
+            return None  # a profile that never collected anything
+
+
+@contextmanager
+def span(name: str):
+    """Trace span for the profiled request in this context; a no-op otherwise."""
+    session = _session.get()
+    if session is None:
+        yield
+        return
+    with session.span(name):
+        yield
+
+
+def summarize(stats: pstats.Stats, limit: int = SUMMARY_FUNCTIONS) -> List[Dict[str, Any]]:
+    """Hottest functions by cumulative time."""
+    rows = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({function})",
+            "calls": calls,
+            "totalMs": round(total * 1000, 2),
+            "cumulativeMs": round(cumulative * 1000, 2),
+        })
+    rows.sort(key=lambda row: row["cumulativeMs"], reverse=True)
+    return rows[:limit]
+
+
+class ProfileStore:
+    """
+    Stored profiles: <id>.prof (pstats format, for snakeviz or pstats) and <id>.json
+    (request, spans and hottest functions). Only the newest max_profiles are kept.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def path(self, profile_id: str, kind: str) -> Optional[str]:
+        """Path of a stored profile file (kind "prof" or "json"), or None if unknown or malformed."""
+        if not profile_id.isalnum():
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{kind}")
+        return path if os.path.exists(path) else None
+
+    def save(self, session: ProfileSession, status: int) -> Dict[str, Any]:
+        stats = session.stats()
+        summary = {
+            "id": session.id,
+            "endpoint": session.endpoint,
+            "path": session.path,
+            "status": status,
+            "createdAt": session.created_at,
+            "durationMs": round((time.perf_counter() - session.started) * 1000, 2),
+            "spans": sorted(session.spans, key=lambda item: item["startMs"]),
+            "functions": summarize(stats) if stats is not None else [],
+        }
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if stats is not None:
+                stats.dump_stats(os.path.join(self.directory, f"{session.id}.prof"))
+            with open(os.path.join(self.directory, f"{session.id}.json"), "w", encoding="utf-8") as f:
+                json.dump(summary, f)
+            self._evict()
+        logging.info(f"Stored profile {session.id} for {session.path} ({summary['durationMs']:.0f} ms)")
+        return summary
+
+    def _evict(self) -> None:
+        summaries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in summaries[:max(0, len(summaries) - self.max_profiles)]:
+            profile_id = entry.name[:-len(".json")]
+            for kind in ("json", "prof"):
+                try:
+                    os.remove(os.path.join(self.directory, f"{profile_id}.{kind}"))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Stored profiles, newest first, without their spans and functions."""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    with open(entry.path, encoding="utf-8") as f:
+                        summary = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                profiles.append({key: summary[key] for key in
+                                 ("id", "endpoint", "path", "status", "createdAt", "durationMs")})
+        return sorted(profiles, key=lambda item: item["createdAt"], reverse=True)
+
+
+class RequestProfiler:
+    """
+    Opt-in profiling of single requests. Disabled unless an admin token is configured;
+    a request is profiled when it asks for it and carries that token.
+    """
+
+    def __init__(self, store: ProfileStore, admin_token: Optional[str]):
+        self.store = store
+        self.admin_token = admin_token or None
+
+    @property
+    def enabled(self) -> bool:
+        return self.admin_token is not None
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        # Compared as bytes: compare_digest rejects str arguments with non-ASCII characters
+        if not self.enabled or not token:
+            return False
+        return hmac.compare_digest(token.encode("utf-8"), self.admin_token.encode("utf-8"))
+
+    def begin(self, endpoint: str, path: str) -> Optional[contextvars.Token]:
+        """Start profiling the current request; None if another request is being profiled."""
+        if not _active.acquire(blocking=False):
+            return None
+        session = ProfileSession(endpoint, path)
+        try:
+            session.start()
+        except ValueError as e:  # another profiler (a debugger, coverage) is active
+            _active.release()
+            logging.warning(f"Could not profile {path}: {e}")
+            return None
+        return _session.set(session)
+
+    def end(self, token: contextvars.Token, status: int) -> Optional[Dict[str, Any]]:
+        """Stop profiling the current request and store its profile; returns the summary."""
+        session = _session.get()
+        _session.reset(token)
+        if session is None:
+            return None
+        session.stop()
+        _active.release()
+        try:
+            return self.store.save(session, status)
+        except OSError as e:
+            logging.error(f"Could not store profile {session.id}: {e}")
+            return None
@@ -0,0 +1,244 @@
+import re
+import logging
+import contextvars
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from llm_client import CHARS_PER_TOKEN, LLMError
+from resume_document import HEADING_MARKUP, is_section_heading
+
+# pdfminer/PyPDF2 noise: unmapped glyphs, form feeds, soft hyphens and zero-width characters
+ARTIFACT_PATTERN = re.compile(r"\(cid:\d+\)|[\f\v\u00ad\u200b\u200c\u200d\u2060\ufeff]")
+INNER_SPACE_PATTERN = re.compile(r"(?<=\S)[ \t\u00a0]{2,}")
+PAGE_NUMBER_PATTERN = re.compile(r"^\s*(?:page\s+\d+(?:\s*(?:of|/)\s*\d+)?|-\s*\d{1,3}\s*-|\d{1,3}\s*/\s*\d{1,3})\s*$",
+                                 re.IGNORECASE)
+BLANK_RUN_PATTERN = re.compile(r"\n{3,}")
+
+# Job description sections that never help tailor a resume, by heading
+BOILERPLATE_HEADINGS = re.compile(
+    r"benefits|perks|what we offer|equal (?:employment )?opportunit|\beeo\b|accommodation|how to apply|"
+    r"compensation|salary|pay (?:range|transparency)|privacy|disclaimer|why (?:join|work)",
+    re.IGNORECASE)
+# Paragraphs that are boilerplate wherever they appear
+BOILERPLATE_PHRASES = re.compile(
+    r"equal opportunity employer|without regard to (?:race|age|sex)|reasonable accommodation|e-verify|"
+    r"recruitment agenc|pay transparency|privacy (?:notice|policy)",
+    re.IGNORECASE)
+# Sections kept if they fit, trimmed first when they do not
+COMPANY_HEADINGS = re.compile(
+    r"about (?:us|the company|the team)|who we are|our (?:mission|culture|values|story)|company overview|life at",
+    re.IGNORECASE)
+# Sections never trimmed
+CORE_HEADINGS = re.compile(
+    r"requirement|qualification|responsibilit|skills|experience|must|what you(?:'ll)? (?:do|bring|need)|the role",
+    re.IGNORECASE)
+# Sections of nice-to-have skills
+PREFERRED_HEADINGS = re.compile(r"prefer|nice[- ]to[- ]have|bonus|desir|good to have|plus", re.IGNORECASE)
+# Section names that are headings even without markup (# , trailing colon, caps or bold).
+# Matched against the whole line, so a sentence such as "Experience with AWS" is not one.
+PLAIN_HEADING = re.compile(
+    r"(?:(?:key|core|basic|minimum|preferred|desired|additional|technical|required|job|your|our|the)\s+){0,2}"
+    r"(?:requirements?|qualifications?|responsibilities|duties|skills(?:\s+(?:and|&)\s+(?:experience|qualifications))?"
+    r"|experience|nice[- ]to[- ]haves?|good to have|bonus(?:\s+points)?|pluses|benefits|perks|what we offer"
+    r"|compensation|salary|how to apply|about (?:us|the company|the team|the role|you)|who we are|who you are"
+    r"|our (?:mission|culture|values|story)|company overview|what you(?:'ll)? (?:do|bring|need|get)|the role"
+    r"|role overview|overview|equal (?:employment )?opportunity(?: employer)?)",
+    re.IGNORECASE)
+
+# Running headers and footers are looked for among this many lines at each end of the text
+FURNITURE_LINES = 2
+
+_report: contextvars.ContextVar = contextvars.ContextVar("prompt_report", default=None)
+
+
+class PromptBudgetError(LLMError):
+    """The inputs that cannot be trimmed are over the prompt token budget."""
+
+    def __init__(self, message: str):
+        super().__init__(message, 413)
+
+
+class Block(NamedTuple):
+    """A piece of prompt input. Priority 0 is never trimmed; higher priorities are trimmed first."""
+    text: str
+    priority: int = 0
+    label: str = ""
+
+
+class Compaction(NamedTuple):
+    resume_text: str
+    job_description: str
+    extra: List[Block]
+    tokens_before: int
+    tokens_after: int
+    trimmed: List[str]
+
+
+def count_tokens(text: str) -> int:
+    """Token estimate on the same scale as the client's quota accounting."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def compact_text(text: str) -> str:
+    """Drop extraction artifacts and page numbers, collapse inner whitespace and blank runs."""
+    if not text:
+        return ""
+    text = ARTIFACT_PATTERN.sub("", text.replace("\r\n", "\n").replace("\t", "    "))
+    lines = []
+    for line in text.split("\n"):
+        if PAGE_NUMBER_PATTERN.match(line):
+            continue
+        lines.append(INNER_SPACE_PATTERN.sub(" ", line.rstrip()))
+    return BLANK_RUN_PATTERN.sub("\n\n", "\n".join(lines)).strip("\n")
+
+
+def strip_page_furniture(text: str) -> str:
+    """
+    Remove running headers and footers from extracted multi-page text: later copies of
+    the document's first or last few lines, such as the name and contact line repeated
+    at the top of every page. The first copy is kept.
+    """
+    lines = text.split("\n")
+    content = [line.strip() for line in lines if line.strip()]
+    counts: Dict[str, int] = {}
+    for line in content:
+        counts[line] = counts.get(line, 0) + 1
+    edges = set(content[:FURNITURE_LINES] + content[-FURNITURE_LINES:])
+    furniture = {line for line in edges if counts[line] > 1 and line[0] not in "-*\u2022"}
+    if not furniture:
+        return text
+
+    seen, kept = set(), []
+    for line in lines:
+        stripped = line.strip()
+        if stripped in furniture and stripped in seen:
+            continue
+        seen.add(stripped)
+        kept.append(line)
+    logging.info(f"Removed {len(lines) - len(kept)} running header/footer line(s)")
+    return "\n".join(kept)
+
+
+def is_heading(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or stripped[0] in "-*\u2022" and not stripped.startswith("**"):
+        return False
+    name = HEADING_MARKUP.sub("", stripped)
+    if not name or len(name.split()) > 8:
+        return False
+    # Resume section headings (uppercase lines) are headings here too, plus job description styles
+    return (is_section_heading(name) or stripped.startswith("#") or stripped.endswith(":")
+            or (stripped.startswith("**") and stripped.endswith("**")) or bool(PLAIN_HEADING.fullmatch(name)))
+
+
+def job_description_blocks(text: str) -> List[Block]:
+    """
+    Split a compacted job description into sections, dropping boilerplate ones and
+    prioritising the rest: requirements never trimmed, company blurbs trimmed first.
+    """
+    sections: List[Tuple[str, List[str]]] = [("", [])]
+    for line in compact_text(text).split("\n"):
+        if is_heading(line):
+            sections.append((HEADING_MARKUP.sub("", line.strip()), [line]))
+        else:
+            sections[-1][1].append(line)
+
+    blocks = []
+    for heading, lines in sections:
+        if heading and BOILERPLATE_HEADINGS.search(heading):
+            continue
+        paragraphs = [paragraph for paragraph in "\n".join(lines).split("\n\n")
+                      if paragraph.strip() and not BOILERPLATE_PHRASES.search(paragraph)]
+        if not paragraphs:
+            continue
+        if heading and COMPANY_HEADINGS.search(heading):
+            priority = 2
+        elif not heading or CORE_HEADINGS.search(heading):
+            priority = 0
+        else:
+            priority = 1
+        blocks.append(Block("\n\n".join(paragraphs), priority, f"jobDescription:{heading or 'intro'}"))
+    return blocks
+
+
+def fit_budget(blocks: Sequence[Block], budget: int, fixed_tokens: int = 0) -> Tuple[List[Block], List[str]]:
+    """
+    Drop blocks, highest priority number first and later ones before earlier ones,
+    until everything fits the budget. Returns the kept blocks (in order) and the labels
+    of the trimmed ones; raises PromptBudgetError if priority-0 blocks alone do not fit.
+    """
+    total = fixed_tokens + sum(count_tokens(block.text) for block in blocks)
+    if not budget or total <= budget:
+        return list(blocks), []
+    dropped = set()
+    order = sorted(range(len(blocks)), key=lambda index: (-blocks[index].priority, -index))
+    for index in order:
+        if total <= budget or blocks[index].priority == 0:
+            break
+        dropped.add(index)
+        total -= count_tokens(blocks[index].text)
+    if total > budget:
+        raise PromptBudgetError(
+            f"The resume and job description come to about {total} tokens, over the limit of {budget}; "
+            f"please shorten them and try again"
+        )
+    kept = [block for index, block in enumerate(blocks) if index not in dropped]
+    return kept, [blocks[index].label for index in sorted(dropped)]
+
+
+def compact_inputs(call: str, template: str, resume_text: str, job_description: str, budget: int,
+                   extra: Iterable[Block] = (), jd_blocks: Optional[Sequence[Block]] = None) -> Compaction:
+    """
+    The pre-send stage of a Gemini call: compact the resume and job description, drop
+    boilerplate, and trim by priority to the token budget (the template and extra blocks,
+    such as chat history, count against it too). jd_blocks, if given, are the job
+    description's precomputed job_description_blocks(). Recorded on the current request's report.
+    """
+    extra = list(extra)
+    tokens_before = count_tokens(template) + sum(count_tokens(part) for part in (resume_text, job_description))
+    tokens_before += sum(count_tokens(block.text) for block in extra)
+
+    resume_block = Block(compact_text(strip_page_furniture(resume_text)), 0, "resume")
+    if jd_blocks is None:
+        jd_blocks = job_description_blocks(job_description)
+    kept, trimmed = fit_budget([resume_block] + list(jd_blocks) + extra, budget, count_tokens(template))
+    job_description = "\n\n".join(block.text for block in kept if block.label.startswith("jobDescription:"))
+    kept_extra = [block for block in kept if block in extra]
+    tokens_after = count_tokens(template) + sum(count_tokens(block.text) for block in kept)
+
+    if trimmed:
+        logging.warning(f"Trimmed {', '.join(trimmed)} from the {call} prompt to fit {budget} tokens")
+    report = _report.get()
+    if report is not None:
+        report.add(call, tokens_before, tokens_after, trimmed)
+    return Compaction(resume_block.text, job_description, kept_extra, tokens_before, tokens_after, trimmed)
+
+
+class PromptReport:
+    """Prompt tokens before and after compaction for the Gemini calls of one request."""
+
+    def __init__(self):
+        self.calls: List[Dict[str, object]] = []
+
+    def add(self, call: str, tokens_before: int, tokens_after: int, trimmed: List[str]) -> None:
+        self.calls.append({"call": call, "tokensBefore": tokens_before, "tokensAfter": tokens_after,
+                           "trimmed": trimmed})
+
+    @property
+    def tokens_sent(self) -> int:
+        return sum(item["tokensAfter"] for item in self.calls)
+
+    @property
+    def tokens_saved(self) -> int:
+        return sum(item["tokensBefore"] - item["tokensAfter"] for item in self.calls)
+
+
+def begin_report() -> contextvars.Token:
+    return _report.set(PromptReport())
+
+
+def current_report() -> Optional[PromptReport]:
+    return _report.get()
+
+
+def end_report(token: contextvars.Token) -> None:
+    _report.reset(token)
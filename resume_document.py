@@ -0,0 +1,93 @@
+import re
+from typing import Any, Dict, List, NamedTuple
+
+from text_normalization import strip_markdown
+
+BULLET_MARKERS = ("\u2022", "-", "*")
+MONTHS = "Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec"
+# A line mentioning a year or a month abbreviation: a job title, degree or date line
+DATED_PATTERN = re.compile(rf"\b(?:(?:19|20)\d{{2}}|{MONTHS})\b")
+# Dates and date ranges, e.g. "2019", "Jan 2020 - Present", "March 2018 - Jun. 2021"
+MONTH_NAME = (r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?"
+              r"|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\.?")
+DATE_PATTERN = re.compile(
+    rf"\b(?:{MONTH_NAME}\s+)?(?:19|20)\d{{2}}\b"
+    rf"(?:\s*(?:-|\u2013|\u2014|to)\s*(?:(?:{MONTH_NAME}\s+)?(?:19|20)\d{{2}}\b|Present|Current|Now))?")
+# Markup around a heading's name: markdown heading and emphasis markers, a trailing colon
+HEADING_MARKUP = re.compile(r"^[#*_\s]+|[*_:\s]+$")
+
+
+class Line(NamedTuple):
+    """One non-blank line, markdown stripped. kind is "bullet" or "text"."""
+    text: str
+    kind: str
+    dated: bool
+
+
+class Entry(NamedTuple):
+    """A run of lines between blank lines: a job, a degree, a paragraph."""
+    lines: List[Line]
+
+    @property
+    def title(self) -> str:
+        return next((line.text.strip() for line in self.lines if line.kind == "text"), "")
+
+    @property
+    def dates(self) -> List[str]:
+        return [match.group(0) for line in self.lines if line.kind == "text"
+                for match in DATE_PATTERN.finditer(line.text)]
+
+
+class Section(NamedTuple):
+    """A heading (an uppercase line) and its entries; any lines before the first heading have no title."""
+    title: str
+    entries: List[Entry]
+
+
+class ResumeDocument(NamedTuple):
+    """A resume parsed once into sections, entries, bullets and dates, for every renderer."""
+    sections: List[Section]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"sections": [{
+            "title": section.title,
+            "entries": [{
+                "title": entry.title,
+                "dates": entry.dates,
+                "text": [line.text.strip() for line in entry.lines if line.kind == "text"][1:],
+                "bullets": [line.text.strip().lstrip("".join(BULLET_MARKERS)).strip()
+                            for line in entry.lines if line.kind == "bullet"],
+            } for entry in section.entries],
+        } for section in self.sections]}
+
+
+def is_section_heading(line: str) -> bool:
+    """Whether a line (markdown already stripped) opens a resume section: it is uppercase."""
+    return line.strip().isupper()
+
+
+def parse_resume(text: str) -> ResumeDocument:
+    """
+    Parse resume text the way the PDF templates read it: uppercase lines are section
+    headings, lines starting with a bullet marker are bullets, blank lines separate entries.
+    """
+    sections = [Section("", [])]
+    lines: List[Line] = []
+
+    def close_entry():
+        if lines:
+            sections[-1].entries.append(Entry(list(lines)))
+            lines.clear()
+
+    for raw in strip_markdown(text or "").split("\n"):
+        stripped = raw.strip()
+        if not stripped:
+            close_entry()
+        elif is_section_heading(stripped):
+            close_entry()
+            sections.append(Section(stripped, []))
+        else:
+            kind = "bullet" if stripped.startswith(BULLET_MARKERS) else "text"
+            lines.append(Line(raw, kind, bool(DATED_PATTERN.search(raw))))
+    close_entry()
+    return ResumeDocument([section for section in sections if section.title or section.entries])
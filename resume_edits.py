@@ -0,0 +1,107 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from resume_document import HEADING_MARKUP, is_section_heading
+from text_normalization import strip_markdown
+
+# Operations a chat reply may ask for; each names an existing line of the resume
+EDIT_OPS = ("replace", "insert_after", "delete")
+
+# More edits than this in one reply is a rewrite in disguise
+MAX_EDITS = 40
+
+BULLET_PATTERN = re.compile("^(\\s*)([•*-]\\s+)?")
+
+
+class PatchError(ValueError):
+    """A chat edit that does not apply cleanly to the current resume."""
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def section_name(line: str) -> Optional[str]:
+    """The heading a line opens, detected as parse_resume (and so the renderers) detects it, else None."""
+    stripped = strip_markdown(line).strip()
+    if not is_section_heading(stripped):
+        return None
+    return HEADING_MARKUP.sub("", stripped).upper() or None
+
+
+def _section_ranges(lines: Sequence[str]) -> Dict[str, Tuple[int, int]]:
+    """Heading name -> (start, end) line range, the heading line included."""
+    ranges, name, start = {}, None, 0
+    for index, line in enumerate(lines):
+        heading = section_name(line)
+        if heading is not None:
+            if name is not None:
+                ranges.setdefault(name, (start, index))
+            name, start = heading, index
+    if name is not None:
+        ranges.setdefault(name, (start, len(lines)))
+    return ranges
+
+
+def _find_line(lines: List[str], target: str, section: Optional[str]) -> int:
+    """Index of the one line matching target, searched in its section first."""
+    target = _normalize(target)
+    if not target:
+        raise PatchError("edit does not name a line")
+    scopes = []
+    if section:
+        section_range = _section_ranges(lines).get(HEADING_MARKUP.sub("", section).upper())
+        if section_range:
+            scopes.append(range(*section_range))
+    scopes.append(range(len(lines)))
+
+    for scope in scopes:
+        exact = [index for index in scope if _normalize(lines[index]) == target]
+        if len(exact) == 1:
+            return exact[0]
+        if len(exact) > 1:
+            raise PatchError(f"line is ambiguous: {target[:60]!r}")
+        # Models sometimes drop the bullet or trailing punctuation; accept a unique containing line
+        partial = [index for index in scope if target in _normalize(lines[index])]
+        if len(partial) == 1:
+            return partial[0]
+    raise PatchError(f"line not found: {target[:60]!r}")
+
+
+def _like(anchor: str, text: str) -> str:
+    """New text with the anchor line's indentation and bullet marker, unless it has its own."""
+    if text != text.lstrip() or BULLET_PATTERN.match(text).group(2):
+        return text
+    indent, bullet = BULLET_PATTERN.match(anchor).groups()
+    return f"{indent}{bullet or ''}{text}"
+
+
+def apply_edits(resume_text: str, edits: Any) -> str:
+    """
+    Apply a chat reply's edit operations in order and return the new resume.
+    Raises PatchError if any edit is malformed or does not match exactly one line.
+    """
+    if not isinstance(edits, list) or not edits:
+        raise PatchError("no edits")
+    if len(edits) > MAX_EDITS:
+        raise PatchError(f"{len(edits)} edits, more than {MAX_EDITS}")
+
+    lines = resume_text.split("\n")
+    for edit in edits:
+        if not isinstance(edit, dict) or edit.get("op") not in EDIT_OPS:
+            raise PatchError(f"unknown edit: {str(edit)[:80]}")
+        op, text = edit["op"], edit.get("text")
+        if op != "delete" and not isinstance(text, str):
+            raise PatchError(f"{op} edit without text")
+        index = _find_line(lines, str(edit.get("line") or ""), edit.get("section"))
+        if op == "replace":
+            lines[index:index + 1] = [_like(lines[index], line) for line in text.split("\n")]
+        elif op == "insert_after":
+            lines[index + 1:index + 1] = [_like(lines[index], line) for line in text.split("\n")]
+        else:
+            del lines[index]
+
+    updated = "\n".join(lines)
+    if not updated.strip():
+        raise PatchError("edits removed the whole resume")
+    return updated
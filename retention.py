@@ -0,0 +1,182 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class RetentionManager:
+    """
+    Tracks generated and uploaded files in a small SQLite index and evicts them
+    oldest-first once they exceed a TTL or the folders exceed a total size cap.
+    Evicted names are remembered for a while so downloads can report them as expired.
+    """
+
+    def __init__(self, folders: List[str], index_path: str, ttl_seconds: float,
+                 max_bytes: int, tombstone_ttl: float = 30 * 24 * 60 * 60):
+        self.folders = folders
+        self.index_path = index_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.tombstone_ttl = tombstone_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.sweeps = 0
+        self.files_evicted = 0
+        self.bytes_reclaimed = 0
+        self.last_sweep_at: Optional[float] = None
+
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_created ON artifacts (created_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS expired (path TEXT PRIMARY KEY, expired_at REAL NOT NULL)"
+            )
+        self._bootstrap()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _bootstrap(self) -> None:
+        """Index files that predate the index with a one-off scan of each folder not yet tracked."""
+        conn = self._connect()
+        rows = []
+        for folder in self.folders:
+            if not os.path.isdir(folder):
+                continue
+            prefix = os.path.join(folder, "")
+            tracked = conn.execute("SELECT 1 FROM artifacts WHERE substr(path, 1, ?) = ? LIMIT 1",
+                                   (len(prefix), prefix)).fetchone()
+            if tracked:
+                continue
+            for entry in os.scandir(folder):
+                if entry.is_file():
+                    stat = entry.stat()
+                    rows.append((os.path.join(folder, entry.name), stat.st_size, stat.st_mtime))
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO artifacts (path, size, created_at) VALUES (?, ?, ?)", rows)
+        if rows:
+            logging.info(f"Retention index bootstrapped with {len(rows)} existing files")
+
+    def register(self, path: str) -> None:
+        """Record a newly written file."""
+        try:
+            size = os.path.getsize(path)
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO artifacts (path, size, created_at) VALUES (?, ?, ?)",
+                    (os.path.normpath(path), size, time.time())
+                )
+        except Exception as e:
+            logging.warning(f"Could not index {path}: {e}")
+
+    def is_expired(self, path: str) -> bool:
+        """True if the file was evicted by retention (as opposed to never existing)."""
+        row = self._connect().execute(
+            "SELECT 1 FROM expired WHERE path = ?", (os.path.normpath(path),)
+        ).fetchone()
+        return row is not None
+
+    def _evict(self, conn: sqlite3.Connection, rows) -> int:
+        reclaimed = 0
+        removed = 0
+        now = time.time()
+        for path, size in rows:
+            try:
+                os.remove(path)
+                reclaimed += size
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"Could not delete {path}: {e}")
+                continue
+            conn.execute("DELETE FROM artifacts WHERE path = ?", (path,))
+            conn.execute("INSERT OR REPLACE INTO expired (path, expired_at) VALUES (?, ?)", (path, now))
+            removed += 1
+        with self._lock:
+            self.files_evicted += removed
+            self.bytes_reclaimed += reclaimed
+        return reclaimed
+
+    def sweep(self) -> Dict[str, int]:
+        """Evict expired files, then the oldest files until the size cap is met."""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            expired = conn.execute(
+                "SELECT path, size FROM artifacts WHERE created_at < ? ORDER BY created_at",
+                (now - self.ttl_seconds,)
+            ).fetchall()
+            evicted = len(expired)
+            reclaimed = self._evict(conn, expired)
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+            if total > self.max_bytes:
+                over = []
+                excess = total - self.max_bytes
+                for path, size in conn.execute("SELECT path, size FROM artifacts ORDER BY created_at"):
+                    if excess <= 0:
+                        break
+                    over.append((path, size))
+                    excess -= size
+                evicted += len(over)
+                reclaimed += self._evict(conn, over)
+
+            conn.execute("DELETE FROM expired WHERE expired_at < ?", (now - self.tombstone_ttl,))
+
+        with self._lock:
+            self.sweeps += 1
+            self.last_sweep_at = now
+        if evicted:
+            logging.info(f"Retention sweep evicted {evicted} files, reclaimed {reclaimed} bytes")
+        return {"evicted": evicted, "bytesReclaimed": reclaimed}
+
+    def start(self, interval_seconds: float) -> None:
+        """Run sweep() every interval_seconds on a daemon thread."""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logging.error(f"Retention sweep failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="retention-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        with self._lock:
+            return {
+                "trackedFiles": count,
+                "trackedBytes": total,
+                "maxBytes": self.max_bytes,
+                "ttlSeconds": self.ttl_seconds,
+                "sweeps": self.sweeps,
+                "filesEvicted": self.files_evicted,
+                "bytesReclaimed": self.bytes_reclaimed,
+                "lastSweepAt": self.last_sweep_at,
+            }
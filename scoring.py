@@ -0,0 +1,156 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Tokens keep the punctuation that is meaningful in skill names (C++, C#, Node.js, CI/CD)
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./\-][a-z0-9+#]+)*")
+SENTENCE_SPLIT_PATTERN = re.compile(r"[\n;!?()\[\]•·]+|[.:,](?:\s+|$)")
+
+STOP_WORDS = frozenset("""
+a about above across after again against all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each either etc few for
+from further had has have having he her here hers him his how i if in into is it its itself just
+may me might more most must my no nor not of off on once only or other our ours out over own per
+same she should so some such than that the their theirs them then there these they this those
+through to too under until up upon us very via was we were what when where which while who whom
+why will with within without would you your yours
+ability able candidate candidates company demonstrated desired equivalent excellent
+experience experienced familiarity good great ideal including job knowledge looking plus position
+preferred proven related required requirements responsibilities responsible role skills strong
+team understanding use using work working year years
+bonus high highly ideally nice need needed needs offer seeking want wants
+""".split())
+
+# Names ending in "s" that are not plurals, so the stemmer leaves them alone
+UNSTEMMED = frozenset("""
+analytics aws devops ebs ecs eks express github jenkins kubernetes mlops mongoose nodejs ops pandas postgres
+rails redis sass sales statistics windows
+""".split())
+LETTER_PATTERN = re.compile(r"[a-z]")
+
+# BM25 parameters; REFERENCE_LENGTH is the resume length (in tokens) treated as "average"
+K1 = 1.2
+B = 0.75
+REFERENCE_LENGTH = 450
+PHRASE_BOOST = 1.5
+MAX_TERMS = 40
+MATCHED_BASE = 0.6
+
+
+def _stem(token: str) -> str:
+    """
+    Very light suffix stripping so 'services'/'service' and 'libraries'/'library'
+    match, leaving names that merely end in "s" intact.
+
+    >>> [_stem(word) for word in ("services", "libraries", "kubernetes", "redis", "aws", "analysis")]
+    ['service', 'library', 'kubernetes', 'redis', 'aws', 'analysis']
+    """
+    if token in UNSTEMMED:
+        return token
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.isalpha() and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def extract_terms(text: str) -> Tuple[List[List[str]], Counter, Dict[str, str]]:
+    """
+    Split text into sentences and collect candidate terms: single keywords plus
+    two-word phrases made of adjacent non-stop-words. Also returns the first
+    surface form seen for each term, for display.
+    """
+    sentences = []
+    counts = Counter()
+    surface = {}
+    for chunk in SENTENCE_SPLIT_PATTERN.split((text or "").lower()):
+        terms = []
+        previous = None
+        for raw in TOKEN_PATTERN.findall(chunk):
+            # Numbers and counts such as "5+" are not terms
+            if raw in STOP_WORDS or len(raw) < 2 or not LETTER_PATTERN.search(raw):
+                previous = None
+                continue
+            token = _stem(raw)
+            terms.append(token)
+            surface.setdefault(token, raw)
+            if previous:
+                phrase = f"{previous[0]} {token}"
+                terms.append(phrase)
+                surface.setdefault(phrase, f"{previous[1]} {raw}")
+            previous = (token, raw)
+        if terms:
+            sentences.append(terms)
+            counts.update(terms)
+    return sentences, counts, surface
+
+
+def weigh_terms(job_description: str) -> List[Tuple[str, float, int, str]]:
+    """
+    The job description's top terms as (term, weight, JD count, display form), weighted
+    by their frequency and BM25 IDF across JD sentences. Depends only on the JD, so it
+    can be computed once per posting.
+    """
+    sentences, jd_counts, surface = extract_terms(job_description)
+    document_frequency = Counter()
+    for terms in sentences:
+        document_frequency.update(set(terms))
+    sentence_count = len(sentences)
+
+    weights = {}
+    for term, tf in jd_counts.items():
+        df = document_frequency[term]
+        idf = math.log(1 + (sentence_count - df + 0.5) / (df + 0.5))
+        weight = (1 + math.log(tf)) * idf
+        if " " in term:
+            # Phrases only count when they repeat or the JD is short, otherwise they are noise
+            if tf < 2 and sentence_count > 3:
+                continue
+            weight *= PHRASE_BOOST
+        weights[term] = weight
+
+    top_terms = sorted(weights.items(), key=lambda item: (-item[1], item[0]))[:MAX_TERMS]
+    return [(term, weight, jd_counts[term], surface[term]) for term, weight in top_terms]
+
+
+def score_resume(resume_text: str, job_description: str,
+                 terms: Optional[Sequence[Tuple[str, float, int, str]]] = None) -> Dict:
+    """
+    Score how well a resume covers the job description's weighted terms (0-100).
+    Each term's resume frequency is saturated BM25-style. Pass the JD's precomputed
+    weigh_terms() as terms to skip re-analyzing it. The result is deterministic.
+    """
+    top_terms = weigh_terms(job_description) if terms is None else terms
+    if not top_terms:
+        return {"score": 0, "breakdown": []}
+
+    # Resume terms come from the same sentence and line splitting as the JD's, so a phrase
+    # never spans a comma or line break on one side only
+    _sentences, resume_counts, _surface = extract_terms(resume_text)
+    resume_length = sum(count for term, count in resume_counts.items() if " " not in term)
+    length_norm = 1 - B + B * (resume_length / REFERENCE_LENGTH)
+
+    total_weight = 0.0
+    earned = 0.0
+    breakdown = []
+    for term, weight, jd_count, display in top_terms:
+        tf = resume_counts[term]
+        if tf:
+            saturation = tf / (tf + K1 * length_norm)
+            coverage = MATCHED_BASE + (1 - MATCHED_BASE) * saturation
+        else:
+            coverage = 0.0
+        total_weight += weight
+        earned += weight * coverage
+        breakdown.append({
+            "term": display,
+            "weight": round(weight, 3),
+            "jdCount": jd_count,
+            "resumeCount": tf,
+            "matched": tf > 0,
+            "contribution": round(weight * coverage, 3),
+        })
+
+    score = int(round(100 * earned / total_weight)) if total_weight else 0
+    return {"score": max(0, min(100, score)), "breakdown": breakdown}
@@ -42,6 +42,10 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Global variables to store the current resume state
     let currentTailoredResume = "";
+    // Server-side chat session and the resume and job description it holds
+    let chatSessionId = null;
+    let chatSessionResume = "";
+    let chatSessionJobDescription = "";
     let currentJobDescription = "";
     let currentTemplate = "";
     let currentOutputFormat = "";
@@ -167,33 +171,81 @@ document.addEventListener('DOMContentLoaded', function() {
             if (tailoredTab && tailoredTab.classList.contains('active')) {
                 currentResumeText = document.getElementById('tailoredResumeText').innerText;
             } else if (enhancedTab.classList.contains('active')) {
-                currentResumeText = document.getElementById('enhancedResumeText').innerText;
+                // The enhanced preview is rendered from the parsed document; chat works on the text
+                currentResumeText = currentResume.enhanced;
             }
 
-            // Send request to the backend
-            fetch('/api/chat-with-resume', {
+            const fullRequest = {
+                message: message,
+                resumeText: currentResumeText,
+                jobDescription: currentJobDescription,
+                template: currentTemplate,
+                outputFormat: currentOutputFormat
+            };
+            // Follow-ups only send the message while the session still holds the resume shown
+            const useSession = chatSessionId && currentResumeText === chatSessionResume
+                && currentJobDescription === chatSessionJobDescription;
+            // Replies stream in as they are generated where the browser can read a response body
+            // incrementally; otherwise, or if the stream cannot be opened, the whole reply is awaited
+            const canStream = typeof TextDecoder !== 'undefined' && typeof ReadableStream !== 'undefined';
+            const postChat = (body, stream) => fetch(stream ? '/api/chat-with-resume/stream' : '/api/chat-with-resume', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({
-                    message: message,
-                    resumeText: currentResumeText,
-                    jobDescription: currentJobDescription,
-                    template: currentTemplate,
-                    outputFormat: currentOutputFormat
-                })
+                body: JSON.stringify(body)
             })
-            .then(response => response.json())
-            .then(data => {
+            .then(response => {
+                // The session expired: start a new one with the full resume
+                return response.status === 404 && useSession && body !== fullRequest ? postChat(fullRequest, stream) : response;
+            });
+            const requestReply = body => {
+                const waitForReply = () => postChat(body, false)
+                    .then(response => response.json())
+                    .then(data => ({ data: data, messageDiv: null }));
+                if (!canStream) {
+                    return waitForReply();
+                }
+                return postChat(body, true)
+                    .then(response => {
+                        const contentType = response.headers.get('Content-Type') || '';
+                        if (response.body && contentType.startsWith('text/event-stream')) {
+                            return readChatStream(response);
+                        }
+                        return contentType.startsWith('application/json') && response.status < 500
+                            ? response.json().then(data => ({ data: data, messageDiv: null }))
+                            : waitForReply();
+                    }, waitForReply);
+            };
+
+            // Send request to the backend
+            requestReply(useSession ? {
+                sessionId: chatSessionId,
+                message: message,
+                template: currentTemplate,
+                outputFormat: currentOutputFormat
+            } : fullRequest)
+            .then(({ data, messageDiv }) => {
                 // Remove typing indicator
-                document.getElementById('typingIndicator').remove();
+                removeTypingIndicator();
 
                 if (data.error) {
                     appendMessage('system', `Error: ${data.error}`);
                 } else {
-                    // Display AI response
-                    appendMessage('ai', data.response);
+                    if (data.sessionId) {
+                        if (data.sessionId !== chatSessionId) {
+                            chatSessionResume = currentResumeText;
+                            chatSessionJobDescription = currentJobDescription;
+                        }
+                        chatSessionId = data.sessionId;
+                    }
+
+                    // Display AI response (a streamed one is replaced by the final parsed reply)
+                    if (messageDiv) {
+                        setMessageText(messageDiv, data.response);
+                    } else {
+                        appendMessage('ai', data.response);
+                    }
                     
                     // Update resume if modified
                     if (data.updatedResume) {
@@ -209,6 +261,7 @@ document.addEventListener('DOMContentLoaded', function() {
                         // Update the content
                         const tailoredResumeText = document.getElementById('tailoredResumeText');
                         tailoredResumeText.innerText = data.updatedResume;
+                        chatSessionResume = tailoredResumeText.innerText;
                         
                         // Switch to the tailored tab
                         const tailoredTab = document.getElementById('tailored-tab');
@@ -230,12 +283,79 @@ document.addEventListener('DOMContentLoaded', function() {
                 chatContainer.scrollTop = chatContainer.scrollHeight;
             })
             .catch(error => {
-                document.getElementById('typingIndicator').remove();
+                removeTypingIndicator();
                 appendMessage('system', `Error: ${error.message}`);
                 chatContainer.scrollTop = chatContainer.scrollHeight;
             });
         }
 
+        // Read a chat reply sent as Server-Sent Events: "token" events are shown as they
+        // arrive, and the "done" (or "error") event's payload is the reply
+        function readChatStream(response) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let streamedText = '';
+            let messageDiv = null;
+            let result = null;
+
+            const handleEvent = block => {
+                let event = 'message';
+                const data = [];
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        data.push(line.slice(5).trim());
+                    }
+                });
+                if (!data.length) return;
+                const payload = JSON.parse(data.join('\n'));
+                if (event === 'token') {
+                    if (!messageDiv) {
+                        removeTypingIndicator();
+                        messageDiv = appendMessage('ai', '');
+                    }
+                    streamedText += payload.text;
+                    setMessageText(messageDiv, streamedText);
+                } else if (event === 'done' || event === 'error') {
+                    result = payload;
+                }
+            };
+
+            const pump = () => reader.read().then(({ done, value }) => {
+                buffer += done ? decoder.decode() : decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    handleEvent(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+                }
+                return done ? null : pump();
+            });
+
+            return pump().then(() => ({
+                data: result || { error: 'The reply was cut off. Please try again.' },
+                messageDiv: messageDiv
+            }));
+        }
+
+        function removeTypingIndicator() {
+            const typingIndicator = document.getElementById('typingIndicator');
+            if (typingIndicator) {
+                typingIndicator.remove();
+            }
+        }
+
+        // Replace a message's text, keeping its timestamp
+        function setMessageText(messageDiv, message) {
+            const timestamp = messageDiv.querySelector('.chat-timestamp');
+            messageDiv.innerText = message;
+            if (timestamp) {
+                messageDiv.appendChild(timestamp);
+            }
+            chatContainer.scrollTop = chatContainer.scrollHeight;
+        }
+
         // Function to append message to chat container
         function appendMessage(type, message) {
             const messageDiv = document.createElement('div');
@@ -250,6 +370,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             chatContainer.appendChild(messageDiv);
             chatContainer.scrollTop = chatContainer.scrollHeight;
+            return messageDiv;
         }
     }
 
@@ -375,7 +496,11 @@ document.addEventListener('DOMContentLoaded', function() {
     function displayResults(data) {
         // Set the resume text
         originalResumeText.textContent = data.originalResume;
-        enhancedResumeText.textContent = data.enhancedResume;
+        if (data.enhancedDocument) {
+            renderResumeDocument(enhancedResumeText, data.enhancedDocument);
+        } else {
+            enhancedResumeText.textContent = data.enhancedResume;
+        }
         
         // Set download URLs
         downloadPdfBtn.onclick = function() {
@@ -396,6 +521,47 @@ document.addEventListener('DOMContentLoaded', function() {
         tailoredTabItem.style.display = 'none';
     }
     
+    // Render the parsed resume (sections, entries, text lines and bullets) the PDF templates also render from
+    function renderResumeDocument(container, resumeDocument) {
+        container.innerHTML = '';
+        resumeDocument.sections.forEach(section => {
+            const sectionDiv = document.createElement('div');
+            sectionDiv.className = 'resume-section';
+            if (section.title) {
+                const heading = document.createElement('h6');
+                heading.className = 'resume-section-title';
+                heading.textContent = section.title;
+                sectionDiv.appendChild(heading);
+            }
+            section.entries.forEach(entry => {
+                const entryDiv = document.createElement('div');
+                entryDiv.className = 'resume-entry';
+                if (entry.title) {
+                    const title = document.createElement('div');
+                    title.className = 'resume-entry-title';
+                    title.textContent = entry.title;
+                    entryDiv.appendChild(title);
+                }
+                entry.text.forEach(line => {
+                    const text = document.createElement('div');
+                    text.textContent = line;
+                    entryDiv.appendChild(text);
+                });
+                if (entry.bullets.length > 0) {
+                    const list = document.createElement('ul');
+                    entry.bullets.forEach(bullet => {
+                        const item = document.createElement('li');
+                        item.textContent = bullet;
+                        list.appendChild(item);
+                    });
+                    entryDiv.appendChild(list);
+                }
+                sectionDiv.appendChild(entryDiv);
+            });
+            container.appendChild(sectionDiv);
+        });
+    }
+    
     // Display skills and keywords used
     function displaySkillsAndKeywords(skills, keywords) {
         // Clear previous lists
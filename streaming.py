@@ -0,0 +1,82 @@
+import re
+import json
+from typing import Any
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class JsonFieldStreamer:
+    """
+    Incrementally extracts the value of one top-level string field from JSON text
+    that arrives in chunks, so it can be forwarded before the whole document is complete.
+    """
+
+    ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str):
+        self._start_pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._position = 0
+        self.started = False
+        self.finished = False
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk of raw JSON and return any newly decoded field text."""
+        self._buffer += chunk
+        if self.finished:
+            return ""
+
+        if not self.started:
+            match = self._start_pattern.search(self._buffer)
+            if not match:
+                return ""
+            self.started = True
+            self._position = match.end()
+
+        out = []
+        buffer = self._buffer
+        i = self._position
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.finished = True
+                i += 1
+                break
+            if char != '\\':
+                out.append(char)
+                i += 1
+                continue
+
+            # Escapes may be split across chunks; wait for the rest before decoding
+            if i + 1 >= len(buffer):
+                break
+            code = buffer[i + 1]
+            if code == 'u':
+                if i + 6 > len(buffer):
+                    break
+                value = int(buffer[i + 2:i + 6], 16)
+                if 0xD800 <= value < 0xDC00:
+                    # Characters outside the BMP arrive as a surrogate pair of escapes
+                    following = buffer[i + 6:i + 12]
+                    if len(following) < 6 and following[:2] == '\\u'[:len(following)]:
+                        break
+                    if following.startswith('\\u') and 0xDC00 <= int(following[2:], 16) < 0xE000:
+                        out.append(chr(0x10000 + ((value - 0xD800) << 10) + int(following[2:], 16) - 0xDC00))
+                        i += 12
+                        continue
+                out.append(chr(value))
+                i += 6
+            else:
+                out.append(self.ESCAPES.get(code, code))
+                i += 2
+
+        self._position = i
+        return "".join(out)
+
+    @property
+    def text(self) -> str:
+        """All raw JSON received so far."""
+        return self._buffer
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests run against the offline fake backend and import the top-level modules directly
+os.environ.setdefault("LLM_BACKEND", "fake")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,82 @@
+import os
+import json
+
+import pytest
+
+import app as app_module
+from chat_sessions import ChatSession
+
+RESUME = "JOHN DOE\n\nSKILLS\n- Python"
+REWRITE = json.dumps({
+    "response": "Added Terraform.",
+    "resume_updated": True,
+    "updated_resume": "JOHN DOE\n\nSKILLS\n- Python\n- Terraform",
+    "skills_list": ["Python", "Terraform"],
+    "keywords_used": ["terraform"],
+})
+
+
+@pytest.fixture(scope="module", autouse=True)
+def started_app(tmp_path_factory):
+    """Start the app's services from a scratch directory, as create_app() does for a server."""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    app_module.create_app(warm=False)
+    yield
+    app_module.retention.stop()
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Script the model's replies; returns the list of system instructions it was called with."""
+    calls = []
+
+    def script(*answers):
+        queue = list(answers)
+
+        def generate(messages, system=None, **kwargs):
+            calls.append(system)
+            return queue.pop(0)
+        monkeypatch.setattr(app_module.llm, "generate", generate)
+        return calls
+    monkeypatch.setattr(app_module, "CHAT_EDIT_MODE", "patch")
+    return script
+
+
+def session():
+    return ChatSession(RESUME, "Python and Terraform", "standard", "pdf", "local")
+
+
+def test_truncated_patch_falls_back_to_rewrite(replies):
+    calls = replies(REWRITE)
+    truncated = '{"response": "Added Terraform.", "resume_updated": true, "edits": [{"op": "insert_after", "li'
+    response, updated, skills, _keywords = app_module.resolve_chat_reply(session(), "add Terraform", truncated)
+    assert response == "Added Terraform."
+    assert updated.endswith("Terraform")
+    assert skills == ["Python", "Terraform"]
+    assert len(calls) == 1
+
+
+def test_patch_that_does_not_apply_falls_back_to_rewrite(replies):
+    calls = replies(REWRITE)
+    patch = json.dumps({"response": "ok", "resume_updated": True,
+                        "edits": [{"op": "replace", "line": "- Rust", "text": "- Terraform"}]})
+    _response, updated, _skills, _keywords = app_module.resolve_chat_reply(session(), "add Terraform", patch)
+    assert updated.endswith("Terraform")
+    assert len(calls) == 1
+
+
+def test_patch_that_applies_needs_no_rewrite(replies):
+    calls = replies()
+    patch = json.dumps({"response": "ok", "resume_updated": True,
+                        "edits": [{"op": "insert_after", "section": "SKILLS", "line": "- Python", "text": "Terraform"}]})
+    _response, updated, _skills, _keywords = app_module.resolve_chat_reply(session(), "add Terraform", patch)
+    assert updated.split("\n")[-1] == "- Terraform"
+    assert calls == []
+
+
+def test_invalid_json_in_rewrite_mode_is_reported_not_retried():
+    response, updated, _skills, _keywords = app_module.parse_chat_response("{not json", RESUME, "rewrite")
+    assert updated is None
+    assert "couldn't format" in response
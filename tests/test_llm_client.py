@@ -0,0 +1,133 @@
+import pytest
+
+from llm_backends import FakeBackend, FakeUpstreamError
+from llm_client import CircuitBreaker, CircuitOpenError, GeminiClient, LLMError
+
+PROMPT = "Rewrite this resume summary. " * 20
+
+
+class FlakyBackend(FakeBackend):
+    """FakeBackend whose first `failures` calls fail with the given status."""
+
+    def __init__(self, failures: int, code: int = 503):
+        super().__init__(latency="fixed:0")
+        self.failures = failures
+        self.code = code
+
+    def _fail_first(self):
+        if self.failures:
+            self.failures -= 1
+            raise FakeUpstreamError(f"Injected upstream error {self.code}", self.code)
+
+    def generate(self, prompt, config, timeout, system=None):
+        self._fail_first()
+        return super().generate(prompt, config, timeout, system)
+
+    def stream(self, prompt, config, timeout, system=None):
+        self._fail_first()
+        return super().stream(prompt, config, timeout, system)
+
+
+def make_client(backend, tokens_per_minute=0, max_retries=2, breaker=None):
+    return GeminiClient(backend, requests_per_minute=0, tokens_per_minute=tokens_per_minute,
+                        deadline_seconds=5.0, max_retries=max_retries, base_delay=0.0, breaker=breaker)
+
+
+def open_breaker(threshold=2):
+    breaker = CircuitBreaker(failure_threshold=threshold, reset_seconds=0.0)
+    for _ in range(threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60.0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.times_opened == 1
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_a_single_trial_through():
+    breaker = open_breaker()
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_release_frees_the_trial_slot_without_a_verdict():
+    breaker = open_breaker()
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_trial_success_closes_the_breaker():
+    breaker = open_breaker()
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_trial_failure_reopens_the_breaker():
+    breaker = open_breaker(threshold=3)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.times_opened == 2
+
+
+def test_retry_recovers_from_transient_failures():
+    client = make_client(FlakyBackend(failures=2))
+    assert client.generate(PROMPT, max_output_tokens=100)
+    assert client.counters["attempts"] == 3
+    assert client.counters["retries"] == 2
+    assert client.counters["failures"] == 0
+    assert client.breaker.state == "closed"
+
+
+def test_retry_recovers_a_stream_that_fails_to_start():
+    client = make_client(FlakyBackend(failures=1))
+    assert "".join(client.stream(PROMPT, max_output_tokens=100))
+    assert client.counters["retries"] == 1
+    assert client.breaker.state == "closed"
+
+
+def test_retries_are_not_charged_the_estimate_again():
+    # 60 tokens a minute: an unrefunded first attempt would leave the retry a minute's wait,
+    # past the deadline, and the call would be rejected as over quota instead of retried
+    client = make_client(FakeBackend(error_rate=1.0, errors="503:1"), tokens_per_minute=60)
+    with pytest.raises(LLMError) as raised:
+        client.generate(PROMPT, max_output_tokens=100)
+    assert raised.value.status_code == 503
+    assert client.counters["attempts"] == 3
+    assert client.counters["rejected"] == 0
+    assert client.tokens._tokens == pytest.approx(client.tokens.capacity)
+
+
+def test_open_breaker_stops_retries_and_refunds():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60.0)
+    client = make_client(FakeBackend(error_rate=1.0, errors="503:1"), tokens_per_minute=6000,
+                         max_retries=3, breaker=breaker)
+    with pytest.raises(CircuitOpenError):
+        client.generate(PROMPT, max_output_tokens=100)
+    assert client.counters["attempts"] == 2
+    assert breaker.state == "open"
+    assert client.tokens._tokens == pytest.approx(client.tokens.capacity)
+
+
+def test_rejected_request_is_not_retried_and_leaves_the_breaker_alone():
+    client = make_client(FakeBackend(error_rate=1.0, errors="400:1"), tokens_per_minute=6000)
+    with pytest.raises(LLMError) as raised:
+        client.generate(PROMPT, max_output_tokens=100)
+    assert raised.value.status_code == 502
+    assert client.counters["attempts"] == 1
+    assert client.breaker.state == "closed" and client.breaker.failures == 0
+    assert client.tokens._tokens == pytest.approx(client.tokens.capacity)
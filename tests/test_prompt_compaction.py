@@ -0,0 +1,26 @@
+from prompt_compaction import compact_inputs, strip_page_furniture
+
+TWO_PAGES = "\n".join([
+    "JANE DOE", "jane@example.com | 555-0100", "EXPERIENCE", "- Built Python services", "Page 1 of 2",
+    "JANE DOE", "jane@example.com | 555-0100", "- Led a team of four", "Page 2 of 2",
+])
+
+
+def test_repeated_header_is_dropped_after_first_copy():
+    lines = strip_page_furniture(TWO_PAGES).split("\n")
+    assert lines.count("JANE DOE") == 1
+    assert lines.count("jane@example.com | 555-0100") == 1
+    assert lines[0] == "JANE DOE"
+    assert "- Led a team of four" in lines
+
+
+def test_repeated_bullets_are_not_furniture():
+    text = "JANE DOE\n- Python\nSKILLS\n- Python"
+    assert strip_page_furniture(text) == text
+
+
+def test_compaction_strips_furniture_but_not_the_input():
+    compaction = compact_inputs("enhance", "", TWO_PAGES, "Python", 0)
+    assert compaction.resume_text.count("JANE DOE") == 1
+    assert "Page 2 of 2" not in compaction.resume_text
+    assert TWO_PAGES.count("JANE DOE") == 2
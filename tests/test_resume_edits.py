@@ -0,0 +1,74 @@
+import pytest
+
+from resume_document import parse_resume
+from resume_edits import PatchError, apply_edits, section_name
+
+RESUME = """JOHN DOE
+
+EXPERIENCE
+Engineer, Acme 2020 - Present
+- Built Python services
+- Led a team of four
+
+PROJECTS
+- Built Python services
+"""
+
+
+def test_replace_keeps_bullet_marker():
+    updated = apply_edits(RESUME, [
+        {"op": "replace", "section": "EXPERIENCE", "line": "- Led a team of four", "text": "Led a team of six"},
+    ])
+    assert "- Led a team of six" in updated.split("\n")
+    assert "Led a team of four" not in updated
+
+
+def test_insert_after_and_delete():
+    updated = apply_edits(RESUME, [
+        {"op": "insert_after", "section": "EXPERIENCE", "line": "Led a team of four", "text": "Added Kubernetes"},
+        {"op": "delete", "section": "EXPERIENCE", "line": "- Led a team of four"},
+    ])
+    lines = updated.split("\n")
+    assert lines[5] == "- Added Kubernetes"
+    assert "- Led a team of four" not in lines
+
+
+def test_section_disambiguates_repeated_line():
+    updated = apply_edits(RESUME, [
+        {"op": "replace", "section": "PROJECTS", "line": "- Built Python services", "text": "Built Go services"},
+    ])
+    lines = updated.split("\n")
+    assert lines[4] == "- Built Python services"
+    assert lines[8] == "- Built Go services"
+
+
+@pytest.mark.parametrize("edits", [
+    [],
+    "replace everything",
+    [{"op": "rename", "line": "JOHN DOE", "text": "JANE"}],
+    [{"op": "replace", "line": "JOHN DOE"}],
+    [{"op": "replace", "line": "Not in the resume", "text": "x"}],
+    [{"op": "replace", "line": "- Built Python services", "text": "x"}],
+])
+def test_bad_edits_raise(edits):
+    with pytest.raises(PatchError):
+        apply_edits(RESUME, edits)
+
+
+def test_deleting_everything_raises():
+    with pytest.raises(PatchError):
+        apply_edits("ONLY LINE", [{"op": "delete", "line": "ONLY LINE"}])
+
+
+@pytest.mark.parametrize("line", ["EXPERIENCE", "## EXPERIENCE", "**SKILLS:**", "## Experience", "Experience:", "- Python"])
+def test_sections_are_the_ones_the_renderers_show(line):
+    rendered = [section.title for section in parse_resume(line + "\nDid things").sections if section.title]
+    assert (section_name(line) is not None) == bool(rendered)
+
+
+def test_mixed_case_markdown_heading_does_not_scope_an_edit():
+    # The renderers show "## Experience" as text, so the edit is looked up in the whole
+    # resume, where the line is ambiguous, rather than under a section of that name
+    resume = "JOHN DOE\n\nPROJECTS\n- Built Python services\n## Experience\n- Built Python services"
+    with pytest.raises(PatchError, match="ambiguous"):
+        apply_edits(resume, [{"op": "replace", "section": "Experience", "line": "- Built Python services", "text": "x"}])
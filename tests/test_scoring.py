@@ -0,0 +1,32 @@
+from scoring import extract_terms, score_resume
+
+JD = "Python Kubernetes operators. Python Kubernetes at scale. We need Go."
+
+
+def breakdown(resume):
+    return {item["term"]: item for item in score_resume(resume, JD)["breakdown"]}
+
+
+def test_phrase_matches_within_a_sentence():
+    assert breakdown("Wrote Python Kubernetes operators")["python kubernetes"]["resumeCount"] == 1
+
+
+def test_phrase_does_not_span_commas_or_lines():
+    for resume in ("Skills: Python, Kubernetes", "Built Python\nKubernetes clusters"):
+        terms = breakdown(resume)
+        assert terms["python kubernetes"]["resumeCount"] == 0
+        assert terms["python"]["matched"] and terms["kubernetes"]["matched"]
+
+
+def test_counts_and_filler_words_are_not_terms():
+    _sentences, counts, _surface = extract_terms("5+ years of Python, nice to have Go")
+    assert "5+" not in counts
+    assert "nice" not in counts and "year" not in counts
+    assert counts["python"] == 1 and counts["go"] == 1
+
+
+def test_score_is_deterministic_and_bounded():
+    first = score_resume("Python Go Kubernetes", JD)
+    assert first == score_resume("Python Go Kubernetes", JD)
+    assert 0 <= first["score"] <= 100
+    assert score_resume("", JD)["score"] == 0
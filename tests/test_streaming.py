@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from streaming import JsonFieldStreamer, sse_event
+
+REPLY = json.dumps({
+    "response": 'Added "Terraform" \\ IaC,\nnow café — done \U0001F600',
+    "resume_updated": False,
+}, ensure_ascii=True)
+
+
+def stream_in_chunks(text, size):
+    streamer = JsonFieldStreamer("response")
+    out = "".join(streamer.feed(text[i:i + size]) for i in range(0, len(text), size))
+    return streamer, out
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64, len(REPLY)])
+def test_every_chunk_size_decodes_the_field(size):
+    streamer, out = stream_in_chunks(REPLY, size)
+    assert out == json.loads(REPLY)["response"]
+    assert streamer.started and streamer.finished
+    assert streamer.text == REPLY
+
+
+@pytest.mark.parametrize("cut", range(1, 6))
+def test_unicode_escape_split_at_every_position(cut):
+    text = '{"response": "caf\\u00e9"}'
+    start = text.index("\\u")
+    streamer = JsonFieldStreamer("response")
+    assert streamer.feed(text[:start + cut]) == "caf"
+    assert streamer.feed(text[start + cut:]) == "é"
+
+
+def test_backslash_split_from_its_escape_code():
+    streamer = JsonFieldStreamer("response")
+    assert streamer.feed('{"response": "a\\') == "a"
+    assert streamer.feed('nb\\"c"}') == '\nb"c'
+
+
+def test_field_name_split_across_chunks_and_later_fields_ignored():
+    streamer = JsonFieldStreamer("response")
+    assert streamer.feed('{"resp') == ""
+    assert streamer.feed('onse" :  "hi"') == "hi"
+    assert streamer.feed(', "other": "ignored"}') == ""
+
+
+def test_other_fields_before_the_target_are_skipped():
+    streamer = JsonFieldStreamer("response")
+    assert streamer.feed('{"updated_resume": "x", "response": "ok"}') == "ok"
+
+
+def test_sse_event_format():
+    assert sse_event("token", {"text": "hi"}) == 'event: token\ndata: {"text": "hi"}\n\n'
+
+
+@pytest.mark.parametrize("cut", range(1, 12))
+def test_surrogate_pair_split_at_every_position(cut):
+    text = '{"response": "a\\ud83d\\ude00b"}'
+    start = text.index("\\u")
+    streamer = JsonFieldStreamer("response")
+    out = streamer.feed(text[:start + cut]) + streamer.feed(text[start + cut:])
+    assert out == "a\U0001F600b"
@@ -0,0 +1,34 @@
+import pytest
+
+from text_normalization import clean_resume_text, strip_markdown, to_pdf_text
+
+# (model output, normalized text) -- both clean_resume_text and strip_markdown must produce it
+CASES = [
+    ("```markdown\nJANE DOE\n```", "JANE DOE"),
+    ("## EXPERIENCE", "EXPERIENCE"),
+    ("**Senior Engineer** at *Acme*", "Senior Engineer at Acme"),
+    ("__Led__ the _payment_ service", "Led the payment service"),
+    ("* Built Python services", "- Built Python services"),
+    ("  * Nested bullet", "- Nested bullet"),
+    ("- Already a bullet", "- Already a bullet"),
+    ("• Unicode bullet – kept", "• Unicode bullet – kept"),
+    ("See [portfolio](https://example.com/me_work)", "See portfolio"),
+    ("jane_doe@example.com, snake_case", "jane_doe@example.com, snake_case"),
+    ("C++, C#, CI/CD", "C++, C#, CI/CD"),
+]
+
+
+@pytest.mark.parametrize("raw, expected", CASES)
+def test_every_path_applies_the_same_rules(raw, expected):
+    assert clean_resume_text(raw) == expected
+    assert strip_markdown(raw).strip() == expected
+
+
+@pytest.mark.parametrize("raw, expected", CASES)
+def test_rules_are_idempotent(raw, expected):
+    assert clean_resume_text(clean_resume_text(raw)) == expected
+
+
+def test_pdf_encoding_is_the_only_pdf_specific_step():
+    assert to_pdf_text("• Led “fast” work — … 中") == '* Led "fast" work -- ... ?'
+    assert to_pdf_text("plain ascii") == "plain ascii"
@@ -0,0 +1,59 @@
+import re
+
+# The markdown rules every path applies in one pass (model output, chat edits, renderers):
+# code fences, [text](url) links (kept as text), heading markers, "* " list markers (kept as
+# "- " bullets) and emphasis markers; underscores inside words (emails, snake_case) are kept
+MARKDOWN_PATTERN = re.compile(
+    r"```[a-z]*\n"
+    r"|```"
+    r"|\[([^\]]+)\]\([^)]+\)"
+    r"|##+\s"
+    r"|^([ \t]*)\*[ \t]+"
+    r"|\*+"
+    r"|(?<!\w)_+|_+(?!\w)",
+    re.MULTILINE
+)
+
+# Typographic characters the core PDF fonts cannot encode, mapped to ASCII.
+# Applied with str.replace over the whole document: on non-ASCII text each
+# replace is a C-level scan, several times faster than str.translate here.
+PDF_REPLACEMENTS = (
+    ('\u2013', '-'),  # en-dash
+    ('\u2014', '--'),  # em-dash
+    ('\u2018', "'"),  # left single quote
+    ('\u2019', "'"),  # right single quote
+    ('\u201c', '"'),  # left double quote
+    ('\u201d', '"'),  # right double quote
+    ('\u2022', '*'),  # bullet
+    ('\u2026', '...'),  # ellipsis
+    ('\u00a0', ' '),  # non-breaking space
+)
+
+
+def _replace_markdown(match: re.Match) -> str:
+    if match.group(1):
+        return match.group(1)
+    if match.group(2) is not None:
+        return f"{match.group(2)}- "
+    return ""
+
+
+def strip_markdown(text: str) -> str:
+    """Remove markdown formatting with the shared rules, keeping link text and bullets."""
+    if not text:
+        return text
+    return MARKDOWN_PATTERN.sub(_replace_markdown, text)
+
+
+def clean_resume_text(text: str) -> str:
+    """Normalize resume text returned by Gemini: trim it and apply the shared markdown rules."""
+    return strip_markdown(text or "").strip()
+
+
+def to_pdf_text(text: str) -> str:
+    """Map typographic characters to ASCII and replace anything outside Latin-1, for core PDF fonts."""
+    if text.isascii():
+        return text
+    for unicode_char, ascii_char in PDF_REPLACEMENTS:
+        text = text.replace(unicode_char, ascii_char)
+    return text.encode('latin-1', 'replace').decode('latin-1')